@@ -0,0 +1,65 @@
+"""
+Persistent alert state for slot notifications
+Remembers which (location, date) pairs were already alerted so repeat alerts
+are suppressed across cycles and restarts. A pair is alerted again once its
+cooldown has passed. A date that flickers away for a cycle and comes back
+is not alerted twice; a date earlier than any alerted is a new pair and is
+alerted straight away.
+"""
+
+import json
+import os
+import time
+from datetime import date
+
+
+class AlertState:
+    """Alert history kept in a small JSON file"""
+
+    def __init__(self, path: str, cooldown: float = 6 * 3600, clock=time.time):
+        self.path = path
+        self.cooldown = cooldown
+        self.clock = clock
+        self.alerted = {}  # "location|date" -> last alert time
+        self.load()
+
+    @staticmethod
+    def key(location: str, slot_date: date) -> str:
+        return f"{location}|{slot_date.isoformat()}"
+
+    def load(self):
+        try:
+            with open(self.path) as state_file:
+                state = json.load(state_file)
+        except (OSError, ValueError):
+            return
+        self.alerted = state.get("alerted", {})
+
+    def save(self):
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as state_file:
+            json.dump({"alerted": self.alerted}, state_file)
+        os.replace(tmp_path, self.path)
+
+    def select(self, matches: list) -> list:
+        """The (location, date) matches of this cycle worth alerting about now"""
+        now = self.clock()
+        selected = []
+        for location, slot_date in matches:
+            last_alerted = self.alerted.get(self.key(location, slot_date))
+            if last_alerted is None or now - last_alerted >= self.cooldown:
+                selected.append((location, slot_date))
+        return selected
+
+    def mark_alerted(self, alerts: list):
+        """Record sent alerts, forget past dates and persist the state"""
+        now = self.clock()
+        for location, slot_date in alerts:
+            self.alerted[self.key(location, slot_date)] = now
+        today = date.fromtimestamp(now).isoformat()
+        self.alerted = {
+            key: alerted_at
+            for key, alerted_at in self.alerted.items()
+            if key.rsplit("|", 1)[1] >= today
+        }
+        self.save()
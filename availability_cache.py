@@ -0,0 +1,212 @@
+"""
+Shared availability cache so one poller serves many applicants
+A single daemon logs in once, fetches the days endpoint for each configured
+consulate once per interval and publishes the snapshots over a Unix socket.
+Reschedulers read from the socket instead of polling the site themselves and
+fall back to their own fetch when the cache is unreachable or stale. Booking
+always uses each applicant's own session, which polls for itself every
+AVAILABILITY_CACHE_KEEPALIVE seconds so it is known good when a slot shows up.
+
+Protocol: one JSON request per line, e.g. {"consulate": "Toronto"}, answered by
+one JSON line {"consulate", "status", "dates", "fetched_at", "ttl"}.
+"""
+
+import json
+import os
+import socket
+import socketserver
+import threading
+import time
+
+from console_utils import Console
+from poll_outcomes import PollResult, PollStatus, parse_iso_date
+from rate_limiter import SharedRateLimiter
+from request_tracker import RequestTracker
+from session_backends import create_backend
+from shutdown import install_signal_handlers, interruptible_sleep, shutdown_requested
+
+# Only healthy outcomes are published; failures let old snapshots go stale
+PUBLISHED_STATUSES = {PollStatus.OK, PollStatus.EMPTY}
+
+
+class SnapshotStore:
+    """Latest published snapshot per consulate"""
+
+    def __init__(self, ttl: float, clock=time.time):
+        self.ttl = ttl
+        self.clock = clock
+        self.lock = threading.Lock()
+        self.snapshots = {}
+
+    def publish(self, consulate: str, result: PollResult):
+        snapshot = {
+            "consulate": consulate,
+            "status": result.status.value,
+            "dates": [date.isoformat() for date in result.dates],
+            "fetched_at": self.clock(),
+            "ttl": self.ttl,
+        }
+        with self.lock:
+            self.snapshots[consulate] = snapshot
+
+    def get(self, consulate: str) -> dict | None:
+        with self.lock:
+            return self.snapshots.get(consulate)
+
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        for line in self.rfile:
+            try:
+                consulate = json.loads(line)["consulate"]
+            except (ValueError, KeyError, TypeError):
+                reply = {"error": "bad request"}
+            else:
+                reply = self.server.store.get(consulate) or {
+                    "consulate": consulate,
+                    "error": "no snapshot",
+                }
+            self.wfile.write(json.dumps(reply).encode() + b"\n")
+            self.wfile.flush()
+
+
+class AvailabilityCacheServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """Serve a SnapshotStore on a Unix socket"""
+
+    daemon_threads = True
+
+    def __init__(self, socket_path: str, store: SnapshotStore):
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+        self.store = store
+        super().__init__(socket_path, _RequestHandler)
+
+    def start(self) -> threading.Thread:
+        thread = threading.Thread(target=self.serve_forever, daemon=True)
+        thread.start()
+        return thread
+
+    def server_close(self):
+        super().server_close()
+        if os.path.exists(self.server_address):
+            os.unlink(self.server_address)
+
+
+class AvailabilityCacheClient:
+    """Read snapshots from the cache daemon"""
+
+    def __init__(self, socket_path: str, timeout: float = 2, clock=time.time):
+        self.socket_path = socket_path
+        self.timeout = timeout
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, consulate: str) -> PollResult | None:
+        """The consulate's snapshot, or None when unreachable, missing or stale"""
+        try:
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as connection:
+                connection.settimeout(self.timeout)
+                connection.connect(self.socket_path)
+                connection.sendall(json.dumps({"consulate": consulate}).encode() + b"\n")
+                with connection.makefile("rb") as reply_file:
+                    reply = json.loads(reply_file.readline())
+        except (OSError, ValueError) as e:
+            Console.debug(f"Availability cache unavailable: {e}")
+            self.misses += 1
+            return None
+
+        if "error" in reply or self.clock() - reply["fetched_at"] > reply["ttl"]:
+            self.misses += 1
+            return None
+        self.hits += 1
+        dates = [parse_iso_date(value) for value in reply["dates"]]
+        return PollResult(PollStatus(reply["status"]), dates)
+
+    def summary(self) -> str:
+        return f"{self.hits} hit(s), {self.misses} miss(es)"
+
+    @classmethod
+    def from_settings(cls, settings):
+        """Client for AVAILABILITY_CACHE_SOCKET, None when not configured"""
+        socket_path = getattr(settings, "AVAILABILITY_CACHE_SOCKET", "")
+        return cls(socket_path) if socket_path else None
+
+
+def cache_consulates(settings) -> list:
+    value = getattr(settings, "AVAILABILITY_CACHE_CONSULATES", "")
+    return [name.strip() for name in value.split(",") if name.strip()] or [
+        settings.USER_CONSULATE
+    ]
+
+
+def poll_once(backend, store: SnapshotStore, consulates: list, throttle) -> bool:
+    """Fetch every consulate once; False when the session has to be renewed"""
+    tracker = RequestTracker(float("inf"), float("inf"))
+    for consulate in consulates:
+        if not throttle():
+            # Shutting down; the caller's next sleep returns at once
+            break
+        result = backend.get_available_dates(
+            tracker, backend.settings.CONSULATES[consulate]
+        )
+        if result.status == PollStatus.SESSION_EXPIRED:
+            return False
+        if result.status in PUBLISHED_STATUSES:
+            store.publish(consulate, result)
+            earliest = result.dates[0] if result.dates else "none"
+            Console.info(f"{consulate}: earliest {earliest}", "CACHE")
+        else:
+            Console.warning(f"{consulate}: poll failed ({result.status.value})", "CACHE")
+    return True
+
+
+def main():
+    # Import cloud settings if available, fallback to regular settings
+    try:
+        import settings_cloud as settings
+    except ImportError:
+        import settings
+
+    consulates = cache_consulates(settings)
+    store = SnapshotStore(
+        getattr(settings, "AVAILABILITY_CACHE_TTL", 3 * settings.DATE_REQUEST_DELAY)
+    )
+    install_signal_handlers(getattr(settings, "SHUTDOWN_GRACE_SECONDS", 30))
+    server = AvailabilityCacheServer(settings.AVAILABILITY_CACHE_SOCKET, store)
+    server.start()
+    rate_limiter = SharedRateLimiter.from_settings(settings)
+
+    def throttle(endpoint="days") -> bool:
+        """False when shutdown cut the wait short and no token was taken"""
+        return not rate_limiter or rate_limiter.acquire(endpoint) is not None
+
+    Console.separator("US VISA AVAILABILITY CACHE")
+    Console.info(f"Serving {', '.join(consulates)} on {settings.AVAILABILITY_CACHE_SOCKET}")
+    Console.separator()
+
+    try:
+        while not shutdown_requested():
+            backend = create_backend(settings)
+            try:
+                if not throttle("login"):
+                    break
+                backend.login()
+                backend.open_appointment_page()
+                while poll_once(backend, store, consulates, throttle):
+                    if interruptible_sleep(settings.DATE_REQUEST_DELAY):
+                        break
+                else:
+                    Console.warning("Cache session expired - logging in again", "CACHE")
+            except Exception as e:
+                Console.error(f"Cache session failed: {e}", "CACHE")
+                interruptible_sleep(settings.NEW_SESSION_DELAY)
+            finally:
+                backend.quit()
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
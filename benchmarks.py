@@ -0,0 +1,505 @@
+"""
+Microbenchmarks for the code paths run in a loop
+Each case reports microseconds per operation and, for the fake WebDriver
+cases, the number of WebDriver round trips. Results are compared with the
+baselines in benchmark_baselines.json; slower timings beyond the tolerance and
+any extra round trip are reported as regressions (exit status 1).
+
+Usage: python benchmarks.py [--save] [--tolerance 1.5] [--repeat 10] [name ...]
+"""
+
+import argparse
+import io
+import json
+import math
+import os
+import sys
+import tempfile
+import timeit
+from contextlib import redirect_stdout
+from datetime import date, datetime, timedelta
+from types import ModuleType, SimpleNamespace
+from unittest.mock import patch
+
+import legacy_rescheduler
+import session_backends
+from console_utils import Console, muted_console
+from poll_outcomes import classify_response
+from reschedule_engine import RescheduleEngine
+from request_tracker import RequestTracker
+from session_backends import FakeBackend, SeleniumBackend, parse_payment_table
+from time_slots import READ_OPTIONS_SCRIPT, TimePreferences, select_best_time_slot
+
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmark_baselines.json")
+LEGACY_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "legacy")
+
+BENCHMARKS = {}
+
+
+class SkipBenchmark(Exception):
+    """Raised by a setup function when the case cannot run here"""
+
+
+def benchmark(name: str, number: int):
+    """Register a setup function returning (run callable, fake driver or None)"""
+
+    def register(setup):
+        BENCHMARKS[name] = (setup, number)
+        return setup
+
+    return register
+
+
+class FakeResponse:
+    def __init__(self, payload, status_code=200):
+        self.content = json.dumps(payload).encode()
+        self.status_code = status_code
+        self.headers = {}
+
+    def json(self):
+        return json.loads(self.content)
+
+
+class FakeElement:
+    """Element whose every call costs one round trip on its driver"""
+
+    def __init__(self, driver, attributes=None, text="", children=None):
+        self.driver = driver
+        self.attributes = attributes or {}
+        self._text = text
+        self.children = children or {}
+
+    def _trip(self):
+        self.driver.round_trips += 1
+
+    @property
+    def text(self):
+        self._trip()
+        return self._text
+
+    def click(self):
+        self._trip()
+
+    def is_displayed(self):
+        self._trip()
+        return True
+
+    def is_enabled(self):
+        self._trip()
+        return True
+
+    def get_attribute(self, name):
+        self._trip()
+        return self.attributes.get(name, "")
+
+    def find_element(self, by, value):
+        self._trip()
+        return self.children[value]
+
+    def find_elements(self, by, value):
+        self._trip()
+        return self.children.get(value, [])
+
+
+class FakeWebDriver:
+    """WebDriver stand-in serving canned elements and counting round trips"""
+
+    def __init__(self, elements=None, scripts=None, current_url=""):
+        self.round_trips = 0
+        self.elements = elements or {}
+        self.scripts = scripts or {}
+        self.current_url = current_url
+
+    def find_element(self, by, value):
+        self.round_trips += 1
+        return self.elements.get(value) or FakeElement(self)
+
+    def find_elements(self, by, value):
+        self.round_trips += 1
+        return self.elements.get(value, [])
+
+    def execute_script(self, script, *args):
+        self.round_trips += 1
+        return self.scripts.get(script)
+
+    def execute_async_script(self, script, *args):
+        self.round_trips += 1
+        return self.scripts.get(script)
+
+    def set_script_timeout(self, seconds):
+        self.round_trips += 1
+
+    def get_cookies(self):
+        self.round_trips += 1
+        return [{"name": "_yatri_session", "value": "s" * 300}]
+
+    def get(self, url):
+        self.round_trips += 1
+
+    def refresh(self):
+        self.round_trips += 1
+
+
+def day_strings(count: int, start: date = date(2025, 9, 1)) -> list:
+    return [(start + timedelta(days=offset)).isoformat() for offset in range(count)]
+
+
+def time_options(count: int = 96) -> list:
+    options = [("", "")]
+    for index in range(count):
+        value = f"{6 + index * 10 // 60:02d}:{index * 10 % 60:02d}"
+        options.append((value, value))
+    return options
+
+
+@benchmark("days_response_parse_500", number=200)
+def bench_days_response_parse():
+    response = FakeResponse([{"date": value, "business_day": True} for value in day_strings(500)])
+    return lambda: classify_response(response), None
+
+
+@benchmark("days_response_parse_500_early_exit", number=2000)
+def bench_days_response_parse_early_exit():
+    # Ten dates fall inside the window; the scan stops at the eleventh
+    response = FakeResponse([{"date": value, "business_day": True} for value in day_strings(500)])
+    latest_date = date(2025, 9, 10)
+    return lambda: classify_response(response, latest_date), None
+
+
+@benchmark("days_response_parse_500_strptime", number=200)
+def bench_days_response_parse_strptime():
+    # The previous full json + strptime parse, kept as a reference point
+    response = FakeResponse([{"date": value, "business_day": True} for value in day_strings(500)])
+    return lambda: [
+        datetime.strptime(item["date"], "%Y-%m-%d").date() for item in response.json()
+    ], None
+
+
+@benchmark("days_response_304_unchanged", number=2000)
+def bench_days_response_unchanged():
+    # A conditional poll answered with 304: no body, no parse
+    response = FakeResponse([])
+    response.status_code = 304
+    backend = FakeBackend(
+        SimpleNamespace(
+            LOGIN_URL="https://example.invalid/en-ca/niv/users/sign_in",
+            LATEST_ACCEPTABLE_DATE="2025-09-10",
+        )
+    )
+    url = "https://example.invalid/days/94.json"
+    previous = classify_response(
+        FakeResponse([{"date": value, "business_day": True} for value in day_strings(500)])
+    )
+    backend.conditional.remember(url, '"v1"', None, previous)
+    return lambda: backend.poll_url(lambda *args, **kwargs: response, url, {}, None), None
+
+
+@benchmark("reschedule_date_match_500", number=20)
+def bench_reschedule_date_match():
+    polls = 50
+    dates = [date.fromisoformat(value) for value in day_strings(500)]
+    settings = SimpleNamespace(
+        USER_CONSULATE="Toronto",
+        EARLIEST_ACCEPTABLE_DATE="2025-01-01",
+        LATEST_ACCEPTABLE_DATE="2025-06-30",
+        DATE_REQUEST_DELAY=0,
+        DATE_REQUEST_MAX_RETRY=polls - 1,
+        DATE_REQUEST_MAX_TIME=3600,
+        NEW_SESSION_AFTER_FAILURES=1,
+        NEW_SESSION_DELAY=0,
+        FAIL_RETRY_DELAY=0,
+    )
+    engine = RescheduleEngine(settings, sleep=lambda seconds: None)
+
+    def run():
+        # One call runs `polls` polls; none of the dates is acceptable
+        with muted_console():
+            engine.reschedule(FakeBackend(poll_results=[dates] * polls))
+
+    return run, None
+
+
+def polling_backend(poll_mode: str):
+    """SeleniumBackend on a fake driver; the window ends after ten of 500 dates"""
+    driver = FakeWebDriver()
+    settings = SimpleNamespace(
+        LOGIN_URL="https://example.invalid/en-ca/niv/users/sign_in",
+        APPOINTMENT_PAGE_URL="https://example.invalid/en-ca/niv/schedule/{id}/appointment",
+        AVAILABLE_DATE_REQUEST_SUFFIX="/days/94.json?appointments[expedite]=false",
+        LATEST_ACCEPTABLE_DATE="2025-09-10",
+        REQUEST_HEADERS={"X-Requested-With": "XMLHttpRequest"},
+        POLL_MODE=poll_mode,
+    )
+    backend = SeleniumBackend(settings, driver)
+    backend.schedule_id = "0"
+    return backend, driver
+
+
+@benchmark("poll_cookie_replay_fake_driver", number=2000)
+def bench_poll_cookie_replay():
+    # Cookies and user agent read over WebDriver, then replayed with requests
+    backend, driver = polling_backend("replay")
+    response = FakeResponse([{"date": value, "business_day": True} for value in day_strings(500)])
+
+    def run():
+        original_get = session_backends.requests.get
+        session_backends.requests.get = lambda url, headers=None, timeout=None: response
+        try:
+            with muted_console():
+                backend.get_available_dates(RequestTracker(float("inf"), float("inf")))
+        finally:
+            session_backends.requests.get = original_get
+
+    return run, driver
+
+
+@benchmark("poll_in_page_fetch_fake_driver", number=2000)
+def bench_poll_in_page_fetch():
+    # One async script; the page drops dates past the window before returning
+    backend, driver = polling_backend("fetch")
+    driver.scripts = {
+        session_backends.FETCH_DATES_SCRIPT: {
+            "status": 200,
+            "retryAfter": None,
+            "dates": day_strings(11),
+        }
+    }
+    with muted_console():
+        backend.get_available_dates(RequestTracker(1, 60))  # script timeout set once per budget
+
+    def run():
+        with muted_console():
+            backend.get_available_dates(RequestTracker(float("inf"), float("inf")))
+
+    return run, driver
+
+
+@benchmark("console_info", number=2000)
+def bench_console_info():
+    sink = io.StringIO()
+
+    def run():
+        with redirect_stdout(sink):
+            Console.info("Checking for available appointment dates...", "FETCH")
+        sink.seek(0)
+        sink.truncate()
+
+    return run, None
+
+
+@benchmark("select_best_time_slot_96", number=2000)
+def bench_select_best_time_slot():
+    options = time_options()
+    preferences = TimePreferences.from_strings("08:00-11:30,13:00-15:00", "earliest", "12:00")
+    return lambda: select_best_time_slot(options, preferences), None
+
+
+@benchmark("book_on_form_fake_driver", number=50)
+def bench_book_on_form():
+    date_to_book = date(2025, 3, 15)
+    driver = FakeWebDriver()
+    cells = [FakeElement(driver, {"class": ""}) for _ in range(34)]
+    cells.insert(14, FakeElement(driver, {"class": " undefined"}, children={"a": FakeElement(driver)}))
+    driver.elements = {
+        "//div[@id='ui-datepicker-div']/div[1]/table/tbody": FakeElement(driver, children={"td": cells}),
+        "appointments_consulate_appointment_date": FakeElement(driver, {"value": date_to_book.isoformat()}),
+    }
+    driver.scripts = {READ_OPTIONS_SCRIPT: time_options(40)}
+
+    def run():
+        original_sleep = legacy_rescheduler.sleep
+        legacy_rescheduler.sleep = lambda seconds: None
+        try:
+            with redirect_stdout(io.StringIO()):
+                legacy_rescheduler.book_on_form(driver, date_to_book)
+        finally:
+            legacy_rescheduler.sleep = original_sleep
+
+    return run, driver
+
+
+def payment_page(rows: int) -> str:
+    cells = "".join(
+        f"<tr><td>Consulate {index}</td><td>\n  1 December, 2027\n</td></tr>"
+        for index in range(rows)
+    )
+    return f'<html><body><table class="for-layout">{cells}</table></body></html>'
+
+
+@benchmark("payment_table_parse_200", number=200)
+def bench_payment_table_parse():
+    # One page fetch parsed locally instead of a WebDriver call per <td>
+    html = payment_page(200)
+    return lambda: parse_payment_table(html), None
+
+
+@benchmark("payment_table_detect_200", number=20)
+def bench_payment_table():
+    if LEGACY_DIR not in sys.path:
+        sys.path.insert(0, LEGACY_DIR)
+    # The detector reads settings at import; stub them so no settings.py is needed
+    # and the alert state lands in a scratch directory
+    settings = ModuleType("settings")
+    settings.__dict__.update(
+        USER_CONSULATE="Toronto",
+        EARLIEST_ACCEPTABLE_DATE="2025-01-01",
+        LATEST_ACCEPTABLE_DATE="2025-06-30",
+        NEW_SESSION_AFTER_FAILURES=5,
+        NEW_SESSION_DELAY=60,
+        FAIL_RETRY_DELAY=30,
+        GMAIL_SENDER_NAME="Sender",
+        GMAIL_EMAIL="sender@example.com",
+        GMAIL_APPLICATION_PWD="",
+        RECEIVER_NAME="Receiver",
+        RECEIVER_EMAIL="receiver@example.com",
+        ALERT_STATE_FILE=os.path.join(tempfile.mkdtemp(), "alert_state.json"),
+    )
+    with patch.dict(sys.modules, {"settings": settings}):
+        sys.modules.pop("detect_and_notify", None)
+        import detect_and_notify
+
+    locations, dates = parse_payment_table(payment_page(200))
+
+    def run():
+        with muted_console():
+            detect_and_notify.detect_and_notify(locations, dates)
+
+    return run, None
+
+
+@benchmark("message_mime_build", number=500)
+def bench_message_mime():
+    if LEGACY_DIR not in sys.path:
+        sys.path.insert(0, LEGACY_DIR)
+    from gmail import Message
+
+    text = "New slot found with date: 2025-03-15, location: Toronto\n" * 20
+
+    def run():
+        Message("New slot found", to="Receiver <receiver@example.com>", text=text).as_string()
+
+    return run, None
+
+
+def reference_work():
+    """Fixed pure-Python work timed next to every case to gauge the host's speed"""
+    sorted(str(value * 7919 % 10007) for value in range(1000))
+
+
+def run_benchmarks(names=None, repeat: int = 10) -> dict:
+    """name -> {"us_per_op", "reference_us", "round_trips"} or {"skipped": reason}
+
+    Each repeat times the reference work right before the case, so both see the
+    same host load; the fastest repeat of the case is kept with its reference.
+    """
+    results = {}
+    for name, (setup, number) in BENCHMARKS.items():
+        if names and name not in names:
+            continue
+        try:
+            run, driver = setup()
+        except SkipBenchmark as e:
+            results[name] = {"skipped": str(e)}
+            continue
+        round_trips = None
+        if driver is not None:
+            driver.round_trips = 0
+            run()
+            round_trips = driver.round_trips
+        best, reference = math.inf, math.inf
+        for _ in range(repeat):
+            round_reference = timeit.timeit(reference_work, number=1)
+            elapsed = timeit.timeit(run, number=number)
+            if elapsed < best:
+                best, reference = elapsed, round_reference
+        results[name] = {
+            "us_per_op": round(best / number * 1e6, 2),
+            "reference_us": round(reference * 1e6, 2),
+            "round_trips": round_trips,
+        }
+    return results
+
+
+def host_factor(result: dict, baseline: dict) -> float:
+    """How much slower this host ran the reference work than the baseline's host"""
+    if result.get("reference_us") and baseline.get("reference_us"):
+        return result["reference_us"] / baseline["reference_us"]
+    return 1.0
+
+
+def compare(results: dict, baselines: dict, tolerance: float = 1.5) -> list:
+    """Describe every result slower than tolerance x baseline or with more round trips
+
+    Baselines are scaled by host_factor, so a slower or busier host does not
+    read as a regression.
+    """
+    regressions = []
+    for name, result in results.items():
+        baseline = baselines.get(name)
+        if not baseline or "skipped" in result or "skipped" in baseline:
+            continue
+        expected = baseline["us_per_op"] * host_factor(result, baseline)
+        if result["us_per_op"] > expected * tolerance:
+            regressions.append(
+                f"{name}: {result['us_per_op']:.2f}us/op vs baseline {expected:.2f}us/op"
+            )
+        if (
+            result["round_trips"] is not None
+            and baseline.get("round_trips") is not None
+            and result["round_trips"] > baseline["round_trips"]
+        ):
+            regressions.append(
+                f"{name}: {result['round_trips']} round trips vs baseline {baseline['round_trips']}"
+            )
+    return regressions
+
+
+def load_baselines(path: str = BASELINE_FILE) -> dict:
+    try:
+        with open(path) as baseline_file:
+            return json.load(baseline_file)
+    except FileNotFoundError:
+        return {}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the microbenchmark suite")
+    parser.add_argument("names", nargs="*", help="benchmarks to run (default: all)")
+    parser.add_argument("--save", action="store_true", help="store results as the new baselines")
+    parser.add_argument("--tolerance", type=float, default=1.5, help="allowed slowdown factor")
+    parser.add_argument("--repeat", type=int, default=10, help="timing rounds per case (best kept)")
+    args = parser.parse_args()
+
+    results = run_benchmarks(args.names, args.repeat)
+    baselines = load_baselines()
+
+    Console.separator("BENCHMARKS")
+    for name, result in results.items():
+        if "skipped" in result:
+            Console.warning(f"{name}: skipped - {result['skipped']}", "BENCH")
+            continue
+        baseline = baselines.get(name)
+        if baseline:
+            baseline = baseline["us_per_op"] * host_factor(result, baseline)
+        trips = "" if result["round_trips"] is None else f", {result['round_trips']} round trips"
+        versus = f" (baseline {baseline:.2f})" if baseline else ""
+        Console.info(f"{name}: {result['us_per_op']:.2f}us/op{versus}{trips}", "BENCH")
+
+    if args.save:
+        baselines.update({name: result for name, result in results.items() if "skipped" not in result})
+        with open(BASELINE_FILE, "w") as baseline_file:
+            json.dump(baselines, baseline_file, indent=2, sort_keys=True)
+            baseline_file.write("\n")
+        Console.success(f"Saved baselines to {BASELINE_FILE}", "BENCH")
+        return
+
+    regressions = compare(results, baselines, args.tolerance)
+    for regression in regressions:
+        Console.error(regression, "REGRESSION")
+    if regressions:
+        sys.exit(1)
+    Console.success("No regressions against the baselines", "BENCH")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,6 +3,7 @@ Beautiful console output utilities for US Visa Rescheduler
 Provides colored, formatted console messages for better user experience
 """
 
+from contextlib import contextmanager
 from datetime import datetime
 import pytz
 
@@ -176,3 +177,16 @@ class Console:
         """Print debug message in dim style"""
         timestamp = Console._get_timestamp()
         print(f"{Style.DIM}🐛 [{timestamp}] DEBUG: {message}{Style.RESET_ALL}")
+
+
+@contextmanager
+def muted_console():
+    """Silence every Console method, e.g. while simulating or benchmarking"""
+    originals = {name: value for name, value in vars(Console).items() if not name.startswith("__")}
+    for name in originals:
+        setattr(Console, name, staticmethod(lambda *args, **kwargs: None))
+    try:
+        yield
+    finally:
+        for name, original in originals.items():
+            setattr(Console, name, original)
@@ -0,0 +1,52 @@
+"""
+Run deadline shared by every wait, request and browser call
+The engine activates its deadline for the duration of a session; backends and
+the booking flow pass their timeouts through budget() so no single HTTP
+request, explicit wait or sleep can run past the end of the job. Monotonic
+time is used throughout so wall-clock changes cannot stretch the budget.
+"""
+
+import time
+
+
+class DeadlineExceeded(TimeoutError):
+    """The run budget is spent"""
+
+
+class Deadline:
+    """A fixed budget of seconds starting now"""
+
+    def __init__(self, max_runtime_seconds: float, clock=time.monotonic):
+        self.max_runtime_seconds = max_runtime_seconds
+        self.clock = clock
+        self.start_time = clock()
+
+    def remaining_time(self) -> float:
+        elapsed = self.clock() - self.start_time
+        return max(0, self.max_runtime_seconds - elapsed)
+
+    def allows(self, seconds: float) -> bool:
+        """Whether a phase expected to take `seconds` can finish in time"""
+        return self.remaining_time() >= seconds
+
+    def cap(self, timeout: float) -> float:
+        """timeout limited to the remaining budget; raises once it is spent"""
+        remaining = self.remaining_time()
+        if remaining <= 0:
+            raise DeadlineExceeded(f"Run budget of {self.max_runtime_seconds}s spent")
+        return min(timeout, remaining)
+
+
+_active = None
+
+
+def activate(deadline: Deadline | None) -> Deadline | None:
+    """Make deadline the one budget() applies; returns the previous one"""
+    global _active
+    previous, _active = _active, deadline
+    return previous
+
+
+def budget(timeout: float) -> float:
+    """Cap a timeout or sleep at the active deadline (unchanged without one)"""
+    return _active.cap(timeout) if _active else timeout
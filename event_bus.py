@@ -0,0 +1,164 @@
+"""
+In-process event bus with a local streaming transport
+The engine publishes typed events (polls, new dates, matches, booking steps and
+results, session renewals) to a process-wide bus. Each subscriber gets a
+bounded buffer; when it is full new events are dropped for that subscriber, so
+a slow reader can never stall the poll loop. EventStreamServer fans the bus out
+over a Unix socket as newline-delimited JSON, e.g. for `socat - UNIX:events.sock`.
+
+Every line is one event: {"type", "at", ...fields}. A {"type": "dropped",
+"count"} line tells a reader how many events it missed before the next one.
+"""
+
+import json
+import os
+import queue
+import socketserver
+import threading
+import time
+from enum import Enum
+
+from console_utils import Console
+from shutdown import shutdown_requested
+
+
+class EventType(Enum):
+    POLL_RESULT = "poll_result"
+    NEW_DATE = "new_date"
+    SLOT_MATCHED = "slot_matched"
+    BOOKING_STEP = "booking_step"
+    BOOKING_RESULT = "booking_result"
+    SESSION_RENEWED = "session_renewed"
+
+
+class Subscription:
+    """One subscriber's bounded event buffer"""
+
+    def __init__(self, bus, buffer_size: int):
+        self.bus = bus
+        self.queue = queue.Queue(buffer_size)
+        self.dropped = 0
+
+    def offer(self, event: dict):
+        try:
+            self.queue.put_nowait(event)
+        except queue.Full:
+            self.dropped += 1
+
+    def get(self, timeout: float | None = None) -> dict | None:
+        """Next event, or None when none arrived within timeout"""
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def close(self):
+        self.bus.unsubscribe(self)
+
+
+class EventBus:
+    """Fan events out to subscribers without ever blocking the publisher"""
+
+    def __init__(self, buffer_size: int = 256, clock=time.time):
+        self.buffer_size = buffer_size
+        self.clock = clock
+        self.lock = threading.Lock()
+        self.subscribers = []
+        self.published = 0
+
+    def subscribe(self, buffer_size: int | None = None) -> Subscription:
+        subscription = Subscription(self, buffer_size or self.buffer_size)
+        with self.lock:
+            self.subscribers = self.subscribers + [subscription]
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        with self.lock:
+            self.subscribers = [s for s in self.subscribers if s is not subscription]
+
+    def publish(self, event_type: EventType, **fields):
+        """Hand an event to every subscriber; fields must be JSON serializable"""
+        self.published += 1
+        subscribers = self.subscribers  # replaced, never mutated, so no lock needed
+        if not subscribers:
+            return
+        event = {"type": event_type.value, "at": self.clock(), **fields}
+        for subscription in subscribers:
+            subscription.offer(event)
+
+    def summary(self) -> str:
+        subscribers = self.subscribers
+        dropped = sum(subscription.dropped for subscription in subscribers)
+        return (
+            f"{self.published} event(s), {len(subscribers)} subscriber(s), "
+            f"{dropped} dropped"
+        )
+
+
+# The bus every engine in this process publishes to
+BUS = EventBus()
+
+
+class _StreamHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        subscription = self.server.bus.subscribe()
+        reported = 0
+        try:
+            while not self.server.closed.is_set() and not shutdown_requested():
+                event = subscription.get(timeout=1)
+                if event is None:
+                    continue
+                if subscription.dropped > reported:
+                    missed = {"type": "dropped", "count": subscription.dropped - reported}
+                    self.wfile.write(json.dumps(missed).encode() + b"\n")
+                    reported = subscription.dropped
+                self.wfile.write(json.dumps(event).encode() + b"\n")
+                self.wfile.flush()
+        except OSError:
+            pass  # The subscriber went away
+        finally:
+            subscription.close()
+
+
+class EventStreamServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """Stream an EventBus as NDJSON to every client of a Unix socket"""
+
+    daemon_threads = True
+
+    def __init__(self, socket_path: str, bus: EventBus = BUS):
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+        self.bus = bus
+        self.closed = threading.Event()
+        super().__init__(socket_path, _StreamHandler)
+
+    def start(self) -> threading.Thread:
+        thread = threading.Thread(target=self.serve_forever, daemon=True)
+        thread.start()
+        return thread
+
+    def server_close(self):
+        self.closed.set()
+        super().server_close()
+        if os.path.exists(self.server_address):
+            os.unlink(self.server_address)
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+def start_event_stream(settings) -> EventStreamServer | None:
+    """Serve BUS on EVENT_SOCKET, None when not configured or unavailable"""
+    socket_path = getattr(settings, "EVENT_SOCKET", "")
+    if not socket_path:
+        return None
+    BUS.buffer_size = getattr(settings, "EVENT_BUFFER_SIZE", BUS.buffer_size)
+    try:
+        server = EventStreamServer(socket_path)
+    except OSError as e:
+        Console.warning(f"Unable to serve events on {socket_path}: {e}", "EVENTS")
+        return None
+    server.start()
+    Console.info(f"Streaming events on {socket_path}", "EVENTS")
+    return server
@@ -0,0 +1,147 @@
+"""
+Health and readiness endpoint for supervisors
+The engine reports its phase and heartbeat to a HealthState as it goes; a small
+HTTP server on localhost exposes it so an orchestrator can restart a worker that
+is stuck (no heartbeat) or not doing useful work (no valid session or no recent
+successful poll).
+
+GET /livez   200 while the main loop heartbeat is fresh, else 503
+GET /readyz  200 while the session is valid and a poll succeeded recently, else 503
+GET /health  both checks plus phase, session age, failures and remaining budget
+"""
+
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from console_utils import Console
+
+
+class HealthState:
+    """Live engine state; written by the engine, read by the health server"""
+
+    def __init__(
+        self,
+        max_heartbeat_age: float = 300,
+        max_poll_age: float = 300,
+        clock=time.monotonic,
+    ):
+        self.max_heartbeat_age = max_heartbeat_age
+        self.max_poll_age = max_poll_age
+        self.clock = clock
+        self.phase = "starting"
+        self.heartbeat_at = clock()
+        # A planned wait (sleep, backoff) does not count as a missed heartbeat
+        self.busy_until = self.heartbeat_at
+        self.session_started_at = None
+        self.last_success_at = None
+        self.consecutive_failures = 0
+        self.deadline = None
+
+    def beat(self, phase: str | None = None, busy_for: float = 0):
+        now = self.clock()
+        if phase:
+            self.phase = phase
+        self.heartbeat_at = now
+        self.busy_until = now + busy_for
+
+    def session_opened(self):
+        self.session_started_at = self.clock()
+
+    def session_lost(self):
+        self.session_started_at = None
+
+    def record_poll(self, succeeded: bool, consecutive_failures: int):
+        if succeeded:
+            self.last_success_at = self.clock()
+        self.consecutive_failures = consecutive_failures
+
+    def snapshot(self) -> dict:
+        now = self.clock()
+        heartbeat_age = now - self.heartbeat_at
+        overdue = now - max(self.busy_until, self.heartbeat_at)
+        poll_age = None if self.last_success_at is None else now - self.last_success_at
+        session_age = (
+            None if self.session_started_at is None else now - self.session_started_at
+        )
+        return {
+            "live": overdue <= self.max_heartbeat_age,
+            "ready": session_age is not None
+            and poll_age is not None
+            and poll_age <= self.max_poll_age,
+            "phase": self.phase,
+            "heartbeat_age": round(heartbeat_age, 1),
+            "session_age": None if session_age is None else round(session_age, 1),
+            "last_successful_poll_age": None if poll_age is None else round(poll_age, 1),
+            "consecutive_failures": self.consecutive_failures,
+            "remaining_runtime": (
+                round(self.deadline.remaining_time()) if self.deadline else None
+            ),
+        }
+
+    @classmethod
+    def from_settings(cls, settings, clock=time.monotonic):
+        return cls(
+            getattr(settings, "HEALTH_MAX_HEARTBEAT_AGE", 300),
+            getattr(settings, "HEALTH_MAX_POLL_AGE", 300),
+            clock,
+        )
+
+
+class _HealthHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        snapshot = self.server.state.snapshot()
+        if self.path == "/livez":
+            healthy = snapshot["live"]
+        elif self.path == "/readyz":
+            healthy = snapshot["live"] and snapshot["ready"]
+        elif self.path in ("/", "/health"):
+            healthy = True
+        else:
+            self.send_error(404)
+            return
+        body = json.dumps(snapshot).encode()
+        self.send_response(200 if healthy else 503)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # Probes every few seconds would drown the console
+
+
+class HealthServer(ThreadingHTTPServer):
+    """Serve a HealthState over HTTP"""
+
+    daemon_threads = True
+
+    def __init__(self, state: HealthState, port: int, host: str = "127.0.0.1"):
+        self.state = state
+        super().__init__((host, port), _HealthHandler)
+
+    def start(self) -> threading.Thread:
+        thread = threading.Thread(target=self.serve_forever, daemon=True)
+        thread.start()
+        return thread
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+def start_health_server(settings, state: HealthState) -> HealthServer | None:
+    """Serve state on HEALTH_PORT, None when the port is 0 or unavailable"""
+    port = getattr(settings, "HEALTH_PORT", 0)
+    if not port:
+        return None
+    host = getattr(settings, "HEALTH_HOST", "127.0.0.1")
+    try:
+        server = HealthServer(state, port, host)
+    except OSError as e:
+        Console.warning(f"Unable to serve health on {host}:{port}: {e}", "HEALTH")
+        return None
+    server.start()
+    Console.info(f"Health endpoint on http://{host}:{port}/health", "HEALTH")
+    return server
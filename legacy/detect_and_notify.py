@@ -1,31 +1,28 @@
-import re
 import traceback
 from datetime import datetime
 from time import sleep
 
-import requests
 from gmail import GMail, Message
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.chrome.webdriver import WebDriver
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.webdriver.support.ui import WebDriverWait
-from webdriver_manager.chrome import ChromeDriverManager
 
+import settings
+from alert_state import AlertState
 from console_utils import Console
-from request_tracker import RequestTracker
-from reschedule import get_chrome_driver, login
+from session_backends import SessionBackend, create_backend, parse_payment_table
 from settings import *
 
 # The gmail folder is reusing [gmail-sender](https://github.com/paulc/gmail-sender/tree/master).
 # I'm copying it since it's not published to pip yet.
 
 
+# One SMTP connection reused across alerts; GMail reconnects if it was dropped
+gmail = GMail(f"{GMAIL_SENDER_NAME} <{GMAIL_EMAIL}>", GMAIL_APPLICATION_PWD)
+alert_state = AlertState(
+    getattr(settings, "ALERT_STATE_FILE", "alert_state.json"),
+    getattr(settings, "ALERT_COOLDOWN", 6 * 3600),
+)
+
+
 def notify_receiver(title_str: str, msg_str: str):
-    gmail = GMail(
-        f"{GMAIL_SENDER_NAME} <{GMAIL_EMAIL}>", GMAIL_APPLICATION_PWD
-    )  # Sender gmail
     msg = Message(title_str, to=f"{RECEIVER_NAME} <{RECEIVER_EMAIL}>", text=msg_str)
     gmail.send(msg)
     Console.email_sent(RECEIVER_EMAIL)
@@ -33,24 +30,15 @@ def notify_receiver(title_str: str, msg_str: str):
     Console.info(f"Message: {msg_str}")
 
 
-def get_dates_from_payment_page(driver: WebDriver) -> None:
-    timeout = TIMEOUT
-    continue_button = WebDriverWait(driver, timeout).until(
-        EC.element_to_be_clickable((By.LINK_TEXT, "Continue"))
-    )
-    continue_button.click()
-    current_url = driver.current_url
-    url_id = re.search(r"/(\d+)", current_url).group(1)
-    payment_url = PAYMENT_PAGE_URL.format(id=url_id)
-    driver.get(payment_url)
-
-    content_table = WebDriverWait(driver, timeout).until(
-        EC.visibility_of_element_located((By.CLASS_NAME, "for-layout"))
-    )
-    text_elements = content_table.find_elements(By.TAG_NAME, "td")
-    loc_str_array = [e.text for i, e in enumerate(text_elements) if i % 2 == 0]
-    date_str_array = [e.text for i, e in enumerate(text_elements) if i % 2 == 1]
-    return loc_str_array, date_str_array
+def get_dates_from_payment_page(backend: SessionBackend):
+    """Fetch the payment page once and parse its table locally
+
+    Returns (locations, dates), or None when the session has expired.
+    """
+    html = backend.fetch_payment_page()
+    if html is None:
+        return None
+    return parse_payment_table(html)
 
 
 def detect_and_notify(loc_str_array: list, date_str_array: list) -> bool:
@@ -61,46 +49,63 @@ def detect_and_notify(loc_str_array: list, date_str_array: list) -> bool:
         LATEST_ACCEPTABLE_DATE, "%Y-%m-%d"
     ).date()
 
-    length = len(loc_str_array)
-    detected = False
-    for i in range(length):
-        loc_str = loc_str_array[i]
-        date_str = date_str_array[i]
+    matches = []
+    for loc_str, date_str in zip(loc_str_array, date_str_array):
         if date_str == "No Appointments Available":
             continue
         date = datetime.strptime(date_str, "%d %B, %Y").date()
 
         if earliest_acceptable_date <= date <= latest_acceptable_date:
             Console.found_slot(f"{date} at {loc_str}")
-            Console.info("Sending email notification...")
-            notify_receiver(
-                f"New slot found with date: {date}, location: {loc_str}",
-                f"New slot found with date: {date}, location: {loc_str}",
-            )
-            detected = True
+            matches.append((loc_str, date))
         else:
             Console.date_check(f"{date} at {loc_str}", acceptable=False)
-    return detected
+
+    # One digest per cycle, leaving out slots that were already alerted
+    alerts = sorted(alert_state.select(matches), key=lambda match: match[1])
+    if not alerts:
+        if matches:
+            Console.info(f"{len(matches)} matching slot(s) already alerted", "ALERT")
+        return False
+
+    Console.info("Sending email notification...")
+    earliest_loc, earliest_date = alerts[0]
+    notify_receiver(
+        f"{len(alerts)} new slot(s) found, earliest: {earliest_date} at {earliest_loc}",
+        "\n".join(f"New slot found with date: {date}, location: {loc}" for loc, date in alerts),
+    )
+    alert_state.mark_alerted(alerts)
+    return True
 
 
-def detect_with_new_session() -> bool:
-    driver = get_chrome_driver()
+def start_session(backend: SessionBackend, renewing: bool = False) -> bool:
+    if renewing:
+        # Drop the expired session; a freshly created browser has none to drop
+        try:
+            backend.reset_session()
+        except Exception as e:
+            Console.warning(f"Unable to clear the old session: {e}", "SESSION")
     session_failures = 0
-    detected = False
     while session_failures < NEW_SESSION_AFTER_FAILURES:
         try:
-            login(driver)
-            loc_str_array, date_str_array = get_dates_from_payment_page(driver)
-            detected = detect_and_notify(loc_str_array, date_str_array)
-            break
+            backend.login()
+            Console.login_status(True)
+            backend.open_appointment_page()
+            return True
         except Exception as e:
-            Console.error(f"Unable to get payment page: {e}", "SESSION")
+            Console.error(f"Unable to open a session: {e}", "SESSION")
             session_failures += 1
             Console.waiting(FAIL_RETRY_DELAY, "before session retry")
             sleep(FAIL_RETRY_DELAY)
-            continue
-    driver.quit()
-    return detected
+    return False
+
+
+def detect_once(backend: SessionBackend):
+    """Check the payment page once; None when the session has to be renewed"""
+    table = get_dates_from_payment_page(backend)
+    if table is None:
+        return None
+    return detect_and_notify(*table)
 
 
 if __name__ == "__main__":
@@ -111,20 +116,36 @@ if __name__ == "__main__":
     Console.info(f"Consulate: {USER_CONSULATE}")
     Console.separator()
 
+    # One browser (or HTTP session) for the whole run; it only logs in again on expiry
+    backend = create_backend(settings)
     session_count = 0
-    while True:
-        session_count += 1
-        Console.session_start(session_count)
-        detected = detect_with_new_session()
-        if detected:
-            Console.success(
-                "Appointment slot detected! Waiting 10 minutes before continuing..."
-            )
-            Console.waiting(600, "cooldown period")
-            sleep(600)
-        else:
-            Console.warning(
-                f"Session #{session_count} completed. Retrying in {NEW_SESSION_DELAY} seconds..."
-            )
-            Console.waiting(NEW_SESSION_DELAY, "before new session")
+    session_open = False
+    try:
+        while True:
+            if not session_open:
+                session_count += 1
+                Console.session_start(session_count)
+                session_open = start_session(backend, renewing=session_count > 1)
+                if not session_open:
+                    Console.waiting(NEW_SESSION_DELAY, "before new session")
+                    sleep(NEW_SESSION_DELAY)
+                    continue
+
+            try:
+                detected = detect_once(backend)
+            except Exception as e:
+                Console.error(f"Unable to check payment page: {e}", "FETCH")
+                Console.debug(traceback.format_exc())
+                detected = False
+
+            if detected is None:
+                Console.warning("Session expired - logging in again", "SESSION")
+                session_open = False
+                continue
+            if detected:
+                # Repeat alerts are suppressed, so keep polling without a blind spot
+                Console.success("New appointment slots alerted.")
+            Console.waiting(NEW_SESSION_DELAY, "before next check")
             sleep(NEW_SESSION_DELAY)
+    finally:
+        backend.quit()
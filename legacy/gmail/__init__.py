@@ -5,7 +5,7 @@ from __future__ import unicode_literals
 from .gmail import GMail,GMailWorker,GMailHandler
 from .message import Message
 
-version = "0.6.3"
+version = "0.7"
 description = """
         
     gmail
@@ -65,6 +65,8 @@ description = """
         *   0.6.3   2017-08-07  Try to handle non-ascii filenames
                                 Fix for exception on `__del__` Method Invocation
                                 (thanks to https://github.com/theonewolf for fix/pull request)
+        *   0.7     2026-10-19  GMailHandler digest mode, per-level rate limits and
+                                dropped/coalesced counts
 
     License:
 
@@ -10,8 +10,11 @@ except ImportError:
     from multiprocessing.queues import SimpleQueue
 import os.path
 import smtplib
+import threading
 import time
 
+from collections import deque
+
 from email.utils import formatdate,make_msgid,getaddresses,parseaddr
 from smtplib import SMTPResponseException,SMTPServerDisconnected,SMTPAuthenticationError
 
@@ -231,12 +234,25 @@ class GMailHandler(logging.Handler):
         object as normal. In addition the Subject iformat can be specified
         using the setSubjectFormatter() method.
 
+        By default every record is sent as its own email. In digest mode
+        (digest_interval > 0) records are buffered and one summary email is
+        sent per interval, or straight away once a record at flush_level or
+        above arrives. Identical records are coalesced into one line with a
+        repeat count. rate_limits ({level: max records per rate_period})
+        caps how many records of a level are accepted in either mode; the
+        digest reports how many records were dropped or coalesced. Both
+        modes send through the one persistent SMTP connection.
+
         >>> logger = logging.getLogger("GMailLogger")
         >>> logger.setLevel(logging.DEBUG)
         >>> gh = GMailHandler('A.User <user@gmail.com>','password','Log Recipient <xxx@yyy.zzz>')
+        >>> digest = GMailHandler('A.User <user@gmail.com>','password','xxx@yyy.zzz',
+        ...                       digest_interval=600,rate_limits={logging.WARNING:20})
     """
 
-    def __init__(self,username,password,to,bg=True):
+    def __init__(self,username,password,to,bg=True,digest_interval=0,
+                 flush_level=logging.ERROR,rate_limits=None,rate_period=3600,
+                 max_buffer=500,clock=time.time):
         logging.Handler.__init__(self)
         if bg:
             self.gmail= GMailWorker(username,password)
@@ -245,23 +261,153 @@ class GMailHandler(logging.Handler):
         self.to = to
         self.formatter = logging.Formatter('%(asctime)s [%(levelname)s] %(name)s: %(message)s')
         self.subject_formatter = logging.Formatter('[%(levelname)s] %(message).40s')
+        self.digest_interval = digest_interval
+        self.flush_level = flush_level
+        self.rate_limits = rate_limits or {}
+        self.rate_period = rate_period
+        self.max_buffer = max_buffer
+        self.clock = clock
+        self.accepted = {}      # levelno -> accept times within rate_period
+        self.buffer = []        # [record, text, repeats] in arrival order
+        self.entries = {}       # (levelno, logger, message) -> buffer entry
+        self.reset_counts()
+        self.stopped = threading.Event()
+        self.flusher = None
+        if digest_interval:
+            self.flusher = threading.Thread(target=self._flush_periodically)
+            self.flusher.daemon = True
+            self.flusher.start()
 
     def setSubjectFormatter(self,f):
         self.subject_formatter = f
 
+    def reset_counts(self):
+        self.coalesced = 0
+        self.rate_limited = {}  # levelname -> records dropped by rate limit
+        self.overflowed = 0
+
+    def allow(self,record):
+        """
+            Apply the rate limit for the record's level (if any)
+        """
+        limit = self.rate_limits.get(record.levelno)
+        if limit is None:
+            return True
+        now = self.clock()
+        accepted = self.accepted.setdefault(record.levelno,deque())
+        while accepted and now - accepted[0] >= self.rate_period:
+            accepted.popleft()
+        if len(accepted) >= limit:
+            self.rate_limited[record.levelname] = self.rate_limited.get(record.levelname,0) + 1
+            return False
+        accepted.append(now)
+        return True
+
     def emit(self,record):
         try:
-            msg = Message(subject=self.subject_formatter.format(record).split("\n")[0],
-                          to=self.to,
-                          text=self.format(record))
-            self.gmail.send(msg)
+            if not self.allow(record):
+                return
+            if not self.digest_interval:
+                text = self.format(record)
+                dropped = self.dropped_lines()
+                if dropped:
+                    # Report what the rate limits dropped since the last email
+                    text = "%s\n\n%s" % (text,"\n".join(dropped))
+                msg = Message(subject=self.subject_formatter.format(record).split("\n")[0],
+                              to=self.to,
+                              text=text)
+                self.gmail.send(msg)
+                self.reset_counts()
+                return
+            # Repeats of a message coalesce even though their timestamps differ
+            key = (record.levelno,record.name,record.getMessage())
+            entry = self.entries.get(key)
+            if entry is not None:
+                entry[2] += 1
+                self.coalesced += 1
+            elif len(self.buffer) >= self.max_buffer:
+                self.overflowed += 1
+            else:
+                entry = [record,self.format(record),1]
+                self.buffer.append(entry)
+                self.entries[key] = entry
+            if record.levelno >= self.flush_level:
+                self.flush()
         except (KeyboardInterrupt, SystemExit):
             raise
         except:
             self.handleError(record)
 
+    def dropped_lines(self):
+        lines = []
+        for levelname,count in sorted(self.rate_limited.items()):
+            lines.append("Dropped by %s rate limit: %d" % (levelname,count))
+        if self.overflowed:
+            lines.append("Dropped (digest buffer full): %d" % self.overflowed)
+        return lines
+
+    def digest(self):
+        """
+            Build one summary Message from the buffered records (returns
+            None when there is nothing to report); the buffer is kept until
+            the message is sent (see 'clear')
+        """
+        dropped = sum(self.rate_limited.values()) + self.overflowed
+        if not self.buffer and not dropped:
+            return None
+        lines = []
+        for record,text,repeats in self.buffer:
+            lines.append(text if repeats == 1 else "%s  (x%d)" % (text,repeats))
+        lines.append("")
+        lines.append("Coalesced repeats: %d" % self.coalesced)
+        lines.extend(self.dropped_lines())
+        if self.buffer:
+            worst = max(self.buffer,key=lambda entry: entry[0].levelno)[0]
+            subject = self.subject_formatter.format(worst).split("\n")[0]
+        else:
+            subject = "[DIGEST] only dropped records"
+        total = sum(entry[2] for entry in self.buffer)
+        subject = "%s (digest of %d record%s)" % (subject,total,"" if total == 1 else "s")
+        return Message(subject=subject,to=self.to,text="\n".join(lines))
+
+    def clear(self):
+        """
+            Forget the buffered records once their digest has been sent
+        """
+        self.buffer = []
+        self.entries = {}
+        self.reset_counts()
+
+    def flush(self):
+        """
+            Send the pending digest (if any)
+        """
+        self.acquire()
+        try:
+            msg = self.digest()
+            if msg is not None:
+                self.gmail.send(msg)
+                self.clear()
+        finally:
+            self.release()
+
+    def _flush_periodically(self):
+        while not self.stopped.wait(self.digest_interval):
+            try:
+                self.flush()
+            except Exception:
+                # The records stay buffered for the next flush
+                self.handleError(logging.makeLogRecord({
+                    'msg': "Digest flush failed, %d record(s) kept for the next one",
+                    'args': (len(self.buffer),)}))
+
     def close(self):
-        self.gmail.close()
+        if not self.stopped.is_set():
+            self.stopped.set()
+            if self.digest_interval:
+                self.flush()
+            self.gmail.close()
+        logging.Handler.close(self)
 
     def __del__(self):
         self.close()
@@ -0,0 +1,96 @@
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import logging,unittest
+
+from .gmail import GMailHandler
+
+class FakeGMail(object):
+
+    def __init__(self):
+        self.sent = []
+        self.closed = False
+
+    def send(self,message,rcpt=None):
+        self.sent.append(message)
+
+    def close(self):
+        self.closed = True
+
+class GMailHandlerTest(unittest.TestCase):
+
+    def make_handler(self,**kwargs):
+        self.now = 0
+        handler = GMailHandler('A.User <user@gmail.com>','password','xyz@xyz.com',
+                               bg=False,clock=lambda: self.now,**kwargs)
+        handler.gmail = FakeGMail()
+        logger = logging.getLogger("GMailHandlerTest.%d" % id(handler))
+        logger.propagate = False
+        logger.setLevel(logging.DEBUG)
+        logger.addHandler(handler)
+        self.addCleanup(handler.close)
+        return handler,logger
+
+    def test_digest_coalesces_and_flushes_on_severity(self):
+        handler,logger = self.make_handler(digest_interval=3600)
+        for _ in range(3):
+            logger.warning("Slow response")
+        logger.info("Polled")
+        self.assertEqual(handler.gmail.sent,[])
+
+        logger.error("Booking failed")
+        [msg] = handler.gmail.sent
+        self.assertIn("Booking failed",msg['Subject'])
+        self.assertIn("digest of 5 records",msg['Subject'])
+        text = msg.get_payload(decode=True).decode()
+        self.assertIn("Slow response  (x3)",text)
+        self.assertIn("Coalesced repeats: 2",text)
+
+    def test_rate_limit_drops_and_reports(self):
+        handler,logger = self.make_handler(digest_interval=3600,
+                                           rate_limits={logging.WARNING:2},rate_period=60)
+        for index in range(5):
+            logger.warning("Warning %d" % index)
+        self.now = 61
+        logger.warning("Warning after period")
+        handler.flush()
+
+        [msg] = handler.gmail.sent
+        text = msg.get_payload(decode=True).decode()
+        self.assertIn("Warning after period",text)
+        self.assertNotIn("Warning 2",text)
+        self.assertIn("Dropped by WARNING rate limit: 3",text)
+
+    def test_per_record_mode_is_rate_limited(self):
+        handler,logger = self.make_handler(rate_limits={logging.INFO:1})
+        logger.info("First")
+        logger.info("Second")
+        self.assertEqual(len(handler.gmail.sent),1)
+
+    def test_failed_flush_keeps_records(self):
+        handler,logger = self.make_handler(digest_interval=3600)
+        logger.info("Pending")
+        sent = handler.gmail.sent
+        def fail(message,rcpt=None):
+            raise IOError("SMTP down")
+        handler.gmail.send = fail
+        self.assertRaises(IOError,handler.flush)
+
+        del handler.gmail.send
+        logger.info("Later")
+        handler.flush()
+        [msg] = sent
+        text = msg.get_payload(decode=True).decode()
+        self.assertIn("Pending",text)
+        self.assertIn("Later",text)
+
+    def test_close_sends_pending_digest(self):
+        handler,logger = self.make_handler(digest_interval=3600)
+        logger.info("Pending")
+        gmail = handler.gmail
+        handler.close()
+        self.assertEqual(len(gmail.sent),1)
+        self.assertTrue(gmail.closed)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,82 +1,122 @@
 # Use environment variables directly
 import os
 from datetime import date, datetime
-from time import sleep
-import random
+from time import perf_counter, sleep
 
 from selenium.webdriver.chrome.webdriver import WebDriver
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.support.ui import WebDriverWait
 
+from deadline import budget
+from time_slots import (
+    READ_OPTIONS_SCRIPT,
+    SELECT_VALUE_SCRIPT,
+    TimePreferences,
+    rank_times,
+    select_best_time_slot,
+)
+
 TEST_MODE = os.getenv("TEST_MODE", "false").lower() == "true"
 NUM_PARTICIPANTS = int(os.getenv("NUM_PARTICIPANTS", "1"))
+TIME_PREFERENCES = TimePreferences.from_strings(
+    os.getenv("PREFERRED_TIME_RANGES", ""),
+    os.getenv("PREFERRED_TIME_ORDER", "earliest"),
+    os.getenv("AVOID_TIMES", ""),
+)
 
-def select_best_time_slot(appointment_time_options):
-    """Select the best available time slot based on preferences"""
-    if not appointment_time_options:
-        return None
-    
-    # Filter out any empty or invalid options
-    valid_options = [opt for opt in appointment_time_options if opt.text.strip()]
-    
-    if not valid_options:
-        return None
-    
-    # Try to find morning slots first (before 12 PM)
-    morning_slots = []
-    afternoon_slots = []
-    
-    for opt in valid_options:
-        time_text = opt.text.strip().lower()
-        # Check if it's morning (before 12 PM)
-        if any(morning in time_text for morning in ['am', 'morning', '9:', '10:', '11:']):
-            morning_slots.append(opt)
-        else:
-            afternoon_slots.append(opt)
-    
-    # Prefer morning slots if available
-    if morning_slots:
-        # Pick a random morning slot to avoid always choosing the same one
-        return random.choice(morning_slots)
-    elif afternoon_slots:
-        # Pick a random afternoon slot
-        return random.choice(afternoon_slots)
-    else:
-        # Fallback to first available slot
-        return valid_options[0]
-
-def legacy_reschedule(driver: WebDriver, date_to_book: date):
-    """Enhanced rescheduling with better race condition handling"""
-    try:
+
+def prepare_appointment_form(driver: WebDriver, reload: bool = True):
+    """Reload the appointment page and get past the group Continue step"""
+    if reload:
         driver.refresh()
-        sleep(1)  # Reduced delay for faster response
+        sleep(budget(1))  # Reduced delay for faster response
 
-        # Continue btn: applicable when there are more than one applicant for scheduling
-        if NUM_PARTICIPANTS > 1:
-            try:
-                continueBtn = WebDriverWait(driver, 10).until(
-                    EC.presence_of_element_located(
-                        (
-                            By.XPATH,
-                            "//main[@id='main']/div[@class='mainContent']/form/div[2]/div/input",
-                        )
+    # Continue btn: applicable when there are more than one applicant for scheduling
+    if NUM_PARTICIPANTS > 1:
+        try:
+            continueBtn = WebDriverWait(driver, budget(10)).until(
+                EC.presence_of_element_located(
+                    (
+                        By.XPATH,
+                        "//main[@id='main']/div[@class='mainContent']/form/div[2]/div/input",
                     )
                 )
-                continueBtn.click()
-                sleep(1)
-            except Exception as e:
-                print(f"Continue button not found or not needed: {e}")
+            )
+            continueBtn.click()
+            sleep(budget(1))
+        except Exception as e:
+            print(f"Continue button not found or not needed: {e}")
+
 
+def refresh_available_dates(driver: WebDriver):
+    """Make an already rendered form reload its datepicker dates without a page load"""
+    driver.execute_script(
+        "var facility = document.getElementById('appointments_consulate_appointment_facility_id');"
+        "if (facility) { facility.dispatchEvent(new Event('change', {bubbles: true})); }"
+    )
+    sleep(budget(0.5))
+
+
+def legacy_reschedule(
+    driver: WebDriver,
+    date_to_book: date,
+    on_submit=None,
+    known_times=None,
+    time_preferences: TimePreferences | None = None,
+    fallback_dates=(),
+    on_fallback=None,
+):
+    """Enhanced rescheduling with better race condition handling"""
+    try:
+        prepare_appointment_form(driver)
+    except Exception as e:
+        print(f"Unexpected error during rescheduling: {e}")
+        return False
+    # known_times may be a resolver so a prefetch can finish during the reload
+    if callable(known_times):
+        known_times = known_times()
+    if known_times == []:
+        print(f"No times left for {date_to_book}, skipping booking")
+        return False
+    return book_on_form(
+        driver,
+        date_to_book,
+        on_submit,
+        known_times,
+        time_preferences,
+        fallback_dates,
+        on_fallback,
+    )
+
+
+def book_on_form(
+    driver: WebDriver,
+    date_to_book: date,
+    on_submit=None,
+    known_times=None,
+    time_preferences: TimePreferences | None = None,
+    fallback_dates=(),
+    on_fallback=None,
+):
+    """Pick a date and time on an already rendered appointment form and submit it
+
+    on_submit is called right after the Reschedule button is clicked.
+    known_times lists times already known to be free for date_to_book.
+    When the form's earliest date is later than date_to_book but one of the
+    acceptable fallback_dates, it is booked instead and on_fallback(date) is called.
+    """
+    time_preferences = time_preferences or TIME_PREFERENCES
+    try:
         # Find and click date selection box
         try:
-            date_selection_box = WebDriverWait(driver, 10).until(
+            date_selection_box = WebDriverWait(driver, budget(10)).until(
                 EC.element_to_be_clickable(
                     (By.ID, "appointments_consulate_appointment_date_input")
                 )
             )
             date_selection_box.click()
-            sleep(1)  # Reduced delay
+            sleep(budget(1))  # Reduced delay
         except Exception as e:
             print(f"Failed to find date selection box: {e}")
             return False
@@ -88,7 +128,7 @@ def legacy_reschedule(driver: WebDriver, date_to_book: date):
                     By.XPATH, "//div[@id='ui-datepicker-div']/div[2]/div/a"
                 )
                 next_btn.click()
-                sleep(0.5)
+                sleep(budget(0.5))
             except Exception as e:
                 print(f"Failed to move to next month: {e}")
 
@@ -145,7 +185,7 @@ def legacy_reschedule(driver: WebDriver, date_to_book: date):
                 
             # Click the available date
             available_date_btn.click()
-            sleep(1)
+            sleep(budget(1))
             
         except Exception as e:
             print(f"Failed to select available date: {e}")
@@ -153,7 +193,7 @@ def legacy_reschedule(driver: WebDriver, date_to_book: date):
 
         # Confirm selected date
         try:
-            date_box = WebDriverWait(driver, 10).until(
+            date_box = WebDriverWait(driver, budget(10)).until(
                 EC.presence_of_element_located(
                     (By.ID, "appointments_consulate_appointment_date")
                 )
@@ -163,7 +203,14 @@ def legacy_reschedule(driver: WebDriver, date_to_book: date):
             ).date()
             print(f"Selected date: {date_selected}")
             
-            if not date_selected <= date_to_book:
+            if date_selected > date_to_book and date_selected in fallback_dates:
+                print(
+                    f"{datetime.now().strftime('%H:%M:%S')} SLOT '{date_to_book}' taken, "
+                    f"falling back to '{date_selected}'"
+                )
+                if on_fallback:
+                    on_fallback(date_selected)
+            elif not date_selected <= date_to_book:
                 print(
                     f"{datetime.now().strftime('%H:%M:%S')} SLOT '{date_to_book}' no longer available\n"
                 )
@@ -177,27 +224,57 @@ def legacy_reschedule(driver: WebDriver, date_to_book: date):
             print(f"Failed to confirm selected date: {e}")
             return False
 
+        # Go straight to a prefetched time when the picked date is the one it was fetched for
+        time_selected = False
+        if known_times and date_selected == date_to_book:
+            try:
+                preferred_time = rank_times(known_times, time_preferences)[0]
+                time_option = WebDriverWait(driver, budget(10)).until(
+                    EC.element_to_be_clickable(
+                        (
+                            By.CSS_SELECTOR,
+                            f"#appointments_consulate_appointment_time option[value='{preferred_time}']",
+                        )
+                    )
+                )
+                time_option.click()
+                time_selected = True
+                print(f"Selected prefetched time slot: {preferred_time}")
+            except Exception as e:
+                print(f"Prefetched time slot not selectable, falling back: {e}")
+
         # Select time of the date with better slot selection
         try:
-            sleep(1)
-            appointment_time = WebDriverWait(driver, 10).until(
-                EC.element_to_be_clickable((By.ID, "appointments_consulate_appointment_time"))
-            )
-            appointment_time.click()
-            sleep(1)
-            
-            appointment_time_options = appointment_time.find_elements(By.TAG_NAME, "option")
-            
-            # Use improved time slot selection
-            selected_time_option = select_best_time_slot(appointment_time_options)
-            
-            if selected_time_option:
-                selected_time_option.click()
-                print(f"Selected time slot: {selected_time_option.text}")
-            else:
-                print("No valid time slots available")
-                return False
-                
+            if not time_selected:
+                appointment_time = WebDriverWait(driver, budget(10)).until(
+                    EC.element_to_be_clickable((By.ID, "appointments_consulate_appointment_time"))
+                )
+
+                # Read every option in one call once the times have loaded
+                appointment_time_options = WebDriverWait(driver, budget(10)).until(
+                    lambda d: [
+                        option
+                        for option in d.execute_script(READ_OPTIONS_SCRIPT, appointment_time)
+                        if option[0]
+                    ]
+                )
+
+                started_at = perf_counter()
+                selected_time = select_best_time_slot(
+                    appointment_time_options, time_preferences
+                )
+                selection_ms = (perf_counter() - started_at) * 1000
+
+                if selected_time:
+                    driver.execute_script(SELECT_VALUE_SCRIPT, appointment_time, selected_time)
+                    print(
+                        f"Selected time slot: {selected_time} "
+                        f"(ranked {len(appointment_time_options)} option(s) in {selection_ms:.2f} ms)"
+                    )
+                else:
+                    print("No valid time slots available")
+                    return False
+
         except Exception as e:
             print(f"Failed to select time slot: {e}")
             return False
@@ -209,7 +286,9 @@ def legacy_reschedule(driver: WebDriver, date_to_book: date):
                 "//form[@id='appointment-form']/div[2]/fieldset/ol/li/input",
             )
             reschedule_btn.click()
-            sleep(2)
+            if on_submit:
+                on_submit()
+            sleep(budget(2))
             
         except Exception as e:
             print(f"Failed to click reschedule button: {e}")
@@ -217,10 +296,10 @@ def legacy_reschedule(driver: WebDriver, date_to_book: date):
 
         # Handle confirmation dialog
         try:
-            confirm = WebDriverWait(driver, 10).until(
+            confirm = WebDriverWait(driver, budget(10)).until(
                 EC.presence_of_element_located((By.XPATH, "/html/body/div[6]/div/div/a[2]"))
             )
-            sleep(1)
+            sleep(budget(1))
             
             if not TEST_MODE:
                 confirm.click()
@@ -0,0 +1,217 @@
+"""
+Memory watchdog for long runs
+Samples the RSS of this Python process and of the browser process tree
+(chromedriver, Chrome and its renderers) and tells the engine to recycle the
+browser once a threshold stays crossed for several samples in a row. The engine
+only asks between polls, so a booking is never interrupted. Recycles that do
+not bring memory back under the limit make the watchdog wait longer before the
+next one, and after a few of them it stops recycling. Samples can be appended
+to a JSON lines file for capacity planning. Uses psutil when installed,
+otherwise /proc (Linux).
+"""
+
+import json
+import os
+import time
+import tracemalloc
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+from console_utils import Console
+
+MB = 1024 * 1024
+
+
+def _proc_rss(pid: int) -> int:
+    try:
+        with open(f"/proc/{pid}/status") as status_file:
+            for line in status_file:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError):
+        pass
+    return 0
+
+
+def _proc_children() -> dict:
+    """parent pid -> child pids for every visible process"""
+    children = {}
+    try:
+        pids = [int(name) for name in os.listdir("/proc") if name.isdigit()]
+    except OSError:
+        return children
+    for pid in pids:
+        try:
+            with open(f"/proc/{pid}/stat") as stat_file:
+                # The command name may contain spaces; fields resume after ')'
+                parent = int(stat_file.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, ValueError, IndexError):
+            continue
+        children.setdefault(parent, []).append(pid)
+    return children
+
+
+def process_rss(pid: int) -> int:
+    """Resident set size of one process in bytes, 0 when unknown"""
+    if psutil:
+        try:
+            return psutil.Process(pid).memory_info().rss
+        except psutil.Error:
+            return 0
+    return _proc_rss(pid)
+
+
+def process_tree(pid: int) -> list:
+    """pid and all of its descendants"""
+    if psutil:
+        try:
+            root = psutil.Process(pid)
+            return [pid] + [child.pid for child in root.children(recursive=True)]
+        except psutil.Error:
+            return []
+    children = _proc_children()
+    tree, pending = [], [pid]
+    while pending:
+        current = pending.pop()
+        tree.append(current)
+        pending.extend(children.get(current, []))
+    return tree
+
+
+class MemoryWatchdog:
+    """Periodic RSS sampling with recycle thresholds (in MB, 0 disables one)"""
+
+    def __init__(
+        self,
+        interval: float = 60,
+        browser_limit_mb: float = 1500,
+        python_limit_mb: float = 0,
+        series_file: str = "",
+        trace_python: bool = False,
+        over_limit_samples: int = 3,
+        max_ineffective_recycles: int = 3,
+        clock=time.monotonic,
+    ):
+        self.interval = interval
+        self.browser_limit_mb = browser_limit_mb
+        self.python_limit_mb = python_limit_mb
+        self.series_file = series_file
+        # Samples in a row over a limit before recycling; one spike is not a leak
+        self.over_limit_samples = over_limit_samples
+        # Recycles in a row that leave memory over the limit before giving up (0: never)
+        self.max_ineffective_recycles = max_ineffective_recycles
+        self.clock = clock
+        self.last_sample_at = None
+        self.samples = []
+        self.recycles = 0
+        self.over_limit_streak = 0
+        self.ineffective_recycles = 0
+        # Limit the last recycle was for; the next sample tells whether it helped
+        self.recycled_for = None
+        if trace_python and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def sample(self, browser_pid: int | None) -> dict:
+        browser_pids = process_tree(browser_pid) if browser_pid else []
+        sample = {
+            "at": time.time(),
+            "python_rss_mb": round(process_rss(os.getpid()) / MB, 1),
+            "browser_rss_mb": round(sum(process_rss(pid) for pid in browser_pids) / MB, 1),
+            "browser_processes": len(browser_pids),
+        }
+        if tracemalloc.is_tracing():
+            sample["python_traced_mb"] = round(tracemalloc.get_traced_memory()[0] / MB, 1)
+        self.samples.append(sample)
+        if self.series_file:
+            try:
+                with open(self.series_file, "a") as series_file:
+                    series_file.write(json.dumps(sample) + "\n")
+            except OSError as e:
+                Console.warning(f"Unable to write memory sample: {e}", "MEMORY")
+        return sample
+
+    def check(self, browser_pid: int | None) -> str | None:
+        """Sample when due; return why the browser should be recycled, if it should"""
+        now = self.clock()
+        if self.last_sample_at is not None and now - self.last_sample_at < self.interval:
+            return None
+        self.last_sample_at = now
+        sample = self.sample(browser_pid)
+        Console.info(
+            f"Python {sample['python_rss_mb']} MB, browser {sample['browser_rss_mb']} MB "
+            f"in {sample['browser_processes']} process(es)",
+            "MEMORY",
+        )
+        over = self.over_limit(sample)
+        if self.recycled_for:
+            if over and over[0] == self.recycled_for:
+                self.ineffective_recycles += 1
+                Console.warning(f"Recycling did not help: {over[1]}", "MEMORY")
+                if self.ineffective_recycles == self.max_ineffective_recycles:
+                    Console.warning(
+                        f"Recycling disabled after {self.ineffective_recycles} recycle(s) "
+                        "that left memory over the limit",
+                        "MEMORY",
+                    )
+            else:
+                self.ineffective_recycles = 0
+            self.recycled_for = None
+        if not over:
+            self.over_limit_streak = 0
+            return None
+        self.over_limit_streak += 1
+        if (
+            self.max_ineffective_recycles
+            and self.ineffective_recycles >= self.max_ineffective_recycles
+        ):
+            return None
+        # Each recycle that did not help doubles the streak needed for the next
+        if self.over_limit_streak < self.over_limit_samples * 2**self.ineffective_recycles:
+            return None
+        self.over_limit_streak = 0
+        self.recycled_for = over[0]
+        self.recycles += 1
+        return over[1]
+
+    def over_limit(self, sample: dict) -> tuple | None:
+        """(metric, description) of the first limit the sample is over, if any"""
+        if self.browser_limit_mb and sample["browser_rss_mb"] > self.browser_limit_mb:
+            return (
+                "browser_rss_mb",
+                f"browser RSS {sample['browser_rss_mb']} MB over {self.browser_limit_mb} MB",
+            )
+        if self.python_limit_mb and sample["python_rss_mb"] > self.python_limit_mb:
+            return (
+                "python_rss_mb",
+                f"Python RSS {sample['python_rss_mb']} MB over {self.python_limit_mb} MB",
+            )
+        return None
+
+    def summary(self) -> str:
+        if not self.samples:
+            return "no samples"
+        peak_browser = max(sample["browser_rss_mb"] for sample in self.samples)
+        peak_python = max(sample["python_rss_mb"] for sample in self.samples)
+        return (
+            f"{len(self.samples)} sample(s), peak browser {peak_browser} MB, "
+            f"peak Python {peak_python} MB, {self.recycles} recycle(s)"
+        )
+
+    @classmethod
+    def from_settings(cls, settings):
+        """Watchdog from MEMORY_* settings, None when MEMORY_WATCHDOG_INTERVAL is 0"""
+        interval = getattr(settings, "MEMORY_WATCHDOG_INTERVAL", 0)
+        if not interval:
+            return None
+        return cls(
+            interval,
+            getattr(settings, "MEMORY_LIMIT_BROWSER_MB", 1500),
+            getattr(settings, "MEMORY_LIMIT_PYTHON_MB", 0),
+            getattr(settings, "MEMORY_SERIES_FILE", ""),
+            getattr(settings, "MEMORY_TRACEMALLOC", False),
+            getattr(settings, "MEMORY_OVER_LIMIT_SAMPLES", 3),
+            getattr(settings, "MEMORY_MAX_INEFFECTIVE_RECYCLES", 3),
+        )
@@ -0,0 +1,397 @@
+"""
+Offline policy simulator
+Replays recorded or synthetic slot-release timelines through the real
+RescheduleEngine in virtual time, with modeled request, booking and session
+latencies, and reports hit rate, time to book, requests spent and notifications
+sent for each policy. No network, browser or wall-clock waiting is involved.
+Stretches with no open slot are skipped in one step, so idle days cost about
+as much as the sessions they contain.
+
+Usage: python policy_simulator.py [--policies policies.json] [--timeline releases.json]
+
+policies.json maps a policy name to settings overrides, e.g.
+{"fast": {"DATE_REQUEST_DELAY": 10}, "patient": {"LATEST_ACCEPTABLE_DATE": "2025-09-30"}}
+A timeline is a JSON list of {"released_at": seconds, "date": "YYYY-MM-DD", "lifetime": seconds}.
+"""
+
+import argparse
+import json
+import math
+import random
+import statistics
+import threading
+from datetime import date, datetime, timedelta
+from types import SimpleNamespace
+
+from console_utils import Console, muted_console
+from poll_outcomes import PollResult, PollStatus
+from reschedule_engine import Notifier, RescheduleEngine, TimeoutHandler
+from session_backends import SessionBackend
+
+DAY = 86400
+
+DEFAULT_POLICY = {
+    "USER_CONSULATE": "Toronto",
+    "EARLIEST_ACCEPTABLE_DATE": "2025-01-01",
+    "LATEST_ACCEPTABLE_DATE": "2025-06-30",
+    "DATE_REQUEST_DELAY": 30,
+    "DATE_REQUEST_MAX_RETRY": 60,
+    "DATE_REQUEST_MAX_TIME": 30 * 60,
+    "NEW_SESSION_AFTER_FAILURES": 5,
+    "NEW_SESSION_DELAY": 60,
+    "FAIL_RETRY_DELAY": 30,
+    "BOOKING_RETRY_ATTEMPTS": 3,
+    "BOOKING_RETRY_DELAY": 2,
+    "SESSION_RENEWAL_MAX_ATTEMPTS": 4,
+    "SESSION_RENEWAL_DELAY": 5,
+    "RATE_LIMIT_FILE": "",
+}
+
+
+class VirtualClock:
+    """Monotonic virtual time; sleeping only advances the clock"""
+
+    def __init__(self, start: float = 0.0):
+        self.now = start
+
+    def __call__(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float):
+        self.now += max(0.0, seconds)
+
+
+class SlotRelease:
+    """A slot for date that opens at released_at and is gone lifetime seconds later"""
+
+    def __init__(self, released_at: float, slot_date: date, lifetime: float):
+        self.released_at = released_at
+        self.date = slot_date
+        self.lifetime = lifetime
+        self.taken = False
+
+    @property
+    def closes_at(self) -> float:
+        return self.released_at + self.lifetime
+
+
+def synthetic_timeline(
+    days: int,
+    releases_per_day: float = 6,
+    mean_lifetime: float = 120,
+    first_date: date = date(2025, 2, 1),
+    date_span_days: int = 365,
+    seed: int | None = None,
+) -> list:
+    """Poisson slot releases with exponential lifetimes and uniform dates"""
+    rng = random.Random(seed)
+    releases = []
+    released_at = rng.expovariate(releases_per_day / DAY)
+    while released_at < days * DAY:
+        slot_date = first_date + timedelta(days=rng.randrange(date_span_days))
+        releases.append(
+            SlotRelease(released_at, slot_date, rng.expovariate(1 / mean_lifetime))
+        )
+        released_at += rng.expovariate(releases_per_day / DAY)
+    return releases
+
+
+def load_timeline(path: str) -> list:
+    with open(path) as timeline_file:
+        entries = json.load(timeline_file)
+    return sorted(
+        (
+            SlotRelease(
+                entry["released_at"],
+                datetime.strptime(entry["date"], "%Y-%m-%d").date(),
+                entry["lifetime"],
+            )
+            for entry in entries
+        ),
+        key=lambda release: release.released_at,
+    )
+
+
+class SlotBoard:
+    """The site's open slots over a timeline; shared by every session of a trial"""
+
+    def __init__(self, timeline: list):
+        self.timeline = timeline
+        self.next_release = 0
+        self.open_slots = []
+
+    @property
+    def next_release_at(self) -> float:
+        if self.next_release < len(self.timeline):
+            return self.timeline[self.next_release].released_at
+        return math.inf
+
+    def open_at(self, now: float) -> list:
+        while (
+            self.next_release < len(self.timeline)
+            and self.timeline[self.next_release].released_at <= now
+        ):
+            self.open_slots.append(self.timeline[self.next_release])
+            self.next_release += 1
+        self.open_slots = [
+            slot for slot in self.open_slots if slot.closes_at > now and not slot.taken
+        ]
+        return self.open_slots
+
+
+class Latencies:
+    """Modeled durations in virtual seconds"""
+
+    def __init__(
+        self,
+        poll: float = 0.5,
+        login: float = 8.0,
+        booking: float = 6.0,
+        session_lifetime: float = 2 * 3600,
+    ):
+        self.poll = poll
+        self.login = login
+        self.booking = booking
+        self.session_lifetime = session_lifetime
+
+
+class SimulatedBackend(SessionBackend):
+    """Backend answering from a SlotBoard in virtual time"""
+
+    name = "simulated"
+
+    def __init__(
+        self,
+        settings,
+        board: SlotBoard,
+        clock: VirtualClock,
+        latencies: Latencies,
+        stats,
+        horizon: float | None = None,
+    ):
+        super().__init__(settings)
+        self.board = board
+        self.clock = clock
+        self.latencies = latencies
+        self.stats = stats
+        # With a horizon, idle stretches between events are skipped (see fast_forward)
+        self.horizon = horizon
+        self.schedule_id = "0"
+        self.session_expires_at = 0.0
+
+    def _open_slots(self) -> list:
+        return self.board.open_at(self.clock())
+
+    def login(self) -> None:
+        self.stats.requests += 1
+        self.clock.sleep(self.latencies.login)
+        self.session_expires_at = self.clock() + self.latencies.session_lifetime
+
+    def open_appointment_page(self) -> None:
+        self.stats.requests += 1
+        self.clock.sleep(self.latencies.poll)
+
+    def get_available_dates(self, request_tracker, facility_id=None) -> PollResult:
+        request_tracker.retry()
+        self.stats.requests += 1
+        self.clock.sleep(self.latencies.poll)
+        if self.clock() >= self.session_expires_at:
+            return PollResult(PollStatus.SESSION_EXPIRED, status_code=401)
+        dates = sorted({slot.date for slot in self._open_slots()})
+        if not dates and self.horizon is not None:
+            self.fast_forward(request_tracker)
+        return PollResult(PollStatus.OK if dates else PollStatus.EMPTY, dates, 200)
+
+    def fast_forward(self, request_tracker):
+        """Absorb the empty polls the engine would make before anything changes
+
+        Each skipped poll is one request and one poll + DATE_REQUEST_DELAY of
+        virtual time. Skipping stops short of the next release, the session
+        expiry, the tracker's limits and the horizon, so the engine sees the
+        same outcomes at the same times as when it polls every tick.
+        """
+        now = self.clock()
+        delay = self.settings.DATE_REQUEST_DELAY
+        period = self.latencies.poll + delay
+        if period <= 0:
+            return
+        next_release = self.board.next_release_at
+        # Skipped poll j starts at now + delay + (j - 1) * period and ends at now + j * period
+        elapsed = now + delay - request_tracker.start_time
+        limits = [
+            request_tracker.max_retries - request_tracker.retries + 1,
+            (request_tracker.max_time - elapsed) / period + 1,
+            (self.horizon - delay - now) / period,
+            # Strictly before expiry and the next release
+            before(self.session_expires_at - now, period),
+            before(next_release - now, period),
+        ]
+        skipped = min(limits)
+        if skipped < 1:
+            return
+        skipped = int(skipped)
+        request_tracker.retries += skipped
+        self.stats.requests += skipped
+        self.clock.sleep(skipped * period)
+
+    def book(self, date_to_book: date, times_future=None, fallback_dates=()) -> bool:
+        self.stats.requests += 1
+        self.clock.sleep(self.latencies.booking)
+        self.last_submit_at = self.clock()
+        candidates = [date_to_book, *fallback_dates]
+        for index, candidate in enumerate(candidates):
+            for slot in self._open_slots():
+                if slot.date == candidate:
+                    slot.taken = True
+                    self.booked_date = candidate
+                    return True
+            if index + 1 < len(candidates):
+                self.record_fallback(candidate, "taken")
+        return False
+
+    def reset_session(self) -> None:
+        self.session_expires_at = 0.0
+
+    def quit(self) -> None:
+        pass
+
+
+def before(span: float, period: float) -> float:
+    """Whole periods that end strictly inside span"""
+    return math.ceil(span / period) - 1 if math.isfinite(span) else math.inf
+
+
+class CountingNotifier(Notifier):
+    def __init__(self, stats):
+        self.stats = stats
+        self.lock = threading.Lock()
+
+    def _count(self):
+        with self.lock:
+            self.stats.notifications += 1
+
+    def slot_found(self, date_str, consulate):
+        self._count()
+
+    def reschedule_success(self, date_str, consulate):
+        self._count()
+
+    def reschedule_failed(self, date_str, consulate, error_msg):
+        self._count()
+
+
+def simulate_trial(
+    policy: dict,
+    timeline: list,
+    horizon: float,
+    latencies: Latencies,
+    fast_forward: bool = True,
+):
+    """Run one applicant from t=0 until booked or the horizon is reached"""
+    for slot in timeline:
+        slot.taken = False
+    settings = SimpleNamespace(**{**DEFAULT_POLICY, **policy})
+    clock = VirtualClock()
+    board = SlotBoard(timeline)
+    stats = SimpleNamespace(
+        booked=False, time_to_book=None, requests=0, notifications=0
+    )
+    engine = RescheduleEngine(
+        settings,
+        backend_factory=lambda: SimulatedBackend(
+            settings, board, clock, latencies, stats, horizon if fast_forward else None
+        ),
+        notifier=CountingNotifier(stats),
+        timeout_handler=TimeoutHandler(horizon, clock),
+        clock=clock,
+        sleep=clock.sleep,
+    )
+    try:
+        if engine.run():
+            stats.booked = True
+            stats.time_to_book = clock()
+    finally:
+        engine.executor.shutdown(wait=True)
+    return stats
+
+
+def simulate_policies(
+    policies: dict,
+    timelines: list,
+    horizon: float,
+    latencies: Latencies | None = None,
+    fast_forward: bool = True,
+) -> dict:
+    """policy name -> summary over every timeline
+
+    fast_forward=False polls every tick; slower, for checking the skipping.
+    """
+    latencies = latencies or Latencies()
+    report = {}
+    with muted_console():
+        for name, policy in policies.items():
+            trials = [
+                simulate_trial(policy, timeline, horizon, latencies, fast_forward)
+                for timeline in timelines
+            ]
+            booked_times = [trial.time_to_book for trial in trials if trial.booked]
+            report[name] = {
+                "trials": len(trials),
+                "hit_rate": len(booked_times) / len(trials),
+                "median_hours_to_book": (
+                    statistics.median(booked_times) / 3600 if booked_times else None
+                ),
+                "requests_per_trial": statistics.mean(t.requests for t in trials),
+                "notifications_per_trial": statistics.mean(
+                    t.notifications for t in trials
+                ),
+            }
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--policies", help="JSON file of policy name -> settings overrides")
+    parser.add_argument("--timeline", help="recorded slot-release timeline (JSON)")
+    parser.add_argument("--trials", type=int, default=50, help="synthetic timelines")
+    parser.add_argument("--days", type=int, default=30, help="days per trial")
+    parser.add_argument("--releases-per-day", type=float, default=6)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    if args.policies:
+        with open(args.policies) as policies_file:
+            policies = json.load(policies_file)
+    else:
+        policies = {
+            "default": {},
+            "fast_polling": {"DATE_REQUEST_DELAY": 10},
+            "single_booking_attempt": {"BOOKING_RETRY_ATTEMPTS": 1},
+        }
+    if args.timeline:
+        timelines = [load_timeline(args.timeline)]
+        horizon = max((slot.closes_at for slot in timelines[0]), default=0)
+    else:
+        timelines = [
+            synthetic_timeline(
+                args.days, args.releases_per_day, seed=args.seed + trial
+            )
+            for trial in range(args.trials)
+        ]
+        horizon = args.days * DAY
+
+    report = simulate_policies(policies, timelines, horizon)
+    Console.separator("POLICY SIMULATION")
+    for name, summary in report.items():
+        hours = summary["median_hours_to_book"]
+        Console.info(
+            f"hit rate {summary['hit_rate']:.0%}, "
+            f"median time to book {'-' if hours is None else f'{hours:.1f}h'}, "
+            f"{summary['requests_per_trial']:.0f} requests, "
+            f"{summary['notifications_per_trial']:.1f} notifications per trial",
+            name.upper(),
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,427 @@
+"""
+Typed availability poll outcomes, conditional polling, the circuit breaker
+guarding the poll loop and the coverage and bandwidth metrics
+"""
+
+import json
+import math
+import re
+import time
+from collections import deque
+from datetime import date
+from enum import Enum
+
+import requests
+
+from console_utils import Console
+from deadline import DeadlineExceeded
+
+
+class PollStatus(Enum):
+    OK = "ok"
+    EMPTY = "empty"
+    SESSION_EXPIRED = "session_expired"
+    RATE_LIMITED = "rate_limited"
+    SERVER_ERROR = "server_error"
+    NETWORK_ERROR = "network_error"
+    PARSE_ERROR = "parse_error"
+    # The run budget was spent, or shutdown requested, before the request went out
+    DEADLINE = "deadline"
+
+
+# Outcomes that say the site (or the path to it) is unhealthy
+FAILURE_STATUSES = {
+    PollStatus.RATE_LIMITED,
+    PollStatus.SERVER_ERROR,
+    PollStatus.NETWORK_ERROR,
+    PollStatus.PARSE_ERROR,
+}
+
+
+class PollResult:
+    """Outcome of one availability poll"""
+
+    # Approximate request and response size on the wire, set when known
+    bytes_in = 0
+    bytes_out = 0
+
+    def __init__(
+        self,
+        status: PollStatus,
+        dates: list | None = None,
+        status_code: int | None = None,
+        retry_after: float | None = None,
+        error: str = "",
+        unchanged: bool = False,
+    ):
+        self.status = status
+        self.dates = dates or []
+        self.status_code = status_code
+        self.retry_after = retry_after
+        self.error = error
+        # Same dates as the previous poll of this URL, confirmed by a 304
+        self.unchanged = unchanged
+
+    @property
+    def failed(self) -> bool:
+        return self.status in FAILURE_STATUSES
+
+    def __repr__(self):
+        return f"PollResult({self.status.value}, dates={len(self.dates)}, status_code={self.status_code})"
+
+
+DATE_FIELD = re.compile(rb'"date"\s*:\s*"(\d{4})-(\d{2})-(\d{2})"')
+
+
+def parse_iso_date(value: str) -> date:
+    """Fixed-format YYYY-MM-DD parse, much cheaper than strptime"""
+    if len(value) != 10 or value[4] != "-" or value[7] != "-":
+        raise ValueError(f"Not a YYYY-MM-DD date: {value!r}")
+    return date(int(value[0:4]), int(value[5:7]), int(value[8:10]))
+
+
+def parse_available_dates(content: bytes, latest_date: date | None = None) -> list:
+    """Dates from a days/{id}.json body, sorted
+
+    With latest_date the endpoint's ascending order is relied on: the scan
+    stops at the first date after latest_date, keeping it so the earliest date
+    is always known. Bodies that are not in order are fully parsed instead.
+    """
+    if latest_date is not None:
+        dates = []
+        for match in DATE_FIELD.finditer(content):
+            year, month, day = match.groups()
+            found = date(int(year), int(month), int(day))
+            if dates and found < dates[-1]:
+                break  # out of order: fall back to the full parse
+            dates.append(found)
+            if found > latest_date:
+                return dates
+        else:
+            if dates:
+                return dates
+    return sorted(parse_iso_date(item["date"]) for item in json.loads(content))
+
+
+def parse_retry_after(value: str | None) -> float | None:
+    """Parse a Retry-After header given in seconds"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        return None
+
+
+def classify_exception(e: Exception) -> PollResult:
+    """Map a failed availability request to a typed outcome"""
+    if isinstance(e, DeadlineExceeded):
+        Console.warning(f"No time left for the availability request: {e}", "DEADLINE")
+        return PollResult(PollStatus.DEADLINE, error=str(e))
+    Console.error(f"Get available dates request failed: {type(e).__name__}", "REQUEST")
+    if isinstance(e, requests.exceptions.RequestException):
+        return PollResult(PollStatus.NETWORK_ERROR, error=str(e))
+    return PollResult(PollStatus.PARSE_ERROR, error=str(e))
+
+
+def classify_status(status_code: int, headers, size: int) -> PollResult | None:
+    """Typed outcome for a non-200 days/{id}.json status, None for 200"""
+    if status_code == 401:
+        Console.warning("Session expired - need to create new session", "SESSION")
+        return PollResult(PollStatus.SESSION_EXPIRED, status_code=status_code)
+    if status_code == 403:
+        # On this site a 403 means a bad session or CSRF token, not throttling
+        Console.warning("Access denied (403) - need to create new session", "SESSION")
+        return PollResult(PollStatus.SESSION_EXPIRED, status_code=status_code)
+    if status_code == 429:
+        retry_after = parse_retry_after(headers.get("Retry-After"))
+        Console.warning(f"Rate limited with status code {status_code}", "HTTP")
+        return PollResult(
+            PollStatus.RATE_LIMITED, status_code=status_code, retry_after=retry_after
+        )
+    if status_code != 200:
+        Console.error(f"Failed with status code {status_code} ({size} bytes)", "HTTP")
+        return PollResult(
+            PollStatus.SERVER_ERROR,
+            status_code=status_code,
+            retry_after=parse_retry_after(headers.get("Retry-After")),
+        )
+    return None
+
+
+def classify_response(response, latest_date: date | None = None) -> PollResult:
+    """Turn a days/{id}.json response into a typed outcome with sorted dates
+
+    latest_date enables the early-exit parse (see parse_available_dates).
+    """
+    status_code = response.status_code
+    failure = classify_status(status_code, response.headers, len(response.content))
+    if failure:
+        return failure
+    try:
+        dates = parse_available_dates(response.content, latest_date)
+    except Exception as e:
+        Console.error(
+            f"Failed to parse dates response ({len(response.content)} bytes)", "PARSE"
+        )
+        return PollResult(PollStatus.PARSE_ERROR, status_code=status_code, error=str(e))
+    if not dates:
+        Console.info("No available dates found.")
+        return PollResult(PollStatus.EMPTY, status_code=status_code)
+    return PollResult(PollStatus.OK, dates, status_code=status_code)
+
+
+def transfer_sizes(response) -> tuple:
+    """(bytes out, bytes in) for a requests response, headers included
+
+    The body counts as received on the wire, so compression shows up.
+    """
+    request = getattr(response, "request", None)
+    bytes_out = 0
+    if request is not None:
+        bytes_out = len(f"{request.method} {request.url} HTTP/1.1\r\n\r\n")
+        bytes_out += sum(len(k) + len(v) + 4 for k, v in request.headers.items())
+        bytes_out += len(request.body or b"")
+    headers = getattr(response, "headers", {})
+    body = getattr(getattr(response, "raw", None), "tell", None)
+    try:
+        body_bytes = body() if body else int(headers.get("Content-Length"))
+    except (TypeError, ValueError):
+        body_bytes = len(response.content)
+    header_bytes = sum(len(k) + len(v) + 4 for k, v in headers.items())
+    return bytes_out, len("HTTP/1.1 200 OK\r\n\r\n") + header_bytes + body_bytes
+
+
+class ConditionalPolls:
+    """ETag / Last-Modified validators and the outcome they stand for, per URL
+
+    A poll sends the validators back; a 304 reuses the stored outcome without
+    downloading or parsing the body again.
+    """
+
+    def __init__(self):
+        self.entries = {}  # url -> (etag, last_modified, PollResult)
+
+    def validators(self, url: str) -> tuple:
+        etag, last_modified, _ = self.entries.get(url, (None, None, None))
+        return etag, last_modified
+
+    def headers(self, url: str) -> dict:
+        etag, last_modified = self.validators(url)
+        headers = {}
+        if etag:
+            headers["If-None-Match"] = etag
+        if last_modified:
+            headers["If-Modified-Since"] = last_modified
+        return headers
+
+    def unchanged(self, url: str) -> PollResult | None:
+        """The stored outcome for a 304, None when nothing is stored"""
+        if url not in self.entries:
+            return None
+        stored = self.entries[url][2]
+        return PollResult(stored.status, stored.dates, 304, unchanged=True)
+
+    def remember(self, url: str, etag, last_modified, result: PollResult):
+        if result.status in (PollStatus.OK, PollStatus.EMPTY) and (etag or last_modified):
+            self.entries[url] = (etag, last_modified, result)
+        else:
+            self.entries.pop(url, None)
+
+    def forget(self):
+        """Read the next polls in full, e.g. before acting on their dates again"""
+        self.entries.clear()
+
+
+def classify_fetch_result(result) -> PollResult:
+    """Typed outcome for the in-page fetch script's result
+
+    The script resolves to {"status", "retryAfter", "size", "dates"} or, when the
+    request never completed, {"error"}.
+    """
+    if not isinstance(result, dict) or "status" not in result:
+        error = result.get("error") if isinstance(result, dict) else repr(result)
+        Console.error(f"In-page availability fetch failed: {error}", "REQUEST")
+        return PollResult(PollStatus.NETWORK_ERROR, error=str(error))
+    status_code = result["status"]
+    failure = classify_status(
+        status_code, {"Retry-After": result.get("retryAfter")}, result.get("size") or 0
+    )
+    if failure:
+        return failure
+    try:
+        dates = sorted(parse_iso_date(value) for value in result["dates"])
+    except Exception as e:
+        Console.error(f"Failed to parse in-page dates response: {result.get('error', e)}", "PARSE")
+        return PollResult(PollStatus.PARSE_ERROR, status_code=status_code, error=str(e))
+    if not dates:
+        Console.info("No available dates found.")
+        return PollResult(PollStatus.EMPTY, status_code=status_code)
+    return PollResult(PollStatus.OK, dates, status_code=status_code)
+
+
+class CircuitBreaker:
+    """Stop polling during outages and probe with a single request before resuming
+
+    closed     : polls flow normally, consecutive failures are counted
+    open       : no polls until the cooldown (doubling up to max_cooldown) elapses
+    half_open  : one probe poll decides between closed and open
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(
+        self,
+        failure_threshold: int = 5,
+        cooldown: float = 60,
+        max_cooldown: float = 900,
+        clock=time.monotonic,
+    ):
+        self.failure_threshold = failure_threshold
+        self.base_cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.clock = clock
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.cooldown = cooldown
+        self.opened_at = None
+        self.retry_at = None
+        # Outcome and transition counters, e.g. {PollStatus.OK: 10, "closed->open": 1}
+        self.metrics = {}
+        self.transitions = []
+
+    def _count(self, key: str):
+        self.metrics[key] = self.metrics.get(key, 0) + 1
+
+    def _transition(self, new_state: str, reason: str):
+        old_state = self.state
+        self.state = new_state
+        self._count(f"{old_state}->{new_state}")
+        self.transitions.append((self.clock(), old_state, new_state, reason))
+        Console.warning(
+            f"Circuit breaker {old_state} -> {new_state} ({reason})", "BREAKER"
+        )
+
+    def wait_time(self) -> float:
+        """Seconds until a poll is allowed; moves open to half_open when due"""
+        if self.state != self.OPEN:
+            return 0
+        remaining = self.retry_at - self.clock()
+        if remaining > 0:
+            return remaining
+        self._transition(self.HALF_OPEN, "cooldown elapsed, probing")
+        return 0
+
+    def record(self, result: PollResult):
+        self.metrics[result.status] = self.metrics.get(result.status, 0) + 1
+        if result.failed:
+            self.consecutive_failures += 1
+            if self.state == self.HALF_OPEN:
+                self.cooldown = min(self.cooldown * 2, self.max_cooldown)
+                self._open(result, "probe failed")
+            elif self.consecutive_failures >= self.failure_threshold:
+                self._open(result, f"{self.consecutive_failures} consecutive failures")
+            return
+
+        self.consecutive_failures = 0
+        if self.state != self.CLOSED:
+            self.cooldown = self.base_cooldown
+            self._transition(self.CLOSED, f"poll returned {result.status.value}")
+
+    def _open(self, result: PollResult, reason: str):
+        cooldown = max(self.cooldown, result.retry_after or 0)
+        self.opened_at = self.clock()
+        self.retry_at = self.opened_at + cooldown
+        self._transition(self.OPEN, f"{reason}, retry in {cooldown:.0f}s")
+
+    def summary(self) -> str:
+        counts = {getattr(key, "value", key): value for key, value in self.metrics.items()}
+        return ", ".join(f"{key}={value}" for key, value in sorted(counts.items()))
+
+
+class TransferStats:
+    """Polls, 304s and bytes on the wire"""
+
+    def __init__(self):
+        self.polls = 0
+        self.unchanged = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+
+    def record(self, result: PollResult):
+        self.polls += 1
+        self.unchanged += result.unchanged
+        self.bytes_in += result.bytes_in
+        self.bytes_out += result.bytes_out
+
+    def __add__(self, other: "TransferStats") -> "TransferStats":
+        total = TransferStats()
+        for name in ("polls", "unchanged", "bytes_in", "bytes_out"):
+            setattr(total, name, getattr(self, name) + getattr(other, name))
+        return total
+
+    def summary(self) -> str:
+        if not self.polls:
+            return "no polls"
+        return (
+            f"{self.polls} polls ({self.unchanged} unchanged), "
+            f"{self.bytes_in / 1024:.1f} KB in / {self.bytes_out / 1024:.1f} KB out, "
+            f"{self.bytes_in / self.polls:.0f} B in per poll"
+        )
+
+
+class CoverageTracker:
+    """Fraction of recent time during which availability was known
+
+    A successful poll (ok or empty) covers the stale_after seconds after it.
+    coverage() is the covered share of the last `window` seconds (or of the
+    time since tracking started, if shorter).
+    """
+
+    def __init__(self, window: float = 3600, stale_after: float = 60, clock=time.monotonic):
+        self.window = window
+        self.stale_after = stale_after
+        self.clock = clock
+        self.started_at = clock()
+        # Covered spans before the current one, as (begin, end); back-to-back
+        # polls only extend the current span, so recording is a comparison
+        self.spans = deque()
+        self.span_begin = self.span_end = -math.inf
+
+    def record(self, result: PollResult):
+        if result.status is not PollStatus.OK and result.status is not PollStatus.EMPTY:
+            return
+        now = self.clock()
+        if now > self.span_end:
+            self.spans.append((self.span_begin, self.span_end))
+            # One span in, at most one out: enough to keep up with the window
+            if self.spans[0][1] < now - self.window:
+                self.spans.popleft()
+            self.span_begin = now
+        self.span_end = now + self.stale_after
+
+    def coverage(self) -> float:
+        now = self.clock()
+        start = max(now - self.window, self.started_at)
+        if now <= start:
+            return 0.0
+        covered = 0.0
+        for begin, end in (*self.spans, (self.span_begin, self.span_end)):
+            covered += max(0.0, min(end, now) - max(begin, start))
+        return covered / (now - start)
+
+    def summary(self) -> str:
+        return f"{self.coverage():.1%} of the last {self.window / 60:.0f} min"
+
+    @classmethod
+    def from_settings(cls, settings, clock=time.monotonic):
+        """COVERAGE_WINDOW and COVERAGE_STALE_AFTER (default: 3 poll intervals)"""
+        return cls(
+            getattr(settings, "COVERAGE_WINDOW", 3600),
+            getattr(
+                settings, "COVERAGE_STALE_AFTER", 3 * getattr(settings, "DATE_REQUEST_DELAY", 20)
+            ),
+            clock,
+        )
@@ -0,0 +1,144 @@
+"""
+Host-wide token bucket rate limiter shared by every rescheduler process
+Bucket state lives in a small JSON file guarded by an exclusive file lock, so
+separate processes and containers (with the file on a shared volume) draw from
+the same per-endpoint budget
+"""
+
+import json
+import os
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows: fall back to locking within this process only
+    fcntl = None
+
+from console_utils import Console
+from shutdown import interruptible_sleep, shutdown_requested
+
+
+class SharedRateLimiter:
+    """Per-endpoint token buckets backed by a file-locked state file
+
+    buckets maps an endpoint name to (tokens per second, burst capacity).
+    Endpoints without a bucket are not limited.
+    """
+
+    def __init__(
+        self, path: str, buckets: dict, clock=time.time, sleep=interruptible_sleep
+    ):
+        self.path = path
+        self.lock_path = path + ".lock"
+        self.buckets = buckets
+        self.clock = clock
+        self.sleep = sleep
+        self.thread_lock = threading.Lock()
+        # Seconds this process spent waiting, and acquisitions, per endpoint
+        self.waited = {}
+        self.acquired = {}
+
+    def _locked(self, update):
+        """Run update(state) under the host-wide lock and persist the result"""
+        with self.thread_lock:
+            with open(self.lock_path, "a") as lock_file:
+                if fcntl:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    try:
+                        with open(self.path) as state_file:
+                            state = json.load(state_file)
+                    except (OSError, ValueError):
+                        state = {}
+                    result = update(state)
+                    tmp_path = f"{self.path}.{os.getpid()}.tmp"
+                    with open(tmp_path, "w") as state_file:
+                        json.dump(state, state_file)
+                    os.replace(tmp_path, self.path)
+                    return result
+                finally:
+                    if fcntl:
+                        fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _try_take(self, endpoint: str, state: dict) -> float:
+        """Take a token if possible; return 0 on success or the seconds to wait"""
+        rate, capacity = self.buckets[endpoint]
+        now = self.clock()
+        bucket = state.setdefault(
+            endpoint, {"tokens": capacity, "updated": now, "blocked_until": 0}
+        )
+        elapsed = max(0.0, now - bucket["updated"])
+        bucket["tokens"] = min(capacity, bucket["tokens"] + elapsed * rate)
+        bucket["updated"] = now
+        if bucket["blocked_until"] > now:
+            return bucket["blocked_until"] - now
+        if bucket["tokens"] >= 1:
+            bucket["tokens"] -= 1
+            return 0
+        return (1 - bucket["tokens"]) / rate
+
+    def acquire(self, endpoint: str) -> float | None:
+        """Block until the endpoint's bucket yields a token; return seconds waited
+
+        None when shutdown cut the wait short and no token was taken.
+        """
+        if endpoint not in self.buckets:
+            return 0
+        waited = 0.0
+        while True:
+            wait = self._locked(lambda state: self._try_take(endpoint, state))
+            if wait <= 0:
+                break
+            self.sleep(wait)
+            waited += wait
+            if shutdown_requested():
+                Console.warning(f"Shutdown requested while waiting for {endpoint}", "RATE")
+                return None
+        self.waited[endpoint] = self.waited.get(endpoint, 0) + waited
+        self.acquired[endpoint] = self.acquired.get(endpoint, 0) + 1
+        if waited >= 1:
+            Console.info(f"Rate limiter held {endpoint} for {waited:.1f}s", "RATE")
+        return waited
+
+    def defer(self, endpoint: str, seconds: float):
+        """Block the endpoint for every process, e.g. to honour Retry-After"""
+        if endpoint not in self.buckets or not seconds:
+            return
+
+        def block(state):
+            rate, capacity = self.buckets[endpoint]
+            bucket = state.setdefault(
+                endpoint,
+                {"tokens": capacity, "updated": self.clock(), "blocked_until": 0},
+            )
+            bucket["blocked_until"] = max(
+                bucket["blocked_until"], self.clock() + seconds
+            )
+
+        self._locked(block)
+        Console.warning(f"Deferring {endpoint} requests for {seconds:.0f}s", "RATE")
+
+    def summary(self) -> str:
+        return ", ".join(
+            f"{endpoint}: {count} request(s), waited {self.waited.get(endpoint, 0):.1f}s"
+            for endpoint, count in sorted(self.acquired.items())
+        )
+
+    @classmethod
+    def from_settings(cls, settings):
+        """Build the limiter from RATE_LIMIT_* settings, None when disabled"""
+        path = getattr(settings, "RATE_LIMIT_FILE", "")
+        if not path:
+            return None
+        buckets = {}
+        polls_per_minute = getattr(settings, "RATE_LIMIT_POLLS_PER_MINUTE", 0)
+        if polls_per_minute:
+            buckets["days"] = (polls_per_minute / 60, max(1, polls_per_minute // 6))
+        times_per_minute = getattr(settings, "RATE_LIMIT_TIMES_PER_MINUTE", 0)
+        if times_per_minute:
+            buckets["times"] = (times_per_minute / 60, max(1, times_per_minute // 6))
+        logins_per_hour = getattr(settings, "RATE_LIMIT_LOGINS_PER_HOUR", 0)
+        if logins_per_hour:
+            buckets["login"] = (logins_per_hour / 3600, max(1, logins_per_hour // 10))
+        return cls(path, buckets)
@@ -4,11 +4,12 @@ from console_utils import Console
 
 
 class RequestTracker:
-    def __init__(self, max_retries, max_time):
+    def __init__(self, max_retries, max_time, clock=time.monotonic):
         self.retries = 0
         self.max_retries = max_retries
         self.max_time = max_time
-        self.start_time = time.time()
+        self.clock = clock
+        self.start_time = clock()
 
     def retry(self):
         self.retries += 1
@@ -17,7 +18,7 @@ class RequestTracker:
         if self.retries > self.max_retries:
             Console.max_retries_reached()
             return False
-        elapsed_time = time.time() - self.start_time
+        elapsed_time = self.clock() - self.start_time
         if elapsed_time > self.max_time:
             Console.max_time_reached()
             return False
@@ -1,21 +1,17 @@
 # Try to import cloud settings (environment variables), fallback to local settings
 import os
-import re
-import threading
-import traceback
+import sys
+import tempfile
 from datetime import datetime
-from time import sleep
 
 import requests
-from selenium import webdriver
-from selenium.webdriver.chrome.webdriver import WebDriver
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.webdriver.support.ui import WebDriverWait
 
 from console_utils import Console
-from legacy_rescheduler import legacy_reschedule
-from request_tracker import RequestTracker
+from event_bus import start_event_stream
+from health import start_health_server
+from reschedule_engine import Notifier, RescheduleEngine, TimeoutHandler
+from session_backends import load_schedule_id
+from shutdown import flush_background, install_signal_handlers, start_background
 
 # Import Gmail notification functionality
 try:
@@ -84,6 +80,12 @@ PUSHOVER_ENABLED = os.getenv("PUSHOVER_ENABLED", "true").lower() == "true"
 SHOW_GUI = os.getenv("SHOW_GUI", "false").lower() == "true"
 TEST_MODE = os.getenv("TEST_MODE", "false").lower() == "true"
 DETACH = False  # Always False for cloud
+SESSION_BACKEND = os.getenv("SESSION_BACKEND", "selenium")  # selenium, http or fake
+# browser fills the sign-in form; http posts it and hands the cookies to Chrome
+LOGIN_MODE = os.getenv("LOGIN_MODE", "browser")
+POLL_MODE = os.getenv("POLL_MODE", "replay")
+# Schedule IDs discovered per account, so later sessions skip the Continue page
+SCHEDULE_ID_FILE = os.getenv("SCHEDULE_ID_FILE", "schedule_ids.json")
 NEW_SESSION_AFTER_FAILURES = int(os.getenv("NEW_SESSION_AFTER_FAILURES", "5"))
 NEW_SESSION_DELAY = int(os.getenv("NEW_SESSION_DELAY", "60"))
 TIMEOUT = int(os.getenv("TIMEOUT", "10"))
@@ -95,7 +97,67 @@ DATE_REQUEST_MAX_TIME = int(os.getenv("DATE_REQUEST_MAX_TIME", "1800"))
 # Race condition handling settings
 BOOKING_RETRY_ATTEMPTS = int(os.getenv("BOOKING_RETRY_ATTEMPTS", "3"))
 BOOKING_RETRY_DELAY = int(os.getenv("BOOKING_RETRY_DELAY", "2"))
+MAX_BOOKING_CANDIDATES = int(os.getenv("MAX_BOOKING_CANDIDATES", "3"))
 FAST_MODE = os.getenv("FAST_MODE", "true").lower() == "true"
+STANDBY_TAB = os.getenv("STANDBY_TAB", "false").lower() == "true"
+STANDBY_REFRESH_SECONDS = int(os.getenv("STANDBY_REFRESH_SECONDS", "240"))
+
+# Time slot preferences, e.g. PREFERRED_TIME_RANGES="08:00-11:30,13:00-15:00"
+PREFERRED_TIME_RANGES = os.getenv("PREFERRED_TIME_RANGES", "")
+PREFERRED_TIME_ORDER = os.getenv("PREFERRED_TIME_ORDER", "earliest")  # or latest
+AVOID_TIMES = os.getenv("AVOID_TIMES", "")
+
+# Circuit breaker for availability polling during site outages
+BREAKER_FAILURE_THRESHOLD = int(os.getenv("BREAKER_FAILURE_THRESHOLD", "5"))
+BREAKER_COOLDOWN = int(os.getenv("BREAKER_COOLDOWN", "60"))
+BREAKER_MAX_COOLDOWN = int(os.getenv("BREAKER_MAX_COOLDOWN", "900"))
+
+# Host-wide rate limits shared by every rescheduler on this machine (via RATE_LIMIT_FILE)
+RATE_LIMIT_FILE = os.getenv(
+    "RATE_LIMIT_FILE", os.path.join(tempfile.gettempdir(), "usvisa_rate_limit.json")
+)
+RATE_LIMIT_POLLS_PER_MINUTE = int(os.getenv("RATE_LIMIT_POLLS_PER_MINUTE", "12"))
+RATE_LIMIT_TIMES_PER_MINUTE = int(os.getenv("RATE_LIMIT_TIMES_PER_MINUTE", "30"))
+RATE_LIMIT_LOGINS_PER_HOUR = int(os.getenv("RATE_LIMIT_LOGINS_PER_HOUR", "30"))
+
+# Shared availability cache (availability_cache.py); empty socket path polls directly
+AVAILABILITY_CACHE_SOCKET = os.getenv("AVAILABILITY_CACHE_SOCKET", "")
+AVAILABILITY_CACHE_CONSULATES = os.getenv("AVAILABILITY_CACHE_CONSULATES", "")  # comma-separated, default USER_CONSULATE
+AVAILABILITY_CACHE_TTL = int(os.getenv("AVAILABILITY_CACHE_TTL", "30"))
+AVAILABILITY_CACHE_KEEPALIVE = int(os.getenv("AVAILABILITY_CACHE_KEEPALIVE", "300"))  # seconds between own-session polls
+
+# Append every poll's full date list to this file (JSON lines); "" disables and
+# lets polls stop parsing at the first date after LATEST_ACCEPTABLE_DATE
+AVAILABILITY_HISTORY_FILE = os.getenv("AVAILABILITY_HISTORY_FILE", "")
+
+# Memory watchdog: sample RSS every N seconds (0 disables) and recycle the browser
+# between polls when the browser tree or this process exceeds its limit (MB, 0 = no limit)
+MEMORY_WATCHDOG_INTERVAL = int(os.getenv("MEMORY_WATCHDOG_INTERVAL", "60"))
+MEMORY_LIMIT_BROWSER_MB = int(os.getenv("MEMORY_LIMIT_BROWSER_MB", "1500"))
+MEMORY_LIMIT_PYTHON_MB = int(os.getenv("MEMORY_LIMIT_PYTHON_MB", "0"))
+MEMORY_OVER_LIMIT_SAMPLES = int(os.getenv("MEMORY_OVER_LIMIT_SAMPLES", "3"))
+MEMORY_MAX_INEFFECTIVE_RECYCLES = int(os.getenv("MEMORY_MAX_INEFFECTIVE_RECYCLES", "3"))
+MEMORY_SERIES_FILE = os.getenv("MEMORY_SERIES_FILE", "")  # JSON lines of samples
+MEMORY_TRACEMALLOC = os.getenv("MEMORY_TRACEMALLOC", "false").lower() == "true"
+
+# Replace the browser and login after this many seconds (0: only on expiry)
+SESSION_ROTATE_SECONDS = int(os.getenv("SESSION_ROTATE_SECONDS", "0"))
+# Coverage: share of the last COVERAGE_WINDOW seconds with a poll under COVERAGE_STALE_AFTER old
+COVERAGE_WINDOW = int(os.getenv("COVERAGE_WINDOW", "3600"))
+COVERAGE_STALE_AFTER = int(os.getenv("COVERAGE_STALE_AFTER", str(3 * DATE_REQUEST_DELAY)))
+
+# Seconds an in-flight booking may keep running after SIGTERM / SIGINT
+SHUTDOWN_GRACE_SECONDS = int(os.getenv("SHUTDOWN_GRACE_SECONDS", "30"))
+
+# Event stream (NDJSON over a Unix socket); slow readers lose events, never block polls
+EVENT_SOCKET = os.getenv("EVENT_SOCKET", "")
+EVENT_BUFFER_SIZE = int(os.getenv("EVENT_BUFFER_SIZE", "256"))
+
+# Health endpoint (/livez, /readyz, /health) for supervisors; 0 disables it
+HEALTH_PORT = int(os.getenv("HEALTH_PORT", "0"))
+HEALTH_HOST = os.getenv("HEALTH_HOST", "127.0.0.1")
+HEALTH_MAX_HEARTBEAT_AGE = int(os.getenv("HEALTH_MAX_HEARTBEAT_AGE", "300"))
+HEALTH_MAX_POLL_AGE = int(os.getenv("HEALTH_MAX_POLL_AGE", "300"))
 
 # Session renewal settings
 SESSION_RENEWAL_MAX_ATTEMPTS = int(os.getenv("SESSION_RENEWAL_MAX_ATTEMPTS", "4"))
@@ -103,6 +165,9 @@ SESSION_RENEWAL_DELAY = int(os.getenv("SESSION_RENEWAL_DELAY", "5"))
 
 # Cloud platform timeout
 MAX_RUNTIME_SECONDS = int(os.getenv("MAX_RUNTIME_SECONDS", "18000"))  # 5 hours default
+# Logins and bookings are not started with less than this much runtime left
+LOGIN_BUDGET_SECONDS = int(os.getenv("LOGIN_BUDGET_SECONDS", "60"))
+BOOKING_BUDGET_SECONDS = int(os.getenv("BOOKING_BUDGET_SECONDS", "45"))
 
 # URLs and endpoints
 LOGIN_URL = "https://ais.usvisa-info.com/en-ca/niv/users/sign_in"
@@ -116,128 +181,6 @@ REQUEST_HEADERS = {
 }
 
 
-def get_chrome_driver() -> WebDriver:
-    options = webdriver.ChromeOptions()
-    if not SHOW_GUI:
-        options.add_argument("--headless")
-        options.add_argument("--window-size=1920x1080")
-        options.add_argument("--disable-gpu")
-        options.add_argument("--no-sandbox")  # Required for cloud deployment
-        options.add_argument("--disable-dev-shm-usage")  # Required for cloud deployment
-        options.add_argument("--disable-extensions")
-        options.add_argument("--disable-plugins")
-        options.add_argument("--disable-images")  # Faster loading
-        options.add_argument(
-            "user-agent=Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/132.0.0.0 Safari/537.36"
-        )
-    options.add_experimental_option("detach", DETACH)
-    options.add_argument("--incognito")
-    driver = webdriver.Chrome(options=options)
-    return driver
-
-
-def login(driver: WebDriver) -> None:
-    driver.get(LOGIN_URL)
-    timeout = TIMEOUT
-
-    email_input = WebDriverWait(driver, timeout).until(
-        EC.visibility_of_element_located((By.ID, "user_email"))
-    )
-    email_input.send_keys(USER_EMAIL)
-
-    password_input = WebDriverWait(driver, timeout).until(
-        EC.visibility_of_element_located((By.ID, "user_password"))
-    )
-    password_input.send_keys(USER_PASSWORD)
-
-    policy_checkbox = WebDriverWait(driver, timeout).until(
-        EC.element_to_be_clickable((By.CLASS_NAME, "icheckbox"))
-    )
-    policy_checkbox.click()
-
-    login_button = WebDriverWait(driver, timeout).until(
-        EC.element_to_be_clickable((By.NAME, "commit"))
-    )
-    login_button.click()
-
-
-def get_appointment_page(driver: WebDriver) -> None:
-    timeout = TIMEOUT
-    continue_button = WebDriverWait(driver, timeout).until(
-        EC.element_to_be_clickable((By.LINK_TEXT, "Continue"))
-    )
-    continue_button.click()
-    sleep(2)
-    current_url = driver.current_url
-    url_id = re.search(r"/(\d+)", current_url).group(1)
-    appointment_url = APPOINTMENT_PAGE_URL.format(id=url_id)
-    driver.get(appointment_url)
-
-
-def get_available_dates(
-    driver: WebDriver, request_tracker: RequestTracker
-) -> list | None | str:
-    request_tracker.log_retry()
-    request_tracker.retry()
-    current_url = driver.current_url
-    request_url = current_url + AVAILABLE_DATE_REQUEST_SUFFIX
-    request_header_cookie = "".join(
-        [f"{cookie['name']}={cookie['value']};" for cookie in driver.get_cookies()]
-    )
-    request_headers = REQUEST_HEADERS.copy()
-    request_headers["Cookie"] = request_header_cookie
-    request_headers["User-Agent"] = driver.execute_script("return navigator.userAgent")
-    try:
-        response = requests.get(request_url, headers=request_headers, timeout=30)
-    except Exception as e:
-        error_msg = str(e)
-        Console.error(f"Get available dates request failed: {e}", "REQUEST")
-
-        # Check for specific network connection errors that should trigger login renewal
-        if (
-            ("Connection aborted" in error_msg and "RemoteDisconnected" in error_msg)
-            or "Remote end closed connection" in error_msg
-            or "Connection broken" in error_msg
-            or "ConnectionError" in error_msg
-        ):
-            Console.warning(
-                "Network connection lost - triggering session renewal to login again",
-                "NETWORK",
-            )
-            return "SESSION_EXPIRED"
-
-        return None
-
-    if response.status_code == 401:
-        Console.error(f"Failed with status code {response.status_code}", "HTTP")
-        Console.debug(f"Response Text: {response.text}")
-        # Check if it's a session expiry
-        try:
-            error_data = response.json()
-            if "session expired" in error_data.get("error", "").lower():
-                Console.warning(
-                    "Session expired - need to create new session", "SESSION"
-                )
-                return "SESSION_EXPIRED"
-        except:
-            pass
-        Console.warning("Authentication failed - need to create new session", "SESSION")
-        return "SESSION_EXPIRED"
-    elif response.status_code != 200:
-        Console.error(f"Failed with status code {response.status_code}", "HTTP")
-        Console.debug(f"Response Text: {response.text}")
-        return None
-
-    try:
-        dates_json = response.json()
-    except:
-        Console.error("Failed to decode JSON response", "PARSE")
-        Console.debug(f"Response Text: {response.text}")
-        return None
-    dates = [datetime.strptime(item["date"], "%Y-%m-%d").date() for item in dates_json]
-    return dates
-
-
 def notify_slot_found_async(date_str: str, consulate: str):
     """Send email notification asynchronously when a slot is found"""
 
@@ -276,8 +219,7 @@ Good luck! 🍀
             return False
 
     # Start notification in background thread - don't wait for it
-    notification_thread = threading.Thread(target=send_notification, daemon=True)
-    notification_thread.start()
+    start_background(send_notification)
     Console.info(f"Email notification started in background for slot on {date_str}")
 
 
@@ -358,6 +300,12 @@ def send_pushover_notification(
         return False
 
 
+def appointment_link() -> str:
+    """This account's appointment page, or the sign-in page until its ID is known"""
+    schedule_id = load_schedule_id(sys.modules[__name__])
+    return APPOINTMENT_PAGE_URL.format(id=schedule_id) if schedule_id else LOGIN_URL
+
+
 def notify_slot_found_pushover_and_email(date_str: str, consulate: str):
     """Send both instant Pushover notification and email notification when a slot is found"""
     # Send instant Pushover notification first (synchronous for immediate delivery)
@@ -366,7 +314,7 @@ def notify_slot_found_pushover_and_email(date_str: str, consulate: str):
         message=f"Available at {consulate}!\nThe system is booking automatically.\nCheck your account to confirm!\n\nhttps://ais.usvisa-info.com/en-ca/niv/users/sign_in",
         priority=2,  # Emergency priority for instant delivery
         sound="alien",  # Attention-grabbing sound
-        url="https://ais.usvisa-info.com/en-ca/niv/schedule/60227641/appointment",
+        url=appointment_link(),
         url_title="Login to your account",
     )
 
@@ -413,8 +361,7 @@ Congratulations! 🎉
             return False
 
     # Start notification in background thread
-    notification_thread = threading.Thread(target=send_notification, daemon=True)
-    notification_thread.start()
+    start_background(send_notification)
     Console.info(f"Success notification started in background for {date_str}")
 
 
@@ -475,8 +422,7 @@ https://ais.usvisa-info.com/en-ca/niv/users/sign_in
             return False
 
     # Start notification in background thread
-    notification_thread = threading.Thread(target=send_notification, daemon=True)
-    notification_thread.start()
+    start_background(send_notification)
     Console.info(f"Failure notification started in background for {date_str}")
 
 
@@ -499,208 +445,42 @@ def notify_reschedule_failed_pushover_and_email(
     notify_reschedule_failed_async(date_str, consulate, error_msg)
 
 
-def reschedule(driver: WebDriver, retryCount: int = 0) -> bool | str:
-    date_request_tracker = RequestTracker(
-        retryCount if (retryCount > 0) else DATE_REQUEST_MAX_RETRY,
-        30 * retryCount if (retryCount > 0) else DATE_REQUEST_MAX_TIME,
-    )
-    while date_request_tracker.should_retry():
-        Console.searching("Checking for available appointment dates...")
-        dates = get_available_dates(driver, date_request_tracker)
-
-        # Handle session expiry
-        if dates == "SESSION_EXPIRED":
-            Console.warning(
-                "Session expired during reschedule - triggering new session", "SESSION"
-            )
-            return "SESSION_EXPIRED"
+class PushoverEmailNotifier(Notifier):
+    """Send Pushover and email notifications for engine events"""
 
-        if not dates:
-            Console.error("Error occurred when requesting available dates", "FETCH")
-            Console.waiting(DATE_REQUEST_DELAY, "before retry")
-            sleep(DATE_REQUEST_DELAY)
-            continue
+    def slot_found(self, date_str: str, consulate: str):
+        notify_slot_found_pushover_and_email(date_str, consulate)
 
-        earliest_available_date = dates[0]
-        latest_acceptable_date = datetime.strptime(
-            LATEST_ACCEPTABLE_DATE, "%Y-%m-%d"
-        ).date()
+    def reschedule_success(self, date_str: str, consulate: str):
+        notify_reschedule_success_pushover_and_email(date_str, consulate)
 
-        if earliest_available_date <= latest_acceptable_date:
-            Console.found_slot(str(earliest_available_date))
+    def reschedule_failed(self, date_str: str, consulate: str, error_msg: str):
+        notify_reschedule_failed_pushover_and_email(date_str, consulate, error_msg)
 
-            # Send immediate notification that slot was found (Pushover + email)
-            notify_slot_found_pushover_and_email(
-                str(earliest_available_date), USER_CONSULATE
-            )
 
-            try:
-                Console.info(
-                    f"Attempting to reschedule to {earliest_available_date}..."
-                )
-
-                # Try to reschedule with retry logic for race conditions
-                max_booking_attempts = BOOKING_RETRY_ATTEMPTS
-                for attempt in range(max_booking_attempts):
-                    if attempt > 0:
-                        Console.info(
-                            f"Retry attempt {attempt + 1}/{max_booking_attempts} for booking..."
-                        )
-                        sleep(BOOKING_RETRY_DELAY)  # Use configured delay
-
-                    if legacy_reschedule(driver, earliest_available_date):
-                        Console.reschedule_status(True)
-                        # Send success notification (Pushover + email)
-                        notify_reschedule_success_pushover_and_email(
-                            str(earliest_available_date), USER_CONSULATE
-                        )
-                        return True
-                    else:
-                        if attempt < max_booking_attempts - 1:
-                            Console.warning(
-                                f"Booking attempt {attempt + 1} failed, retrying...",
-                                "BOOKING",
-                            )
-                        else:
-                            Console.reschedule_status(False)
-                            # Send failure notification (Pushover + email)
-                            notify_reschedule_failed_pushover_and_email(
-                                str(earliest_available_date),
-                                USER_CONSULATE,
-                                "Slot no longer available",
-                            )
-                            return False
-
-            except Exception as e:
-                Console.error(f"Rescheduling failed: {e}", "RESCHEDULE")
-                Console.debug(traceback.format_exc())
-                # Send failure notification (Pushover + email)
-                notify_reschedule_failed_pushover_and_email(
-                    str(earliest_available_date), USER_CONSULATE, str(e)
-                )
-                continue
-        else:
-            Console.date_check(str(earliest_available_date), acceptable=False)
-
-        Console.waiting(DATE_REQUEST_DELAY, "before next check")
-        sleep(DATE_REQUEST_DELAY)
-    return False
-
-
-def reschedule_with_new_session(retryCount: int = DATE_REQUEST_MAX_RETRY) -> bool:
-    driver = get_chrome_driver()
-    session_failures = 0
-
-    # Login and setup session
-    while session_failures < NEW_SESSION_AFTER_FAILURES:
-        try:
-            Console.info("Logging into visa appointment system...")
-            login(driver)
-            Console.login_status(True)
-            Console.info("Navigating to appointment page...")
-            get_appointment_page(driver)
-            break
-        except Exception as e:
-            Console.error(f"Unable to get appointment page: {e}", "SESSION")
-            session_failures += 1
-            Console.waiting(FAIL_RETRY_DELAY, "before session retry")
-            sleep(FAIL_RETRY_DELAY)
-            continue
-
-    # Main reschedule loop with session renewal
-    session_renewal_attempts = 0
-    while True:
-        rescheduled = reschedule(driver, retryCount)
-
-        # Handle different return values
-        if rescheduled == "SESSION_EXPIRED":
-            session_renewal_attempts += 1
-            if session_renewal_attempts > SESSION_RENEWAL_MAX_ATTEMPTS:
-                Console.error(
-                    f"Maximum session renewal attempts ({SESSION_RENEWAL_MAX_ATTEMPTS}) exceeded",
-                    "SESSION",
-                )
-                driver.quit()
-                return False
-
-            Console.info(
-                f"Session expired - attempting to renew session (attempt {session_renewal_attempts}/{SESSION_RENEWAL_MAX_ATTEMPTS})..."
-            )
-            try:
-                # Clear cookies and start fresh
-                driver.delete_all_cookies()
-                sleep(SESSION_RENEWAL_DELAY)
-
-                # Navigate back to login page and re-login
-                driver.get(LOGIN_URL)
-                sleep(2)
-                login(driver)
-                Console.login_status(True)
-                Console.info("Navigating to appointment page...")
-                get_appointment_page(driver)
-                Console.success("Session renewed successfully!", "SESSION")
-                # Reset renewal attempts on success
-                session_renewal_attempts = 0
-                # Continue the loop to try rescheduling again
-                continue
-            except Exception as e:
-                Console.error(
-                    f"Failed to renew session (attempt {session_renewal_attempts}): {e}",
-                    "SESSION",
-                )
-                Console.waiting(SESSION_RENEWAL_DELAY, "before next renewal attempt")
-                sleep(SESSION_RENEWAL_DELAY)
-                # Continue to retry session renewal
-                continue
-        elif rescheduled == True:
-            driver.quit()
-            return True
-        else:
-            # rescheduled == False - normal failure, exit
-            driver.quit()
-            return False
-
-
-if __name__ == "__main__":
-    Console.separator("US VISA APPOINTMENT RESCHEDULER")
-    Console.info(
-        f"Target date range: {EARLIEST_ACCEPTABLE_DATE} to {LATEST_ACCEPTABLE_DATE}"
+def build_engine() -> RescheduleEngine:
+    return RescheduleEngine(
+        sys.modules[__name__],
+        notifier=PushoverEmailNotifier(),
+        timeout_handler=(
+            TimeoutHandler(MAX_RUNTIME_SECONDS) if MAX_RUNTIME_SECONDS else None
+        ),
     )
-    Console.info(f"Consulate: {USER_CONSULATE}")
 
-    # Add timeout handling for cloud deployment
-    import time
 
-    start_time = time.time()
-    if MAX_RUNTIME_SECONDS:
-        Console.info(
-            f"Max runtime: {MAX_RUNTIME_SECONDS} seconds ({MAX_RUNTIME_SECONDS / 3600:.1f} hours)"
-        )
-
-    Console.separator()
-
-    session_count = 0
-    while True:
-        # Check timeout for cloud deployment
-        if MAX_RUNTIME_SECONDS:
-            elapsed = time.time() - start_time
-            if elapsed > MAX_RUNTIME_SECONDS:
-                Console.warning(
-                    f"Maximum runtime ({MAX_RUNTIME_SECONDS}s) reached. Exiting gracefully."
-                )
-                break
-            remaining = MAX_RUNTIME_SECONDS - elapsed
-            Console.info(f"Time remaining: {remaining:.0f} seconds")
-
-        session_count += 1
-        Console.session_start(session_count)
-        rescheduled = reschedule_with_new_session()
-        if rescheduled:
-            Console.success("Program completed successfully! Appointment rescheduled.")
-            break
-        else:
-            Console.warning(
-                f"Session #{session_count} failed. Retrying in {NEW_SESSION_DELAY} seconds..."
-            )
-            Console.waiting(NEW_SESSION_DELAY, "before new session")
-            sleep(NEW_SESSION_DELAY)
+if __name__ == "__main__":
+    install_signal_handlers(SHUTDOWN_GRACE_SECONDS)
+    event_stream = start_event_stream(sys.modules[__name__])
+    engine = build_engine()
+    health_server = start_health_server(sys.modules[__name__], engine.health)
+    try:
+        engine.run(retryCount=DATE_REQUEST_MAX_RETRY)
+    except KeyboardInterrupt:
+        Console.warning("Shutdown grace period over - stopping now", "SHUTDOWN")
+    finally:
+        engine.close()
+        flush_background()
+        if event_stream:
+            event_stream.stop()
+        if health_server:
+            health_server.stop()
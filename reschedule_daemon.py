@@ -0,0 +1,132 @@
+"""
+Continuous daemon mode for hosts we run ourselves
+Instead of a cron job with MAX_RUNTIME_SECONDS, the daemon polls without a
+deadline. It rotates the browser and login every SESSION_ROTATE_SECONDS, restarts
+the engine with exponential backoff when it crashes and logs the coverage
+metric: the share of the last COVERAGE_WINDOW seconds backed by a fresh
+successful poll. Run it under systemd or Docker with a restart policy so a dead
+process comes back too.
+"""
+
+import threading
+import time
+import traceback
+from types import SimpleNamespace
+
+from console_utils import Console
+from event_bus import start_event_stream
+from health import HealthState, start_health_server
+from poll_outcomes import CoverageTracker
+from reschedule_engine import RescheduleEngine
+from shutdown import (
+    SHUTDOWN,
+    flush_background,
+    install_signal_handlers,
+    interruptible_sleep,
+    shutdown_requested,
+)
+
+# Import cloud settings if available, fallback to regular settings
+try:
+    import settings_cloud as settings
+except ImportError:
+    import settings
+
+
+def daemon_settings():
+    """The node's settings with sessions only ended by rotation or expiry"""
+    values = {name: getattr(settings, name) for name in dir(settings) if name.isupper()}
+    values.update(
+        DATE_REQUEST_MAX_RETRY=float("inf"),
+        DATE_REQUEST_MAX_TIME=float("inf"),
+        SESSION_ROTATE_SECONDS=getattr(settings, "SESSION_ROTATE_SECONDS", 0) or 3600,
+    )
+    return SimpleNamespace(**values)
+
+
+def restart_delay(crashes: int, base: float, cap: float) -> float:
+    """Exponential backoff before restarting after the given number of crashes"""
+    return min(base * 2 ** (crashes - 1), cap)
+
+
+def report_coverage(coverage: CoverageTracker, interval: float) -> threading.Thread:
+    def report():
+        while not SHUTDOWN.wait(interval):
+            Console.info(f"Coverage: {coverage.summary()}", "DAEMON")
+
+    thread = threading.Thread(target=report, daemon=True)
+    thread.start()
+    return thread
+
+
+def supervise(
+    build_engine,
+    backoff_base: float = 5,
+    backoff_max: float = 300,
+    health: HealthState | None = None,
+    clock=time.monotonic,
+) -> bool:
+    """Run engines until one books or shutdown is requested, restarting after crashes
+
+    The crash count resets once an engine has run for backoff_max seconds.
+    """
+    crashes = 0
+    while not shutdown_requested():
+        engine = build_engine()
+        started_at = clock()
+        try:
+            if engine.run("US VISA APPOINTMENT RESCHEDULER (Daemon)"):
+                return True
+        except Exception as e:
+            if clock() - started_at >= backoff_max:
+                crashes = 0
+            crashes += 1
+            delay = restart_delay(crashes, backoff_base, backoff_max)
+            Console.error(f"Engine crashed: {e}", "DAEMON")
+            Console.debug(traceback.format_exc())
+            Console.waiting(round(delay), f"before restart #{crashes}")
+            if health:
+                health.session_lost()
+                health.beat("restart_backoff", delay)
+            interruptible_sleep(delay)
+        finally:
+            engine.close()
+    return False
+
+
+def main():
+    install_signal_handlers(getattr(settings, "SHUTDOWN_GRACE_SECONDS", 30))
+    event_stream = start_event_stream(settings)
+    engine_settings = daemon_settings()
+    coverage = CoverageTracker.from_settings(engine_settings)
+    # Shared by every engine the supervisor builds, so probes see restarts
+    health = HealthState.from_settings(engine_settings)
+    health_server = start_health_server(settings, health)
+    report_coverage(coverage, getattr(settings, "COVERAGE_REPORT_INTERVAL", 300))
+    Console.info(
+        f"Rotating sessions every {engine_settings.SESSION_ROTATE_SECONDS}s", "DAEMON"
+    )
+
+    def build_engine():
+        return RescheduleEngine(engine_settings, coverage=coverage, health=health)
+
+    try:
+        supervise(
+            build_engine,
+            getattr(settings, "RESTART_BACKOFF_BASE", 5),
+            getattr(settings, "RESTART_BACKOFF_MAX", 300),
+            health,
+        )
+    except KeyboardInterrupt:
+        Console.warning("Shutdown grace period over - stopping now", "SHUTDOWN")
+    finally:
+        Console.info(f"Coverage: {coverage.summary()}", "METRICS")
+        flush_background()
+        if event_stream:
+            event_stream.stop()
+        if health_server:
+            health_server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,765 @@
+"""
+Rescheduling engine shared by reschedule.py and reschedule_cloud.py
+Runs the poll / match / book / renew loop on top of any session backend
+"""
+
+import json
+import time
+import traceback
+from contextlib import nullcontext
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime
+
+from availability_cache import AvailabilityCacheClient
+from console_utils import Console
+from deadline import Deadline, DeadlineExceeded, activate
+from event_bus import BUS, EventBus, EventType
+from health import HealthState
+from memory_watchdog import MemoryWatchdog
+from poll_outcomes import (
+    CircuitBreaker,
+    CoverageTracker,
+    PollResult,
+    PollStatus,
+    TransferStats,
+)
+from rate_limiter import SharedRateLimiter
+from request_tracker import RequestTracker
+from session_backends import (
+    SESSION_EXPIRED,
+    SessionBackend,
+    create_backend,
+    resolve_times,
+)
+from shutdown import interruptible_sleep, shutdown_requested
+
+# Returned by the poll loop when the browser should be replaced at this safe point
+RECYCLE_BROWSER = "RECYCLE_BROWSER"
+
+
+class TimeoutHandler(Deadline):
+    """The job's MAX_RUNTIME_SECONDS budget"""
+
+    def check_timeout(self):
+        # Sleeps are capped at the deadline, so the clock can land exactly on it
+        if self.remaining_time() <= 0:
+            Console.warning(
+                f"Approaching timeout limit ({self.max_runtime_seconds}s). Gracefully shutting down..."
+            )
+            return True
+        return False
+
+
+class LoginMetrics:
+    """Login attempts, successes and time to the appointment page per login path"""
+
+    def __init__(self):
+        self.paths = {}  # path -> [attempts, successes, seconds spent on successes]
+
+    def record(self, path: str, succeeded: bool, seconds: float):
+        stats = self.paths.setdefault(path, [0, 0, 0.0])
+        stats[0] += 1
+        if succeeded:
+            stats[1] += 1
+            stats[2] += seconds
+
+    def summary(self) -> str:
+        if not self.paths:
+            return "no logins"
+        return ", ".join(
+            f"{path} {successes}/{attempts} ok"
+            + (f" avg {seconds / successes:.1f}s" if successes else "")
+            for path, (attempts, successes, seconds) in self.paths.items()
+        )
+
+
+class PollMetrics:
+    """Polls, session expiries and average poll time per poll path"""
+
+    def __init__(self):
+        self.paths = {}  # path -> [polls, session expiries, seconds]
+
+    def record(self, path: str, status: PollStatus, seconds: float):
+        stats = self.paths.get(path)
+        if stats is None:
+            stats = self.paths[path] = [0, 0, 0.0]
+        stats[0] += 1
+        if status == PollStatus.SESSION_EXPIRED:
+            stats[1] += 1
+        stats[2] += seconds
+
+    def summary(self) -> str:
+        if not self.paths:
+            return "no polls"
+        return ", ".join(
+            f"{path} {polls} polls avg {seconds / polls * 1000:.0f}ms,"
+            f" {expiries} session expiries ({expiries / polls:.1%})"
+            for path, (polls, expiries, seconds) in self.paths.items()
+        )
+
+
+class Notifier:
+    """Notification hooks called by the engine; the default does nothing"""
+
+    def slot_found(self, date_str: str, consulate: str):
+        pass
+
+    def reschedule_success(self, date_str: str, consulate: str):
+        pass
+
+    def reschedule_failed(self, date_str: str, consulate: str, error_msg: str):
+        pass
+
+
+class RescheduleEngine:
+    """Poll for earlier dates and book them through a session backend
+
+    settings is any object exposing the usual settings names (a settings
+    module or reschedule.py itself). backend_factory builds a fresh backend
+    for every new session and defaults to the SESSION_BACKEND setting.
+    clock and sleep can be replaced to run the engine in virtual time.
+    """
+
+    def __init__(
+        self,
+        settings,
+        backend_factory=None,
+        notifier: Notifier | None = None,
+        timeout_handler: TimeoutHandler | None = None,
+        stop_check=None,
+        booking_lock=None,
+        clock=time.monotonic,
+        sleep=interruptible_sleep,
+        event_bus: EventBus | None = None,
+        coverage: CoverageTracker | None = None,
+        health: HealthState | None = None,
+    ):
+        self.settings = settings
+        self.clock = clock
+        self._sleep = sleep
+        self.backend_factory = backend_factory or (lambda: create_backend(settings))
+        self.notifier = notifier or Notifier()
+        self.timeout_handler = timeout_handler
+        # Callable returning True when the work must stop (e.g. a lost lease)
+        self.stop_check = stop_check
+        # Context manager factory yielding whether this process may book now
+        self.booking_lock = booking_lock or (lambda: nullcontext(True))
+
+        self.consulate = settings.USER_CONSULATE
+        self.events = event_bus or BUS
+        # Dates of the last successful poll, to spot newly released ones
+        self.seen_dates = None
+        self.latest_acceptable_date = datetime.strptime(
+            settings.LATEST_ACCEPTABLE_DATE, "%Y-%m-%d"
+        ).date()
+        self.date_request_delay = settings.DATE_REQUEST_DELAY
+        self.date_request_max_retry = settings.DATE_REQUEST_MAX_RETRY
+        self.date_request_max_time = settings.DATE_REQUEST_MAX_TIME
+        self.new_session_after_failures = settings.NEW_SESSION_AFTER_FAILURES
+        self.new_session_delay = settings.NEW_SESSION_DELAY
+        self.fail_retry_delay = settings.FAIL_RETRY_DELAY
+        self.booking_retry_attempts = getattr(settings, "BOOKING_RETRY_ATTEMPTS", 3)
+        self.booking_retry_delay = getattr(settings, "BOOKING_RETRY_DELAY", 2)
+        self.session_renewal_max_attempts = getattr(
+            settings, "SESSION_RENEWAL_MAX_ATTEMPTS", 4
+        )
+        self.session_renewal_delay = getattr(settings, "SESSION_RENEWAL_DELAY", 5)
+        # Expected durations; a phase is refused when the deadline leaves less
+        self.login_budget = getattr(settings, "LOGIN_BUDGET_SECONDS", 60)
+        self.booking_budget = getattr(settings, "BOOKING_BUDGET_SECONDS", 45)
+        # Browser and login are replaced after this many seconds (0: never)
+        self.session_rotate_seconds = getattr(settings, "SESSION_ROTATE_SECONDS", 0)
+        self.session_started_at = None
+        self.rotations = 0
+
+        self.login_metrics = LoginMetrics()
+        self.poll_metrics = PollMetrics()
+        # Bytes on the wire for this engine's own polls, per session and per run
+        self.session_transfer = TransferStats()
+        self.earlier_transfer = TransferStats()  # sessions before the current one
+        # Later dates from the same poll tried when the earliest is gone
+        self.max_booking_candidates = getattr(settings, "MAX_BOOKING_CANDIDATES", 3)
+        self.booking_fallbacks = 0
+        self.recovered_slots = 0
+        # (booking flow, detect-to-submit seconds) for every booking attempt
+        self.booking_latencies = []
+        # Shared across sessions so a site outage is not reset by a new login
+        self.breaker = CircuitBreaker(
+            getattr(settings, "BREAKER_FAILURE_THRESHOLD", 5),
+            getattr(settings, "BREAKER_COOLDOWN", 60),
+            getattr(settings, "BREAKER_MAX_COOLDOWN", 900),
+            clock,
+        )
+        # Host-wide request budget shared with other rescheduler processes
+        self.rate_limiter = SharedRateLimiter.from_settings(settings)
+        # JSON lines of every poll's full date list, for replay and analysis
+        self.history_file = getattr(settings, "AVAILABILITY_HISTORY_FILE", "")
+        # Recycles the browser between polls when memory grows too large
+        self.memory_watchdog = MemoryWatchdog.from_settings(settings)
+        # Shared availability snapshots published by availability_cache.py
+        self.availability_cache = AvailabilityCacheClient.from_settings(settings)
+        # While the cache serves, our own session still polls this often so an
+        # expired session is renewed before a booking needs it
+        self.cache_keepalive = getattr(settings, "AVAILABILITY_CACHE_KEEPALIVE", 300)
+        self.own_poll_at = 0.0
+        # Passed in by a supervisor so coverage survives engine restarts
+        self.coverage = coverage or CoverageTracker.from_settings(settings, clock)
+        # Phase and heartbeat read by the health endpoint
+        self.health = health or HealthState.from_settings(settings, clock)
+        self.health.deadline = timeout_handler
+        if self.rate_limiter:
+            # Waiting for a token is a planned wait, not a stalled loop
+            self.rate_limiter.sleep = self.wait_for_token
+        # Runs time prefetches and slot notifications alongside booking
+        self.executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="engine")
+
+    def sleep(self, seconds: float):
+        """Wait, but never past the run deadline"""
+        if self.timeout_handler:
+            seconds = min(seconds, self.timeout_handler.remaining_time())
+        self.health.beat(busy_for=seconds)
+        self._sleep(seconds)
+
+    def wait_for_token(self, seconds: float):
+        """Rate limiter wait, reported to the health check as planned"""
+        self.health.beat(busy_for=seconds)
+        self._sleep(seconds)
+
+    def allows(self, phase: str, seconds: float) -> bool:
+        """Whether an expensive phase can still finish before the deadline"""
+        if self.timeout_handler and not self.timeout_handler.allows(seconds):
+            Console.warning(
+                f"Skipping {phase}: {self.timeout_handler.remaining_time():.0f}s left, needs ~{seconds}s",
+                "DEADLINE",
+            )
+            return False
+        return True
+
+    def emit(self, event_type: EventType, **fields):
+        self.events.publish(event_type, consulate=self.consulate, **fields)
+
+    @property
+    def run_transfer(self) -> TransferStats:
+        return self.earlier_transfer + self.session_transfer
+
+    def publish_poll(self, result):
+        """Emit the poll's outcome and every date the previous poll did not offer"""
+        self.emit(
+            EventType.POLL_RESULT,
+            status=result.status.value,
+            dates=[available.isoformat() for available in result.dates],
+            unchanged=result.unchanged,
+            bytes_in=result.bytes_in,
+            bytes_out=result.bytes_out,
+        )
+        if result.status not in (PollStatus.OK, PollStatus.EMPTY) or result.unchanged:
+            return
+        dates = set(result.dates)
+        if self.seen_dates is not None:
+            for available in sorted(dates - self.seen_dates):
+                self.emit(EventType.NEW_DATE, date=available.isoformat())
+        self.seen_dates = dates
+
+    def close(self):
+        """Wait for queued notifications and prefetches to finish"""
+        self.executor.shutdown(wait=True)
+
+    def should_stop(self) -> bool:
+        if shutdown_requested():
+            return True
+        if self.stop_check and self.stop_check():
+            return True
+        return bool(self.timeout_handler and self.timeout_handler.check_timeout())
+
+    def throttle(self, endpoint: str) -> bool:
+        """Wait for the shared rate limiter before hitting an endpoint
+
+        False when shutdown cut the wait short; the request should not go out.
+        """
+        if self.rate_limiter:
+            return self.rate_limiter.acquire(endpoint) is not None
+        return True
+
+    def poll(self, backend: SessionBackend, request_tracker: RequestTracker):
+        """Read availability from the shared cache, else poll with our own session"""
+        if (
+            self.availability_cache
+            and self.clock() - self.own_poll_at < self.cache_keepalive
+        ):
+            result = self.availability_cache.get(self.consulate)
+            if result is not None:
+                request_tracker.retry()
+                return result
+        if not self.throttle("days"):
+            # Ends the attempts like a spent deadline, leaving breaker and health alone
+            return PollResult(PollStatus.DEADLINE, error="shutdown requested")
+        started_at = self.own_poll_at = self.clock()
+        result = backend.get_available_dates(request_tracker)
+        self.poll_metrics.record(backend.poll_path, result.status, self.clock() - started_at)
+        self.session_transfer.record(result)
+        return result
+
+    def record_history(self, result):
+        """Append a poll's dates to the availability history file"""
+        entry = {
+            "at": time.time(),
+            "consulate": self.consulate,
+            "dates": [available.isoformat() for available in result.dates],
+        }
+        try:
+            with open(self.history_file, "a") as history_file:
+                history_file.write(json.dumps(entry) + "\n")
+        except OSError as e:
+            Console.warning(f"Unable to record availability history: {e}", "HISTORY")
+
+    def start_session(self, backend: SessionBackend) -> bool:
+        """Log in and open the appointment page, retrying on failure"""
+        # Requests the backend makes on its own share the host's rate limits
+        backend.throttle = self.throttle
+        session_failures = 0
+        while session_failures < self.new_session_after_failures:
+            if self.should_stop() or not self.allows("login", self.login_budget):
+                return False
+            try:
+                Console.info("Logging into visa appointment system...")
+                if not self.throttle("login"):
+                    return False
+                self.login(backend)
+                self.earlier_transfer = self.run_transfer
+                self.session_transfer = TransferStats()
+                self.session_started_at = self.own_poll_at = self.clock()
+                self.health.session_opened()
+                return True
+            except Exception as e:
+                Console.error(f"Unable to get appointment page: {e}", "SESSION")
+                session_failures += 1
+                Console.waiting(self.fail_retry_delay, "before session retry")
+                self.sleep(self.fail_retry_delay)
+        return False
+
+    def login(self, backend: SessionBackend):
+        """Sign in and open the appointment page, timing it per login path"""
+        path = backend.login_path
+        self.health.beat("login")
+        started_at = self.clock()
+        try:
+            backend.login()
+            Console.login_status(True)
+            Console.info("Navigating to appointment page...")
+            backend.open_appointment_page()
+        except Exception:
+            self.login_metrics.record(path, False, self.clock() - started_at)
+            raise
+        seconds = self.clock() - started_at
+        self.login_metrics.record(path, True, seconds)
+        Console.info(f"Signed in over {path} in {seconds:.1f}s", "SESSION")
+
+    def renew_session(self, backend: SessionBackend) -> bool:
+        """Clear the current session and log in again"""
+        if not self.allows("login", self.login_budget):
+            raise DeadlineExceeded("No time left to log in again")
+        backend.reset_session()
+        self.sleep(self.session_renewal_delay)
+        if not self.throttle("login"):
+            raise RuntimeError("Shutdown requested before logging in again")
+        self.login(backend)
+        self.health.session_opened()
+        Console.success("Session renewed successfully!", "SESSION")
+        self.emit(EventType.SESSION_RENEWED, login_path=backend.login_path)
+        return True
+
+    def prefetch_times(self, backend: SessionBackend, date_to_book) -> Future | None:
+        """Start fetching the free times for a matched date in the background"""
+        fetch_times = backend.times_fetcher(date_to_book)
+        if fetch_times is None:
+            return None
+
+        def prefetch():
+            self.throttle("times")
+            started_at = self.clock()
+            times = fetch_times()
+            Console.info(
+                f"Prefetched {len(times)} time(s) for {date_to_book} in {self.clock() - started_at:.2f}s",
+                "PREFETCH",
+            )
+            return times
+
+        return self.executor.submit(prefetch)
+
+    def book(
+        self,
+        backend: SessionBackend,
+        date_to_book,
+        detected_at: float | None = None,
+        times_future: Future | None = None,
+        fallback_dates: list | tuple = (),
+    ) -> bool:
+        """Book a matched date with retry logic for race conditions
+
+        fallback_dates are later acceptable dates from the same poll, tried in
+        order when date_to_book is gone instead of waiting for the next poll.
+        """
+        self.health.beat("booking")
+        if not self.allows("booking", self.booking_budget):
+            return False
+        with self.booking_lock() as allowed:
+            if not allowed:
+                Console.warning(
+                    "Another worker is booking this account - skipping", "BOOKING"
+                )
+                return False
+            return self._book(
+                backend, date_to_book, detected_at, times_future, list(fallback_dates)
+            )
+
+    def record_fallbacks(self, skipped: list):
+        """Log, count and publish candidates passed over for a later date"""
+        for skipped_date, reason in skipped:
+            self.booking_fallbacks += 1
+            Console.warning(
+                f"{skipped_date}: {reason} - falling back to the next candidate", "BOOKING"
+            )
+            self.emit(
+                EventType.BOOKING_STEP, date=str(skipped_date), step="fallback", reason=reason
+            )
+
+    def _book(self, backend, date_to_book, detected_at, times_future, fallback_dates) -> bool:
+        date_str = str(date_to_book)
+        first_choice = date_to_book
+        detected_at = detected_at or self.clock()
+        for attempt in range(self.booking_retry_attempts):
+            if attempt > 0:
+                if shutdown_requested():
+                    Console.warning("Shutdown requested - no more booking retries", "BOOKING")
+                    break
+                if not self.allows("booking retry", self.booking_budget):
+                    break
+                if times_future and times_future.done():
+                    if resolve_times(times_future) == []:
+                        if not fallback_dates:
+                            Console.warning(
+                                f"No times left for {date_str} - skipping remaining booking attempts",
+                                "BOOKING",
+                            )
+                            break
+                        self.record_fallbacks([(date_to_book, "no times left")])
+                        date_to_book, times_future = fallback_dates.pop(0), None
+                        date_str = str(date_to_book)
+                Console.info(
+                    f"Retry attempt {attempt + 1}/{self.booking_retry_attempts} for booking..."
+                )
+                self.sleep(self.booking_retry_delay)
+
+            self.emit(
+                EventType.BOOKING_STEP, date=date_str, step="attempt", attempt=attempt + 1
+            )
+            backend.booked_date = None
+            booked = backend.book(date_to_book, times_future, fallback_dates)
+            self.record_fallbacks(backend.fallbacks)
+            backend.fallbacks.clear()
+            submitted_at = backend.last_submit_at or self.clock()
+            self.booking_latencies.append(
+                (backend.booking_flow, submitted_at - detected_at)
+            )
+            self.emit(
+                EventType.BOOKING_STEP,
+                date=date_str,
+                step="submitted" if backend.last_submit_at else "finished",
+                attempt=attempt + 1,
+                latency=round(submitted_at - detected_at, 3),
+                flow=backend.booking_flow,
+            )
+            Console.info(
+                f"Detect-to-submit latency: {submitted_at - detected_at:.2f}s ({backend.booking_flow})",
+                "BOOKING",
+            )
+            if booked:
+                if backend.booked_date and backend.booked_date != date_to_book:
+                    date_str = str(backend.booked_date)
+                if date_str != str(first_choice):
+                    self.recovered_slots += 1
+                    Console.success(
+                        f"Booked fallback date {date_str} after {first_choice} was taken",
+                        "BOOKING",
+                    )
+                Console.reschedule_status(True)
+                self.emit(EventType.BOOKING_RESULT, date=date_str, booked=True)
+                self.notifier.reschedule_success(date_str, self.consulate)
+                return True
+
+            if attempt < self.booking_retry_attempts - 1:
+                Console.warning(
+                    f"Booking attempt {attempt + 1} failed, retrying...", "BOOKING"
+                )
+
+        Console.reschedule_status(False)
+        self.emit(EventType.BOOKING_RESULT, date=date_str, booked=False)
+        self.notifier.reschedule_failed(
+            date_str, self.consulate, "Slot no longer available"
+        )
+        return False
+
+    def reschedule(self, backend: SessionBackend, retryCount: int = 0) -> bool | str:
+        date_request_tracker = RequestTracker(
+            retryCount if (retryCount > 0) else self.date_request_max_retry,
+            30 * retryCount if (retryCount > 0) else self.date_request_max_time,
+            self.clock,
+        )
+        while date_request_tracker.should_retry():
+            if self.should_stop():
+                Console.warning("Stop requested, ending reschedule attempts")
+                return False
+
+            # Hold off while the breaker is open instead of hammering a failing site
+            breaker_wait = self.breaker.wait_time()
+            if breaker_wait > 0:
+                self.health.beat("circuit_open")
+                Console.waiting(round(breaker_wait), "circuit breaker open")
+                self.sleep(breaker_wait)
+                continue
+
+            # Safe point: nothing is in flight between two polls
+            if self.memory_watchdog:
+                reason = self.memory_watchdog.check(backend.browser_pid())
+                if reason:
+                    Console.warning(f"Recycling browser: {reason}", "MEMORY")
+                    return RECYCLE_BROWSER
+            if (
+                self.session_rotate_seconds
+                and self.clock() - self.session_started_at >= self.session_rotate_seconds
+            ):
+                Console.info(
+                    f"Rotating browser and session after {self.session_rotate_seconds}s",
+                    "SESSION",
+                )
+                self.rotations += 1
+                return RECYCLE_BROWSER
+
+            backend.maintain()
+            if self.health.phase != "polling":
+                # Between polls the engine's sleep keeps the heartbeat fresh
+                self.health.beat("polling")
+            Console.searching("Checking for available appointment dates...")
+            result = self.poll(backend, date_request_tracker)
+            if result.status is PollStatus.DEADLINE:
+                # Not the site's fault, so the breaker and health stay as they are
+                Console.warning(
+                    f"Ending reschedule attempts: {result.error or 'run deadline reached'}",
+                    "DEADLINE",
+                )
+                return False
+            self.breaker.record(result)
+            self.coverage.record(result)
+            succeeded = result.status is PollStatus.OK or result.status is PollStatus.EMPTY
+            self.health.record_poll(succeeded, self.breaker.consecutive_failures)
+            if self.events.subscribers:
+                self.publish_poll(result)
+            else:
+                # Nobody would see the events; a later subscriber starts from its first poll
+                self.seen_dates = None
+            if self.history_file and succeeded:
+                self.record_history(result)
+            if result.retry_after and self.rate_limiter:
+                self.rate_limiter.defer("days", result.retry_after)
+
+            # Handle session expiry
+            if result.status == PollStatus.SESSION_EXPIRED:
+                self.health.session_lost()
+                Console.warning(
+                    "Session expired during reschedule - triggering new session",
+                    "SESSION",
+                )
+                return SESSION_EXPIRED
+
+            if result.status != PollStatus.OK:
+                if result.failed:
+                    Console.error(
+                        f"Availability poll failed: {result.status.value}", "FETCH"
+                    )
+                delay = max(self.date_request_delay, result.retry_after or 0)
+                Console.waiting(round(delay), "before retry")
+                self.sleep(delay)
+                continue
+
+            if result.unchanged:
+                # The site confirmed the dates already checked on the last poll
+                Console.info("Availability unchanged since the last poll", "FETCH")
+                Console.waiting(self.date_request_delay, "before next check")
+                self.sleep(self.date_request_delay)
+                continue
+
+            earliest_available_date = result.dates[0]
+            if earliest_available_date <= self.latest_acceptable_date:
+                detected_at = self.clock()
+                # A booking retry after this must see the dates again, not a 304
+                backend.conditional.forget()
+                Console.found_slot(str(earliest_available_date))
+                self.emit(EventType.SLOT_MATCHED, date=earliest_available_date.isoformat())
+
+                try:
+                    # Learn the free times while the notification goes out and the page is prepared
+                    times_future = self.prefetch_times(backend, earliest_available_date)
+
+                    # Send immediate notification that slot was found
+                    self.executor.submit(
+                        self.notifier.slot_found,
+                        str(earliest_available_date),
+                        self.consulate,
+                    )
+
+                    Console.info(
+                        f"Attempting to reschedule to {earliest_available_date}..."
+                    )
+                    candidates = [
+                        available
+                        for available in result.dates
+                        if available <= self.latest_acceptable_date
+                    ][: self.max_booking_candidates]
+                    return self.book(
+                        backend,
+                        earliest_available_date,
+                        detected_at,
+                        times_future,
+                        candidates[1:],
+                    )
+                except Exception as e:
+                    Console.error(f"Rescheduling failed: {e}", "RESCHEDULE")
+                    Console.debug(traceback.format_exc())
+                    self.emit(
+                        EventType.BOOKING_RESULT,
+                        date=earliest_available_date.isoformat(),
+                        booked=False,
+                        error=str(e),
+                    )
+                    self.notifier.reschedule_failed(
+                        str(earliest_available_date), self.consulate, str(e)
+                    )
+                    continue
+            else:
+                Console.date_check(str(earliest_available_date), acceptable=False)
+
+            Console.waiting(self.date_request_delay, "before next check")
+            self.sleep(self.date_request_delay)
+        return False
+
+    def reschedule_with_new_session(self, retryCount: int = 0) -> bool:
+        # Cap every request, browser wait and sleep below at the run deadline
+        previous_deadline = activate(self.timeout_handler)
+        backend = self.backend_factory()
+        try:
+            if not self.start_session(backend):
+                return False
+
+            # Main reschedule loop with session renewal
+            session_renewal_attempts = 0
+            while True:
+                rescheduled = self.reschedule(backend, retryCount)
+                if rescheduled == RECYCLE_BROWSER:
+                    self.health.session_lost()
+                    backend.quit()
+                    backend = self.backend_factory()
+                    if not self.start_session(backend):
+                        return False
+                    continue
+                if rescheduled != SESSION_EXPIRED:
+                    return rescheduled is True
+
+                session_renewal_attempts += 1
+                if session_renewal_attempts > self.session_renewal_max_attempts:
+                    Console.error(
+                        f"Maximum session renewal attempts ({self.session_renewal_max_attempts}) exceeded",
+                        "SESSION",
+                    )
+                    return False
+
+                Console.info(
+                    f"Session expired - attempting to renew session (attempt {session_renewal_attempts}/{self.session_renewal_max_attempts})..."
+                )
+                try:
+                    self.renew_session(backend)
+                    # Reset renewal attempts on success
+                    session_renewal_attempts = 0
+                except Exception as e:
+                    Console.error(
+                        f"Failed to renew session (attempt {session_renewal_attempts}): {e}",
+                        "SESSION",
+                    )
+                    Console.waiting(
+                        self.session_renewal_delay, "before next renewal attempt"
+                    )
+                    self.sleep(self.session_renewal_delay)
+        finally:
+            Console.info(f"Poll outcomes: {self.breaker.summary()}", "METRICS")
+            Console.info(f"Logins: {self.login_metrics.summary()}", "METRICS")
+            Console.info(f"Polls: {self.poll_metrics.summary()}", "METRICS")
+            Console.info(
+                f"Bandwidth: session {self.session_transfer.summary()}; run {self.run_transfer.summary()}",
+                "METRICS",
+            )
+            Console.info(f"Coverage: {self.coverage.summary()}", "METRICS")
+            if self.booking_fallbacks:
+                Console.info(
+                    f"Booking fallbacks: {self.booking_fallbacks}, slots recovered: {self.recovered_slots}",
+                    "METRICS",
+                )
+            Console.info(f"Events: {self.events.summary()}", "METRICS")
+            if self.rate_limiter:
+                Console.info(
+                    f"Rate limiter: {self.rate_limiter.summary()}", "METRICS"
+                )
+            if self.availability_cache:
+                Console.info(
+                    f"Availability cache: {self.availability_cache.summary()}",
+                    "METRICS",
+                )
+            if self.memory_watchdog:
+                Console.info(f"Memory: {self.memory_watchdog.summary()}", "METRICS")
+            activate(None)  # quitting must not be cut short by the deadline
+            self.health.session_lost()
+            self.health.beat("between_sessions")
+            backend.quit()
+            activate(previous_deadline)
+
+    def run(
+        self, title: str = "US VISA APPOINTMENT RESCHEDULER", retryCount: int = 0
+    ) -> bool:
+        """Run sessions back to back until booked or out of time"""
+        Console.separator(title)
+        Console.info(
+            f"Target date range: {self.settings.EARLIEST_ACCEPTABLE_DATE} to {self.settings.LATEST_ACCEPTABLE_DATE}"
+        )
+        Console.info(f"Consulate: {self.consulate}")
+        if self.timeout_handler:
+            max_runtime = self.timeout_handler.max_runtime_seconds
+            Console.info(
+                f"Max runtime: {max_runtime} seconds ({max_runtime / 3600:.1f} hours)"
+            )
+        Console.separator()
+
+        session_count = 0
+        while True:
+            if self.should_stop():
+                if shutdown_requested():
+                    Console.warning("Shutdown requested. Exiting gracefully.")
+                else:
+                    Console.warning("Maximum runtime reached. Exiting gracefully.")
+                return False
+            if self.timeout_handler:
+                remaining = self.timeout_handler.remaining_time()
+                Console.info(f"Time remaining: {remaining:.0f} seconds")
+                if not self.allows("new session", self.login_budget):
+                    return False  # no session could log in before the deadline
+
+            session_count += 1
+            Console.session_start(session_count)
+            if self.reschedule_with_new_session(retryCount):
+                Console.success(
+                    "Program completed successfully! Appointment rescheduled."
+                )
+                return True
+
+            Console.warning(
+                f"Session #{session_count} failed. Retrying in {self.new_session_delay} seconds..."
+            )
+            Console.waiting(self.new_session_delay, "before new session")
+            self.sleep(self.new_session_delay)
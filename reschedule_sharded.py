@@ -0,0 +1,142 @@
+"""
+Sharded rescheduler node
+Every node started with the same WORK_UNITS_FILE and LEASE_STORE leases one
+(account, consulate) unit at a time and runs the rescheduling engine for it,
+moving on to the next unit after LEASE_MAX_HOLD_SECONDS when others wait
+"""
+
+from contextlib import contextmanager
+from types import SimpleNamespace
+
+from console_utils import Console
+from event_bus import start_event_stream
+from health import HealthState, start_health_server
+from reschedule_engine import RescheduleEngine, TimeoutHandler
+from shutdown import (
+    flush_background,
+    install_signal_handlers,
+    interruptible_sleep,
+    shutdown_requested,
+)
+from work_leases import (
+    DONE_OWNER,
+    LeaseCoordinator,
+    WorkUnit,
+    create_lease_store,
+    load_work_units,
+)
+
+# Import cloud settings if available, fallback to regular settings
+try:
+    import settings_cloud as settings
+except ImportError:
+    import settings
+
+
+def unit_settings(unit: WorkUnit):
+    """Settings for one unit: the node's settings with the unit's account and consulate"""
+    values = {name: getattr(settings, name) for name in dir(settings) if name.isupper()}
+    values.update(
+        USER_EMAIL=unit.email,
+        USER_PASSWORD=unit.password,
+        USER_CONSULATE=unit.consulate,
+        AVAILABLE_DATE_REQUEST_SUFFIX=(
+            f"/days/{settings.CONSULATES[unit.consulate]}.json?appointments[expedite]=false"
+        ),
+    )
+    values.update(unit.overrides)
+    return SimpleNamespace(**values)
+
+
+def run_unit(
+    coordinator: LeaseCoordinator,
+    unit: WorkUnit,
+    timeout_handler: TimeoutHandler | None = None,
+    health: HealthState | None = None,
+    units: list = (),
+) -> bool:
+    """Run sessions for a leased unit until it books, the lease is lost or time runs out
+
+    units are every node's work units: a booking retires the account's other
+    units, and the unit is handed over when one of them waits for a node.
+    """
+
+    @contextmanager
+    def account_lock():
+        allowed = coordinator.lock_account(unit)
+        try:
+            yield allowed
+        finally:
+            if allowed:
+                coordinator.unlock_account(unit)
+
+    engine = RescheduleEngine(
+        unit_settings(unit),
+        timeout_handler=timeout_handler,
+        stop_check=lambda: coordinator.lost.is_set()
+        or coordinator.should_rotate(unit, units),
+        booking_lock=account_lock,
+        health=health,
+    )
+    coordinator.hold(unit)
+    booked = False
+    try:
+        while not engine.should_stop():
+            if engine.reschedule_with_new_session():
+                booked = True
+                break
+            Console.waiting(settings.NEW_SESSION_DELAY, "before new session")
+            interruptible_sleep(settings.NEW_SESSION_DELAY)
+    finally:
+        engine.close()
+        coordinator.release(unit, done=booked, units=units)
+    return booked
+
+
+def main():
+    units = load_work_units(settings.WORK_UNITS_FILE)
+    coordinator = LeaseCoordinator(
+        create_lease_store(settings),
+        getattr(settings, "LEASE_TTL", 60),
+        max_hold=getattr(settings, "LEASE_MAX_HOLD_SECONDS", 1800),
+    )
+    max_runtime_seconds = getattr(settings, "MAX_RUNTIME_SECONDS", None)
+    timeout_handler = (
+        TimeoutHandler(max_runtime_seconds) if max_runtime_seconds else None
+    )
+
+    install_signal_handlers(getattr(settings, "SHUTDOWN_GRACE_SECONDS", 30))
+    event_stream = start_event_stream(settings)
+    health = HealthState.from_settings(settings)
+    health.deadline = timeout_handler
+    health_server = start_health_server(settings, health)
+    Console.separator("US VISA APPOINTMENT RESCHEDULER (Sharded Node)")
+    Console.info(f"Node {coordinator.node_id} sharing {len(units)} work unit(s)")
+    Console.separator()
+
+    while not shutdown_requested() and not (
+        timeout_handler and timeout_handler.check_timeout()
+    ):
+        unit = coordinator.acquire_any(units)
+        if unit is None:
+            owners = coordinator.store.owners()
+            if all(owners.get(u.key, (None,))[0] == DONE_OWNER for u in units):
+                Console.success("Every work unit is done.")
+                break
+            Console.waiting(round(coordinator.heartbeat_interval), "for a free unit")
+            health.beat("waiting_for_unit", coordinator.heartbeat_interval)
+            interruptible_sleep(coordinator.heartbeat_interval)
+            continue
+
+        Console.info(f"Leased work unit {unit.key}", "LEASE")
+        if run_unit(coordinator, unit, timeout_handler, health, units):
+            Console.success(f"Work unit {unit.key} rescheduled.")
+    flush_background()
+    if event_stream:
+        event_stream.stop()
+    if health_server:
+        health_server.stop()
+
+
+if __name__ == "__main__":
+    main()
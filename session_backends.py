@@ -0,0 +1,885 @@
+"""
+Session backends for the US Visa Rescheduler
+Every backend implements the same login / availability / booking interface so the
+rescheduling engine can run unchanged on Selenium, plain HTTP or an in-memory fake
+"""
+
+import json
+import os
+import re
+import time
+from concurrent.futures import Future
+from datetime import date
+from html.parser import HTMLParser
+from time import sleep
+
+import requests
+from selenium import webdriver
+from selenium.common.exceptions import WebDriverException
+from selenium.webdriver.chrome.webdriver import WebDriver
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.webdriver.support.ui import WebDriverWait
+
+from console_utils import Console
+from deadline import DeadlineExceeded, budget
+from legacy_rescheduler import (
+    book_on_form,
+    legacy_reschedule,
+    prepare_appointment_form,
+    refresh_available_dates,
+)
+from poll_outcomes import (
+    ConditionalPolls,
+    PollResult,
+    PollStatus,
+    classify_exception,
+    classify_fetch_result,
+    classify_response,
+    parse_iso_date,
+    transfer_sizes,
+)
+from request_tracker import RequestTracker
+from time_slots import TimePreferences, rank_times
+
+# Returned by the engine's poll loop when the session has to be renewed
+SESSION_EXPIRED = "SESSION_EXPIRED"
+# Seconds a browser page load may take before it is abandoned
+PAGE_LOAD_TIMEOUT = 60
+# Fetch days/{id}.json from inside the page with the browser's own cookie jar and
+# connections; only the status and the date strings cross back over WebDriver.
+# Chrome revalidates its cached copy (no-cache), and a body whose ETag or
+# Last-Modified matches the previous poll comes back as a bare 304. Dates after
+# the cutoff are dropped except the earliest, so it stays known.
+FETCH_DATES_SCRIPT = (
+    "var done = arguments[arguments.length - 1], cutoff = arguments[2],"
+    " etag = arguments[3], lastModified = arguments[4];"
+    "fetch(arguments[0], {credentials: 'same-origin', cache: 'no-cache', headers: arguments[1]})"
+    ".then(function (response) {"
+    " var result = {status: response.status, retryAfter: response.headers.get('Retry-After'),"
+    "  etag: response.headers.get('ETag'), lastModified: response.headers.get('Last-Modified')};"
+    " if (response.redirected && response.url.indexOf('/users/sign_in') !== -1) result.status = 401;"
+    " return response.text().then(function (body) {"
+    "  var timing = performance.getEntriesByName(response.url).pop();"
+    "  performance.clearResourceTimings();"
+    "  result.size = body.length; result.bytesIn = timing ? timing.transferSize : 0;"
+    "  if (result.status === 200 && ((etag && result.etag === etag)"
+    "   || (!etag && lastModified && result.lastModified === lastModified))) result.status = 304;"
+    "  if (result.status !== 200) { done(result); return; }"
+    "  var days, later = null;"
+    "  try { days = JSON.parse(body); } catch (e) { result.error = String(e); done(result); return; }"
+    "  result.dates = [];"
+    "  for (var i = 0; i < days.length; i++) {"
+    "   var day = days[i].date;"
+    "   if (!cutoff || day <= cutoff) result.dates.push(day);"
+    "   else if (!later || day < later) later = day; }"
+    "  if (later) result.dates.push(later);"
+    "  done(result);"
+    " });"
+    "}).catch(function (e) { done({error: String(e)}); });"
+)
+HTTP_USER_AGENT = "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/132.0.0.0 Safari/537.36"
+
+
+def parse_schedule_id(text: str) -> str | None:
+    """Extract the schedule ID from a /schedule/{id} URL or link in a page body
+
+    Any other number could be an unrelated ID, and a wrong one would be
+    persisted, so nothing else is accepted.
+    """
+    match = re.search(r"/schedule/(\d+)", text)
+    return match.group(1) if match else None
+
+
+class SessionBackend:
+    """Interface shared by every session backend"""
+
+    name = "base"
+    booking_flow = "direct"
+
+    def __init__(self, settings):
+        self.settings = settings
+        # The ID never changes for an account, so it is only discovered once
+        self.schedule_id = load_schedule_id(settings) if settings else None
+        # How login() signs in; login metrics are reported per path
+        self.login_path = self.name
+        # How get_available_dates() reaches the site; poll metrics are per path
+        self.poll_path = self.name
+        self.conditional = ConditionalPolls()
+        # Waits for the shared rate limiter's bucket for an endpoint; the
+        # engine installs its own throttle when it starts a session
+        self.throttle = lambda endpoint: None
+        # Monotonic time of the last booking form submission, if the backend knows it
+        self.last_submit_at = None
+        # Date the last successful book() took, and candidates it skipped on the way
+        self.booked_date = None
+        self.fallbacks = []
+        self.time_preferences = (
+            TimePreferences.from_settings(settings) if settings else TimePreferences()
+        )
+        # Dates after this are not parsed; recording history needs every date
+        self.parse_cutoff = None
+        if settings and not getattr(settings, "AVAILABILITY_HISTORY_FILE", ""):
+            self.parse_cutoff = parse_iso_date(settings.LATEST_ACCEPTABLE_DATE)
+
+    @property
+    def base_url(self) -> str:
+        return self.settings.LOGIN_URL.rsplit("/users/", 1)[0]
+
+    @property
+    def appointment_url(self) -> str:
+        return self.settings.APPOINTMENT_PAGE_URL.format(id=self.schedule_id)
+
+    def available_dates_url(self, facility_id: int | None = None) -> str:
+        """days/{id}.json URL for the user's consulate or another facility"""
+        if facility_id is None:
+            return self.appointment_url + self.settings.AVAILABLE_DATE_REQUEST_SUFFIX
+        return f"{self.appointment_url}/days/{facility_id}.json?appointments[expedite]=false"
+
+    @property
+    def facility_id(self) -> int:
+        return self.settings.CONSULATES[self.settings.USER_CONSULATE]
+
+    def available_times_url(self, date_to_book: date) -> str:
+        return (
+            f"{self.appointment_url}/times/{self.facility_id}.json"
+            f"?date={date_to_book.isoformat()}&appointments[expedite]=false"
+        )
+
+    @property
+    def payment_page_url(self) -> str:
+        return self.settings.PAYMENT_PAGE_URL.format(id=self.schedule_id)
+
+    def login(self) -> None:
+        """Sign in to the visa account"""
+        raise NotImplementedError
+
+    def open_appointment_page(self) -> None:
+        """Resolve the schedule ID and get ready to poll the appointment endpoints"""
+        raise NotImplementedError
+
+    def get_available_dates(
+        self, request_tracker: RequestTracker, facility_id: int | None = None
+    ) -> PollResult:
+        """Poll the days endpoint and return a typed outcome with sorted dates
+
+        facility_id defaults to the user's consulate.
+        """
+        raise NotImplementedError
+
+    def poll_url(self, get, url: str, headers: dict, cutoff: date | None) -> PollResult:
+        """GET days/{id}.json conditionally and account for the bytes it took
+
+        requests already negotiates gzip/deflate (and br or zstd when their
+        modules are installed); a 304 skips the body and the parse.
+        """
+        try:
+            response = get(
+                url, headers={**headers, **self.conditional.headers(url)}, timeout=budget(30)
+            )
+        except Exception as e:
+            return classify_exception(e)
+        result = None
+        if response.status_code == 304:
+            result = self.conditional.unchanged(url)
+        if result is None:
+            result = classify_response(response, cutoff)
+            self.conditional.remember(
+                url,
+                response.headers.get("ETag"),
+                response.headers.get("Last-Modified"),
+                result,
+            )
+        result.bytes_out, result.bytes_in = transfer_sizes(response)
+        return result
+
+    def times_fetcher(self, date_to_book: date):
+        """Return a thread-safe callable listing free times for a date, or None"""
+        return None
+
+    def fetch_payment_page(self) -> str | None:
+        """HTML of the payment page in one request, None when the session expired"""
+        raise NotImplementedError
+
+    def book(
+        self,
+        date_to_book: date,
+        times_future: Future | None = None,
+        fallback_dates: list | tuple = (),
+    ) -> bool:
+        """Try to book the given date, return True on success
+
+        times_future optionally resolves to the free times prefetched for the date.
+        When the date is gone, the backend moves on to the later acceptable
+        fallback_dates (in order) within the same attempt, records each skip
+        with record_fallback and sets booked_date to the date it took.
+        """
+        raise NotImplementedError
+
+    def reset_session(self) -> None:
+        """Drop the current session state before logging in again"""
+        raise NotImplementedError
+
+    def maintain(self) -> None:
+        """Periodic upkeep between polls"""
+
+    def browser_pid(self) -> int | None:
+        """PID at the root of the browser process tree, if there is one"""
+        return None
+
+    def quit(self) -> None:
+        """Release every resource held by the backend"""
+
+    def mark_submitted(self) -> None:
+        self.last_submit_at = time.monotonic()
+
+    def record_fallback(self, skipped: date, reason: str) -> None:
+        self.fallbacks.append((skipped, reason))
+
+    def remember_schedule_id(self, schedule_id: str | None) -> None:
+        """Use and persist a newly discovered schedule ID (None forgets it)"""
+        self.schedule_id = schedule_id
+        if self.settings:
+            save_schedule_id(self.settings, schedule_id)
+
+
+class SeleniumBackend(SessionBackend):
+    """Backend driving a real Chrome instance"""
+
+    name = "selenium"
+
+    def __init__(self, settings, driver: WebDriver | None = None):
+        super().__init__(settings)
+        self.driver = driver or self.create_driver()
+        self.standby_enabled = getattr(settings, "STANDBY_TAB", False)
+        self.standby_refresh_seconds = getattr(settings, "STANDBY_REFRESH_SECONDS", 240)
+        self.poll_handle = None
+        self.standby_handle = None
+        self.standby_armed_at = None
+        # "http" signs in with two requests and hands the cookies to Chrome
+        self.login_path = getattr(settings, "LOGIN_MODE", "browser").lower()
+        # "replay" copies the cookies into requests, "fetch" polls from inside the page
+        self.poll_path = getattr(settings, "POLL_MODE", "replay").lower()
+        self.script_timeout = None
+
+    @property
+    def booking_flow(self) -> str:
+        return "standby tab" if self.standby_armed_at else "page reload"
+
+    def create_driver(self) -> WebDriver:
+        options = webdriver.ChromeOptions()
+        if not self.settings.SHOW_GUI:
+            options.add_argument("--headless")
+            options.add_argument("--window-size=1920x1080")
+            options.add_argument("--disable-gpu")
+            options.add_argument("--no-sandbox")  # Required for cloud deployment
+            options.add_argument("--disable-dev-shm-usage")  # Required for cloud deployment
+            options.add_argument("--disable-extensions")
+            options.add_argument("--disable-plugins")
+            options.add_argument("--disable-images")  # Faster loading
+            options.add_argument(
+                "user-agent=Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/132.0.0.0 Safari/537.36"
+            )
+        options.add_experimental_option("detach", self.settings.DETACH)
+        options.add_argument("--incognito")
+        return webdriver.Chrome(options=options)
+
+    def load(self, url: str) -> None:
+        """Navigate, giving up when the page load would outlast the run budget"""
+        self.driver.set_page_load_timeout(budget(PAGE_LOAD_TIMEOUT))
+        self.driver.get(url)
+
+    def login(self) -> None:
+        if self.login_path != "http":
+            self.login_with_form()
+            return
+        try:
+            self.login_over_http()
+        except Exception:
+            # Fall back to the sign-in form on the next attempt
+            self.login_path = "browser"
+            raise
+
+    def login_over_http(self) -> None:
+        """Sign in with a requests session and copy its cookies into Chrome"""
+        with requests.Session() as session:
+            session.headers["User-Agent"] = HTTP_USER_AGENT
+            http_login(session, self.settings)
+            if self.schedule_id is None:
+                self.remember_schedule_id(fetch_schedule_id(session, self.base_url))
+            # CDP sets cookies without first loading a page on the site
+            for cookie in session.cookies:
+                self.driver.execute_cdp_cmd(
+                    "Network.setCookie",
+                    {
+                        "name": cookie.name,
+                        "value": cookie.value,
+                        "domain": cookie.domain,
+                        "path": cookie.path,
+                        "secure": cookie.secure,
+                        "httpOnly": cookie.has_nonstandard_attr("HttpOnly"),
+                    },
+                )
+
+    def login_with_form(self) -> None:
+        driver = self.driver
+        self.load(self.settings.LOGIN_URL)
+        timeout = self.settings.TIMEOUT
+
+        email_input = WebDriverWait(driver, budget(timeout)).until(
+            EC.visibility_of_element_located((By.ID, "user_email"))
+        )
+        email_input.send_keys(self.settings.USER_EMAIL)
+
+        password_input = WebDriverWait(driver, budget(timeout)).until(
+            EC.visibility_of_element_located((By.ID, "user_password"))
+        )
+        password_input.send_keys(self.settings.USER_PASSWORD)
+
+        policy_checkbox = WebDriverWait(driver, budget(timeout)).until(
+            EC.element_to_be_clickable((By.CLASS_NAME, "icheckbox"))
+        )
+        policy_checkbox.click()
+
+        login_button = WebDriverWait(driver, budget(timeout)).until(
+            EC.element_to_be_clickable((By.NAME, "commit"))
+        )
+        login_button.click()
+
+    def open_appointment_page(self) -> None:
+        if self.schedule_id is None:
+            continue_button = WebDriverWait(
+                self.driver, budget(self.settings.TIMEOUT)
+            ).until(EC.element_to_be_clickable((By.LINK_TEXT, "Continue")))
+            continue_button.click()
+            sleep(budget(2))
+            schedule_id = parse_schedule_id(self.driver.current_url)
+            if schedule_id is None:
+                Console.error(
+                    f"No schedule ID in {self.driver.current_url} after Continue", "SESSION"
+                )
+                raise RuntimeError("Schedule ID not found after Continue")
+            self.remember_schedule_id(schedule_id)
+        self.load(self.appointment_url)
+        if f"/schedule/{self.schedule_id}/" not in self.driver.current_url:
+            # A stale cached ID; the next attempt clicks through again
+            self.remember_schedule_id(None)
+            raise RuntimeError("Appointment page did not open for the cached schedule ID")
+        if self.standby_enabled:
+            self.arm_standby()
+
+    def arm_standby(self) -> None:
+        """Open or reload a second tab parked on the appointment form"""
+        driver = self.driver
+        self.poll_handle = self.poll_handle or driver.current_window_handle
+        self.standby_armed_at = None
+        try:
+            if self.standby_handle in driver.window_handles:
+                driver.switch_to.window(self.standby_handle)
+                prepare_appointment_form(driver)
+            else:
+                driver.switch_to.new_window("tab")
+                self.standby_handle = driver.current_window_handle
+                self.load(self.appointment_url)
+                prepare_appointment_form(driver, reload=False)
+            self.standby_armed_at = time.monotonic()
+        except Exception as e:
+            Console.warning(f"Unable to arm standby booking tab: {e}", "STANDBY")
+        finally:
+            driver.switch_to.window(self.poll_handle)
+
+    def maintain(self) -> None:
+        if not self.standby_enabled:
+            return
+        if (
+            self.standby_armed_at is None
+            or time.monotonic() - self.standby_armed_at > self.standby_refresh_seconds
+        ):
+            self.arm_standby()
+
+    def get_available_dates(
+        self, request_tracker: RequestTracker, facility_id: int | None = None
+    ) -> PollResult:
+        request_tracker.log_retry()
+        request_tracker.retry()
+        cutoff = self.parse_cutoff if facility_id is None else None
+        if self.poll_path == "fetch":
+            return self.fetch_in_page(self.available_dates_url(facility_id), cutoff)
+        return self.poll_url(
+            requests.get, self.available_dates_url(facility_id), self.request_headers(), cutoff
+        )
+
+    def fetch_in_page(self, url: str, cutoff: date | None = None) -> PollResult:
+        """Poll with one async script instead of exporting cookies to requests
+
+        Cookies the site rotates are never stale and Chrome's keep-alive
+        connections are reused; the page must be on the site's origin.
+        """
+        headers = self.settings.REQUEST_HEADERS
+        try:
+            timeout = budget(30)
+            if timeout != self.script_timeout:
+                # A WebDriver round trip of its own, so only when the budget changes it
+                self.driver.set_script_timeout(timeout)
+                self.script_timeout = timeout
+            reply = self.driver.execute_async_script(
+                FETCH_DATES_SCRIPT,
+                url,
+                headers,
+                cutoff.isoformat() if cutoff else None,
+                *self.conditional.validators(url),
+            )
+        except DeadlineExceeded as e:
+            return classify_exception(e)
+        except WebDriverException as e:
+            Console.error(f"In-page availability fetch failed: {type(e).__name__}", "REQUEST")
+            return PollResult(PollStatus.NETWORK_ERROR, error=str(e))
+        if not isinstance(reply, dict):
+            return classify_fetch_result(reply)
+        result = None
+        if reply.get("status") == 304:
+            result = self.conditional.unchanged(url)
+        if result is None:
+            result = classify_fetch_result(reply)
+            self.conditional.remember(
+                url, reply.get("etag"), reply.get("lastModified"), result
+            )
+        # Chrome does not expose the request size; this leaves out its cookies
+        result.bytes_out = len(f"GET {url} HTTP/1.1\r\n\r\n") + sum(
+            len(k) + len(v) + 4 for k, v in headers.items()
+        )
+        result.bytes_in = reply.get("bytesIn") or 0
+        return result
+
+    def browser_pid(self) -> int | None:
+        # chromedriver; Chrome and its renderers are its descendants
+        process = getattr(getattr(self.driver, "service", None), "process", None)
+        return process.pid if process else None
+
+    def request_headers(self) -> dict:
+        """Request headers carrying the browser's cookies and user agent"""
+        request_headers = self.settings.REQUEST_HEADERS.copy()
+        request_headers["Cookie"] = "".join(
+            [
+                f"{cookie['name']}={cookie['value']};"
+                for cookie in self.driver.get_cookies()
+            ]
+        )
+        request_headers["User-Agent"] = self.driver.execute_script(
+            "return navigator.userAgent"
+        )
+        return request_headers
+
+    def fetch_payment_page(self) -> str | None:
+        # Reuse the browser's cookies over HTTP instead of navigating the browser
+        response = requests.get(
+            self.payment_page_url, headers=self.request_headers(), timeout=budget(30)
+        )
+        return payment_page_html(response)
+
+    def times_fetcher(self, date_to_book: date):
+        # Read cookies on the calling thread; the driver is not thread-safe
+        url = self.available_times_url(date_to_book)
+        request_headers = self.request_headers()
+        return lambda: fetch_available_times(requests.get, url, request_headers)
+
+    def book(
+        self,
+        date_to_book: date,
+        times_future: Future | None = None,
+        fallback_dates: list | tuple = (),
+    ) -> bool:
+        self.last_submit_at = None
+        self.booked_date = date_to_book
+
+        def fall_back(selected: date):
+            # The form's earliest date is later than date_to_book but still a candidate
+            self.record_fallback(date_to_book, "taken before the form loaded")
+            self.booked_date = selected
+
+        if self.standby_armed_at is None:
+            return legacy_reschedule(
+                self.driver,
+                date_to_book,
+                self.mark_submitted,
+                lambda: resolve_times(times_future),
+                self.time_preferences,
+                fallback_dates,
+                fall_back,
+            )
+
+        known_times = resolve_times(times_future)
+        if known_times == []:
+            Console.warning(f"No times left for {date_to_book}", "BOOKING")
+            return False
+
+        # Book on the armed form; retries re-select a date without reloading
+        self.driver.switch_to.window(self.standby_handle)
+        try:
+            refresh_available_dates(self.driver)
+            return book_on_form(
+                self.driver,
+                date_to_book,
+                self.mark_submitted,
+                known_times,
+                self.time_preferences,
+                fallback_dates,
+                fall_back,
+            )
+        finally:
+            self.driver.switch_to.window(self.poll_handle)
+
+    def reset_session(self) -> None:
+        self.driver.delete_all_cookies()
+
+    def quit(self) -> None:
+        self.driver.quit()
+
+
+class HttpBackend(SessionBackend):
+    """Backend talking to the visa site with a plain requests session"""
+
+    name = "http"
+
+    def __init__(self, settings, session: requests.Session | None = None):
+        super().__init__(settings)
+        self.session = session or requests.Session()
+        self.session.headers["User-Agent"] = HTTP_USER_AGENT
+
+    def login(self) -> None:
+        http_login(self.session, self.settings)
+
+    def open_appointment_page(self) -> None:
+        if self.schedule_id is None:
+            self.remember_schedule_id(fetch_schedule_id(self.session, self.base_url))
+
+    def get_available_dates(
+        self, request_tracker: RequestTracker, facility_id: int | None = None
+    ) -> PollResult:
+        request_tracker.log_retry()
+        request_tracker.retry()
+        return self.poll_url(
+            self.session.get,
+            self.available_dates_url(facility_id),
+            self.settings.REQUEST_HEADERS,
+            self.parse_cutoff if facility_id is None else None,
+        )
+
+    def times_fetcher(self, date_to_book: date):
+        url = self.available_times_url(date_to_book)
+        return lambda: fetch_available_times(
+            self.session.get, url, self.settings.REQUEST_HEADERS
+        )
+
+    def fetch_payment_page(self) -> str | None:
+        return payment_page_html(
+            self.session.get(self.payment_page_url, timeout=budget(30))
+        )
+
+    def book(
+        self,
+        date_to_book: date,
+        times_future: Future | None = None,
+        fallback_dates: list | tuple = (),
+    ) -> bool:
+        candidates = [date_to_book, *fallback_dates]
+        authenticity_token = None
+        for index, candidate in enumerate(candidates):
+            has_fallback = index + 1 < len(candidates)
+            times = resolve_times(times_future) if index == 0 else None
+            if times is None:
+                self.throttle("times")
+                times = self.times_fetcher(candidate)()
+            ranked_times = rank_times(times, self.time_preferences) if times else []
+            if not ranked_times:
+                Console.warning(f"No usable times left for {candidate}", "BOOKING")
+                if has_fallback:
+                    self.record_fallback(candidate, "no times left")
+                continue
+            time_to_book = ranked_times[0]
+            if authenticity_token is None:
+                page = self.session.get(self.appointment_url, timeout=budget(30))
+                authenticity_token = parse_authenticity_token(page.text)
+                if not authenticity_token:
+                    Console.error(
+                        "Authenticity token not found on appointment page", "BOOKING"
+                    )
+                    return False
+            if self.settings.TEST_MODE:
+                Console.info(
+                    f"TEST MODE: Would have booked {candidate} {time_to_book}", "BOOKING"
+                )
+                self.booked_date = candidate
+                return True
+            response = self.session.post(
+                self.appointment_url,
+                data={
+                    "authenticity_token": authenticity_token,
+                    "confirmed_limit_message": "1",
+                    "use_consulate_appointment_capacity": "true",
+                    "appointments[consulate_appointment][facility_id]": self.facility_id,
+                    "appointments[consulate_appointment][date]": candidate.isoformat(),
+                    "appointments[consulate_appointment][time]": time_to_book,
+                },
+                timeout=budget(30),
+            )
+            if response.status_code == 200 and "Successfully Scheduled" in response.text:
+                self.booked_date = candidate
+                return True
+            if has_fallback:
+                self.record_fallback(candidate, "booking rejected")
+        return False
+
+    def reset_session(self) -> None:
+        self.session.cookies.clear()
+
+    def quit(self) -> None:
+        self.session.close()
+
+
+class FakeBackend(SessionBackend):
+    """In-memory stand-in backend for tests, benchmarks and dry runs
+
+    poll_results is consumed one entry per poll; each entry is a PollResult, a
+    list of dates, None (network error) or SESSION_EXPIRED. Once exhausted,
+    polls come back empty. book_results works the same way for booking
+    attempts (default: succeed).
+    """
+
+    name = "fake"
+
+    def __init__(
+        self, settings=None, poll_results=None, book_results=None, available_times=None
+    ):
+        super().__init__(settings)
+        self.poll_results = list(poll_results or [])
+        self.book_results = list(book_results or [])
+        self.available_times = available_times
+        self.schedule_id = "0"
+        self.logins = 0
+        self.polls = 0
+        self.booked = []
+
+    def login(self) -> None:
+        self.logins += 1
+
+    def open_appointment_page(self) -> None:
+        pass
+
+    def get_available_dates(
+        self, request_tracker: RequestTracker, facility_id: int | None = None
+    ) -> PollResult:
+        request_tracker.retry()
+        self.polls += 1
+        if not self.poll_results:
+            return PollResult(PollStatus.EMPTY)
+        result = self.poll_results.pop(0)
+        if isinstance(result, PollResult):
+            return result
+        if result is None:
+            return PollResult(PollStatus.NETWORK_ERROR)
+        if result == SESSION_EXPIRED:
+            return PollResult(PollStatus.SESSION_EXPIRED)
+        return PollResult(PollStatus.OK if result else PollStatus.EMPTY, result)
+
+    def times_fetcher(self, date_to_book: date):
+        if self.available_times is None:
+            return None
+        return lambda: list(self.available_times.get(date_to_book, []))
+
+    def book(
+        self,
+        date_to_book: date,
+        times_future: Future | None = None,
+        fallback_dates: list | tuple = (),
+    ) -> bool:
+        candidates = [date_to_book, *fallback_dates]
+        for index, candidate in enumerate(candidates):
+            has_fallback = index + 1 < len(candidates)
+            if index == 0:
+                times = resolve_times(times_future)
+            else:
+                fetch_times = self.times_fetcher(candidate)
+                times = fetch_times() if fetch_times else None
+            if times == []:
+                if has_fallback:
+                    self.record_fallback(candidate, "no times left")
+                continue
+            booked = self.book_results.pop(0) if self.book_results else True
+            if booked:
+                self.booked.append(candidate)
+                self.booked_date = candidate
+                return True
+            if has_fallback:
+                self.record_fallback(candidate, "booking rejected")
+        return False
+
+    def reset_session(self) -> None:
+        pass
+
+
+BACKENDS = {
+    SeleniumBackend.name: SeleniumBackend,
+    HttpBackend.name: HttpBackend,
+    FakeBackend.name: FakeBackend,
+}
+
+
+def create_backend(settings, name: str | None = None) -> SessionBackend:
+    """Build the backend selected by SESSION_BACKEND (default: selenium)"""
+    name = (name or getattr(settings, "SESSION_BACKEND", "selenium")).lower()
+    if name not in BACKENDS:
+        raise ValueError(
+            f"Unknown session backend '{name}' (choose from {', '.join(BACKENDS)})"
+        )
+    return BACKENDS[name](settings)
+
+
+def load_schedule_id(settings) -> str | None:
+    """Schedule ID persisted for this account in SCHEDULE_ID_FILE, if any"""
+    path = getattr(settings, "SCHEDULE_ID_FILE", "")
+    if not path:
+        return None
+    try:
+        with open(path) as ids_file:
+            return json.load(ids_file).get(settings.USER_EMAIL)
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def save_schedule_id(settings, schedule_id: str | None) -> None:
+    """Persist this account's schedule ID, or forget it when None"""
+    path = getattr(settings, "SCHEDULE_ID_FILE", "")
+    if not path:
+        return
+    try:
+        with open(path) as ids_file:
+            schedule_ids = json.load(ids_file)
+    except (OSError, ValueError):
+        schedule_ids = {}
+    if schedule_ids.get(settings.USER_EMAIL) == schedule_id:
+        return
+    if schedule_id is None:
+        schedule_ids.pop(settings.USER_EMAIL, None)
+    else:
+        schedule_ids[settings.USER_EMAIL] = schedule_id
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, "w") as ids_file:
+            json.dump(schedule_ids, ids_file)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        Console.warning(f"Unable to save schedule ID: {e}", "SESSION")
+
+
+def http_login(session: requests.Session, settings) -> None:
+    """Sign in by posting the credentials with the sign-in page's CSRF token"""
+    response = session.get(settings.LOGIN_URL, timeout=budget(30))
+    csrf_token = parse_csrf_token(response.text)
+    if not csrf_token:
+        raise RuntimeError("CSRF token not found on sign-in page")
+    response = session.post(
+        settings.LOGIN_URL,
+        data={
+            "user[email]": settings.USER_EMAIL,
+            "user[password]": settings.USER_PASSWORD,
+            "policy_confirmed": "1",
+            "commit": "Sign In",
+        },
+        headers={
+            "X-CSRF-Token": csrf_token,
+            "X-Requested-With": "XMLHttpRequest",
+            "Accept": "*/*;q=0.5, text/javascript, application/javascript",
+        },
+        timeout=budget(30),
+    )
+    if response.status_code != 200 or "_yatri_session" not in session.cookies:
+        raise RuntimeError(f"Login failed with status code {response.status_code}")
+
+
+def fetch_schedule_id(session: requests.Session, base_url: str) -> str:
+    """Schedule ID of the signed-in account, read from its account page"""
+    response = session.get(f"{base_url}/account", timeout=budget(30))
+    schedule_id = parse_schedule_id(response.url) or parse_schedule_id(response.text)
+    if schedule_id is None:
+        Console.error(f"No /schedule/{{id}} link on the account page ({response.url})", "SESSION")
+        raise RuntimeError("Schedule ID not found on account page")
+    return schedule_id
+
+
+def parse_csrf_token(html: str) -> str | None:
+    match = re.search(r'name="csrf-token" content="([^"]+)"', html)
+    return match.group(1) if match else None
+
+
+def parse_authenticity_token(html: str) -> str | None:
+    match = re.search(r'name="authenticity_token" value="([^"]+)"', html)
+    return match.group(1) if match else parse_csrf_token(html)
+
+
+class _PaymentTableParser(HTMLParser):
+    """Collect the text of every <td> inside the table.for-layout"""
+
+    def __init__(self):
+        super().__init__()
+        self.found_table = False
+        self.table_depth = 0
+        self.cells = []
+        self.cell = None
+
+    def handle_starttag(self, tag, attrs):
+        if tag == "table":
+            if self.table_depth:
+                self.table_depth += 1
+            elif "for-layout" in (dict(attrs).get("class") or "").split():
+                self.found_table = True
+                self.table_depth = 1
+        elif tag == "td" and self.table_depth:
+            self.cell = []
+
+    def handle_endtag(self, tag):
+        if tag == "td" and self.cell is not None:
+            self.cells.append(" ".join("".join(self.cell).split()))
+            self.cell = None
+        elif tag == "table" and self.table_depth:
+            self.table_depth -= 1
+
+    def handle_data(self, data):
+        if self.cell is not None:
+            self.cell.append(data)
+
+
+def parse_payment_table(html: str) -> tuple | None:
+    """(locations, dates) from the payment page, None when the table is missing"""
+    parser = _PaymentTableParser()
+    parser.feed(html)
+    parser.close()
+    if not parser.found_table:
+        return None
+    return parser.cells[0::2], parser.cells[1::2]
+
+
+def payment_page_html(response) -> str | None:
+    """Page text, or None when the request bounced to the sign-in page"""
+    if response.status_code == 401 or "sign_in" in response.url:
+        return None
+    response.raise_for_status()
+    return response.text
+
+
+def fetch_available_times(get, url: str, headers: dict) -> list:
+    """Fetch the free times for one date from the times/{facility}.json endpoint"""
+    response = get(url, headers=headers, timeout=budget(30))
+    response.raise_for_status()
+    return response.json().get("available_times") or []
+
+
+def resolve_times(times_future: Future | None, timeout: float = 10) -> list | None:
+    """Wait for prefetched times; None when there is no usable prefetch"""
+    if times_future is None:
+        return None
+    try:
+        return times_future.result(timeout=timeout)
+    except Exception as e:
+        Console.warning(f"Time prefetch unavailable: {e}", "PREFETCH")
+        return None
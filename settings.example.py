@@ -30,6 +30,10 @@ GMAIL_APPLICATION_PWD = ""
 # Email notification receiver info
 RECEIVER_NAME = ""
 RECEIVER_EMAIL = ""
+# Slot alerts already sent (legacy/detect_and_notify.py); a (location, date) is
+# alerted again after ALERT_COOLDOWN seconds
+ALERT_STATE_FILE = "alert_state.json"
+ALERT_COOLDOWN = 6 * 3600
 
 # Pushover notification settings (for instant notifications)
 # Get your app token from https://pushover.net/apps/build
@@ -50,6 +54,18 @@ TEST_MODE = True
 
 # Don't change the following unless you know what you are doing
 DETACH = True
+SESSION_BACKEND = "selenium"  # selenium, http or fake
+LOGIN_MODE = "browser"  # browser or http (selenium backend: sign in over HTTP, then share cookies)
+POLL_MODE = "replay"  # replay or fetch (selenium backend: poll from inside the page with its own cookies)
+SCHEDULE_ID_FILE = "schedule_ids.json"  # schedule ID per account, found once; "" disables
+STANDBY_TAB = False  # keep a second tab armed on the appointment form for faster booking
+MAX_BOOKING_CANDIDATES = 3  # acceptable dates from one poll tried in order when the earliest is gone
+STANDBY_REFRESH_SECONDS = 240
+
+# Time slot preferences: earlier ranges win, then earliest/latest inside a range
+PREFERRED_TIME_RANGES = ""  # e.g. "08:00-11:30,13:00-15:00"
+PREFERRED_TIME_ORDER = "earliest"  # or "latest"
+AVOID_TIMES = ""  # e.g. "12:00,12:15"
 NEW_SESSION_AFTER_FAILURES = 5
 NEW_SESSION_DELAY = 60
 TIMEOUT = 10
@@ -57,6 +73,47 @@ FAIL_RETRY_DELAY = 30
 DATE_REQUEST_DELAY = 30
 DATE_REQUEST_MAX_RETRY = 60
 DATE_REQUEST_MAX_TIME = 30 * 60
+BREAKER_FAILURE_THRESHOLD = 5  # failed polls in a row before polling pauses
+BREAKER_COOLDOWN = 60  # first pause in seconds, doubles up to BREAKER_MAX_COOLDOWN
+BREAKER_MAX_COOLDOWN = 900
+RATE_LIMIT_FILE = "/tmp/usvisa_rate_limit.json"  # shared by all processes on this host, "" disables
+RATE_LIMIT_POLLS_PER_MINUTE = 12  # combined across processes
+RATE_LIMIT_TIMES_PER_MINUTE = 30
+RATE_LIMIT_LOGINS_PER_HOUR = 30
+AVAILABILITY_CACHE_SOCKET = ""  # e.g. /tmp/usvisa_availability.sock, "" polls directly
+AVAILABILITY_CACHE_CONSULATES = ""  # consulates the cache daemon polls, default USER_CONSULATE
+AVAILABILITY_CACHE_TTL = 30  # seconds a snapshot stays usable
+AVAILABILITY_CACHE_KEEPALIVE = 300  # seconds between own-session polls while the cache serves
+AVAILABILITY_HISTORY_FILE = ""  # JSON lines of every poll's dates; "" parses only up to LATEST_ACCEPTABLE_DATE
+MEMORY_WATCHDOG_INTERVAL = 60  # seconds between RSS samples, 0 disables the watchdog
+MEMORY_LIMIT_BROWSER_MB = 1500  # recycle the browser above this (chromedriver + Chrome tree)
+MEMORY_LIMIT_PYTHON_MB = 0  # 0 = no limit
+MEMORY_OVER_LIMIT_SAMPLES = 3  # samples in a row over a limit before recycling
+MEMORY_MAX_INEFFECTIVE_RECYCLES = 3  # stop recycling after this many that did not help, 0 = never
+MEMORY_SERIES_FILE = ""  # JSON lines of memory samples for capacity planning
+MEMORY_TRACEMALLOC = False  # also report traced Python allocations
+SESSION_ROTATE_SECONDS = 0  # replace browser and login on this schedule (daemon default: 3600)
+COVERAGE_WINDOW = 3600  # coverage = share of this window with a fresh successful poll
+COVERAGE_STALE_AFTER = 60  # a successful poll counts as fresh for this long
+# Daemon mode (reschedule_daemon.py)
+COVERAGE_REPORT_INTERVAL = 300
+RESTART_BACKOFF_BASE = 5  # first restart delay after a crash; doubles per crash
+RESTART_BACKOFF_MAX = 300
+SHUTDOWN_GRACE_SECONDS = 30  # an in-flight booking may finish this long after SIGTERM
+EVENT_SOCKET = ""  # e.g. "/tmp/usvisa-events.sock" to stream engine events as NDJSON
+EVENT_BUFFER_SIZE = 256  # events buffered per subscriber before new ones are dropped
+HEALTH_PORT = 0  # e.g. 8080 to serve /livez, /readyz and /health on HEALTH_HOST
+HEALTH_HOST = "127.0.0.1"
+HEALTH_MAX_HEARTBEAT_AGE = 300  # not live after this long without a main loop heartbeat
+HEALTH_MAX_POLL_AGE = 300  # not ready after this long without a successful poll
+LOGIN_BUDGET_SECONDS = 60  # no login with less runtime left than this
+BOOKING_BUDGET_SECONDS = 45  # no booking attempt with less runtime left than this
+# Sharded mode (reschedule_sharded.py)
+# WORK_UNITS_FILE holds [{"email": ..., "password": ..., "consulates": ["Toronto"]}]
+WORK_UNITS_FILE = "work_units.json"
+LEASE_STORE = "leases.sqlite3"  # memory, SQLite path or postgresql:// URL
+LEASE_TTL = 60
+LEASE_MAX_HOLD_SECONDS = 1800  # hand a unit over when others wait; 0 holds it until booked
 LOGIN_URL = "https://ais.usvisa-info.com/en-ca/niv/users/sign_in"
 AVAILABLE_DATE_REQUEST_SUFFIX = (
     f"/days/{CONSULATES[USER_CONSULATE]}.json?appointments[expedite]=false"
@@ -1,4 +1,5 @@
 import os
+import tempfile
 from typing import Dict
 
 # Account Info - use environment variables for security
@@ -37,6 +38,12 @@ TEST_MODE = os.getenv("TEST_MODE", "false").lower() == "true"
 
 # Runtime configuration
 DETACH = False  # Set to False for cloud deployment
+SESSION_BACKEND = os.getenv("SESSION_BACKEND", "selenium")  # selenium, http or fake
+# browser fills the sign-in form; http posts it and hands the cookies to Chrome
+LOGIN_MODE = os.getenv("LOGIN_MODE", "browser")
+POLL_MODE = os.getenv("POLL_MODE", "replay")
+# Schedule IDs discovered per account, so later sessions skip the Continue page
+SCHEDULE_ID_FILE = os.getenv("SCHEDULE_ID_FILE", "schedule_ids.json")
 NEW_SESSION_AFTER_FAILURES = int(os.getenv("NEW_SESSION_AFTER_FAILURES", "5"))
 NEW_SESSION_DELAY = int(os.getenv("NEW_SESSION_DELAY", "60"))
 TIMEOUT = int(os.getenv("TIMEOUT", "10"))
@@ -48,10 +55,87 @@ DATE_REQUEST_MAX_TIME = int(os.getenv("DATE_REQUEST_MAX_TIME", "1800"))  # 30 mi
 # Race condition handling settings
 BOOKING_RETRY_ATTEMPTS = int(os.getenv("BOOKING_RETRY_ATTEMPTS", "3"))
 BOOKING_RETRY_DELAY = int(os.getenv("BOOKING_RETRY_DELAY", "2"))
+MAX_BOOKING_CANDIDATES = int(os.getenv("MAX_BOOKING_CANDIDATES", "3"))
 FAST_MODE = os.getenv("FAST_MODE", "true").lower() == "true"  # Reduce delays for faster response
+STANDBY_TAB = os.getenv("STANDBY_TAB", "false").lower() == "true"  # Keep a booking tab armed
+STANDBY_REFRESH_SECONDS = int(os.getenv("STANDBY_REFRESH_SECONDS", "240"))
+
+# Time slot preferences, e.g. PREFERRED_TIME_RANGES="08:00-11:30,13:00-15:00"
+PREFERRED_TIME_RANGES = os.getenv("PREFERRED_TIME_RANGES", "")
+PREFERRED_TIME_ORDER = os.getenv("PREFERRED_TIME_ORDER", "earliest")  # or latest
+AVOID_TIMES = os.getenv("AVOID_TIMES", "")
+
+# Circuit breaker for availability polling during site outages
+BREAKER_FAILURE_THRESHOLD = int(os.getenv("BREAKER_FAILURE_THRESHOLD", "5"))
+BREAKER_COOLDOWN = int(os.getenv("BREAKER_COOLDOWN", "60"))
+BREAKER_MAX_COOLDOWN = int(os.getenv("BREAKER_MAX_COOLDOWN", "900"))
+
+# Host-wide rate limits shared by every rescheduler on this machine (via RATE_LIMIT_FILE)
+RATE_LIMIT_FILE = os.getenv(
+    "RATE_LIMIT_FILE", os.path.join(tempfile.gettempdir(), "usvisa_rate_limit.json")
+)
+RATE_LIMIT_POLLS_PER_MINUTE = int(os.getenv("RATE_LIMIT_POLLS_PER_MINUTE", "12"))
+RATE_LIMIT_TIMES_PER_MINUTE = int(os.getenv("RATE_LIMIT_TIMES_PER_MINUTE", "30"))
+RATE_LIMIT_LOGINS_PER_HOUR = int(os.getenv("RATE_LIMIT_LOGINS_PER_HOUR", "30"))
+
+# Shared availability cache (availability_cache.py); empty socket path polls directly
+AVAILABILITY_CACHE_SOCKET = os.getenv("AVAILABILITY_CACHE_SOCKET", "")
+AVAILABILITY_CACHE_CONSULATES = os.getenv("AVAILABILITY_CACHE_CONSULATES", "")  # comma-separated, default USER_CONSULATE
+AVAILABILITY_CACHE_TTL = int(os.getenv("AVAILABILITY_CACHE_TTL", "30"))
+AVAILABILITY_CACHE_KEEPALIVE = int(os.getenv("AVAILABILITY_CACHE_KEEPALIVE", "300"))  # seconds between own-session polls
+
+# Append every poll's full date list to this file (JSON lines); "" disables and
+# lets polls stop parsing at the first date after LATEST_ACCEPTABLE_DATE
+AVAILABILITY_HISTORY_FILE = os.getenv("AVAILABILITY_HISTORY_FILE", "")
+
+# Memory watchdog: sample RSS every N seconds (0 disables) and recycle the browser
+# between polls when the browser tree or this process exceeds its limit (MB, 0 = no limit)
+MEMORY_WATCHDOG_INTERVAL = int(os.getenv("MEMORY_WATCHDOG_INTERVAL", "60"))
+MEMORY_LIMIT_BROWSER_MB = int(os.getenv("MEMORY_LIMIT_BROWSER_MB", "1500"))
+MEMORY_LIMIT_PYTHON_MB = int(os.getenv("MEMORY_LIMIT_PYTHON_MB", "0"))
+MEMORY_OVER_LIMIT_SAMPLES = int(os.getenv("MEMORY_OVER_LIMIT_SAMPLES", "3"))
+MEMORY_MAX_INEFFECTIVE_RECYCLES = int(os.getenv("MEMORY_MAX_INEFFECTIVE_RECYCLES", "3"))
+MEMORY_SERIES_FILE = os.getenv("MEMORY_SERIES_FILE", "")  # JSON lines of samples
+MEMORY_TRACEMALLOC = os.getenv("MEMORY_TRACEMALLOC", "false").lower() == "true"
+
+# Replace the browser and login after this many seconds (0: only on expiry)
+SESSION_ROTATE_SECONDS = int(os.getenv("SESSION_ROTATE_SECONDS", "0"))
+# Coverage: share of the last COVERAGE_WINDOW seconds with a poll under COVERAGE_STALE_AFTER old
+COVERAGE_WINDOW = int(os.getenv("COVERAGE_WINDOW", "3600"))
+COVERAGE_STALE_AFTER = int(os.getenv("COVERAGE_STALE_AFTER", str(3 * DATE_REQUEST_DELAY)))
+# Daemon mode (reschedule_daemon.py)
+COVERAGE_REPORT_INTERVAL = int(os.getenv("COVERAGE_REPORT_INTERVAL", "300"))
+RESTART_BACKOFF_BASE = int(os.getenv("RESTART_BACKOFF_BASE", "5"))
+RESTART_BACKOFF_MAX = int(os.getenv("RESTART_BACKOFF_MAX", "300"))
+
+# Seconds an in-flight booking may keep running after SIGTERM / SIGINT
+SHUTDOWN_GRACE_SECONDS = int(os.getenv("SHUTDOWN_GRACE_SECONDS", "30"))
+
+# Event stream (NDJSON over a Unix socket); slow readers lose events, never block polls
+EVENT_SOCKET = os.getenv("EVENT_SOCKET", "")
+EVENT_BUFFER_SIZE = int(os.getenv("EVENT_BUFFER_SIZE", "256"))
+
+# Health endpoint (/livez, /readyz, /health) for supervisors; 0 disables it
+HEALTH_PORT = int(os.getenv("HEALTH_PORT", "0"))
+HEALTH_HOST = os.getenv("HEALTH_HOST", "127.0.0.1")
+HEALTH_MAX_HEARTBEAT_AGE = int(os.getenv("HEALTH_MAX_HEARTBEAT_AGE", "300"))
+HEALTH_MAX_POLL_AGE = int(os.getenv("HEALTH_MAX_POLL_AGE", "300"))
+
+# Session renewal settings
+SESSION_RENEWAL_MAX_ATTEMPTS = int(os.getenv("SESSION_RENEWAL_MAX_ATTEMPTS", "4"))
+SESSION_RENEWAL_DELAY = int(os.getenv("SESSION_RENEWAL_DELAY", "5"))
+
+# Sharded mode (reschedule_sharded.py): JSON list of accounts and the shared lease store
+WORK_UNITS_FILE = os.getenv("WORK_UNITS_FILE", "work_units.json")
+LEASE_STORE = os.getenv("LEASE_STORE", "leases.sqlite3")  # memory, SQLite path or postgresql:// URL
+LEASE_TTL = int(os.getenv("LEASE_TTL", "60"))
+LEASE_MAX_HOLD_SECONDS = int(os.getenv("LEASE_MAX_HOLD_SECONDS", "1800"))  # 0: hold until booked
 
 # Cloud platform timeout (6 hours for GitHub Actions)
 MAX_RUNTIME_SECONDS = int(os.getenv("MAX_RUNTIME_SECONDS", "21600"))  # 6 hours
+# Logins and bookings are not started with less than this much runtime left
+LOGIN_BUDGET_SECONDS = int(os.getenv("LOGIN_BUDGET_SECONDS", "60"))
+BOOKING_BUDGET_SECONDS = int(os.getenv("BOOKING_BUDGET_SECONDS", "45"))
 
 # URLs and endpoints
 LOGIN_URL = "https://ais.usvisa-info.com/en-ca/niv/users/sign_in"
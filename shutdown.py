@@ -0,0 +1,62 @@
+"""
+Graceful shutdown on SIGTERM / SIGINT
+Signals set a process-wide shutdown event. Loops wait on the event instead of
+sleeping, so they exit within milliseconds; work already in flight (a booking)
+gets a grace period before the main thread is interrupted.
+"""
+
+import _thread
+import signal
+import threading
+
+from console_utils import Console
+
+SHUTDOWN = threading.Event()
+_background_threads = []
+
+
+def shutdown_requested() -> bool:
+    return SHUTDOWN.is_set()
+
+
+def interruptible_sleep(seconds: float) -> bool:
+    """Sleep unless shutdown is requested; True when the sleep was cut short"""
+    return SHUTDOWN.wait(max(0, seconds))
+
+
+def install_signal_handlers(grace_period: float = 30):
+    """Request shutdown on SIGTERM / SIGINT; a second signal stops immediately"""
+
+    def handle(signum, frame):
+        if SHUTDOWN.is_set():
+            raise KeyboardInterrupt
+        Console.warning(
+            f"Received {signal.Signals(signum).name} - shutting down (grace period {grace_period}s)",
+            "SHUTDOWN",
+        )
+        # Set the event from another thread: Event.set is not safe inside a handler
+        threading.Thread(target=SHUTDOWN.set, daemon=True).start()
+        timer = threading.Timer(grace_period, _thread.interrupt_main)
+        timer.daemon = True
+        timer.start()
+
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(signum, handle)
+
+
+def start_background(target, *args) -> threading.Thread:
+    """Start a daemon thread that flush_background waits for on shutdown"""
+    thread = threading.Thread(target=target, args=args, daemon=True)
+    _background_threads.append(thread)
+    thread.start()
+    return thread
+
+
+def flush_background(timeout: float = 10):
+    """Give pending background work (e.g. notification emails) time to finish"""
+    pending = [thread for thread in _background_threads if thread.is_alive()]
+    if pending:
+        Console.info(f"Waiting for {len(pending)} background task(s)...", "SHUTDOWN")
+    for thread in pending:
+        thread.join(timeout)
+    _background_threads[:] = [t for t in _background_threads if t.is_alive()]
@@ -0,0 +1,50 @@
+import os
+import tempfile
+import unittest
+from datetime import date
+
+from alert_state import AlertState
+
+
+class AlertStateTest(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        self.path = os.path.join(self.tmpdir.name, "alerts.json")
+        # 2025-01-01 noon UTC, before every slot date below
+        self.now = 1735732800.0
+
+    def make_state(self):
+        return AlertState(self.path, cooldown=3600, clock=lambda: self.now)
+
+    def test_repeats_suppressed_across_restarts_until_cooldown(self):
+        match = [("Toronto", date(2025, 3, 1))]
+        state = self.make_state()
+        self.assertEqual(state.select(match), match)
+        state.mark_alerted(match)
+
+        restarted = self.make_state()
+        self.assertEqual(restarted.select(match), [])
+        self.now += 3600
+        self.assertEqual(restarted.select(match), match)
+
+    def test_new_pairs_and_improvements_alert_within_cooldown(self):
+        state = self.make_state()
+        first = [("Toronto", date(2025, 3, 1)), ("Toronto", date(2025, 4, 1))]
+        state.mark_alerted(state.select(first))
+
+        # The earlier date flickers away for a cycle, then comes back
+        self.assertEqual(state.select([("Toronto", date(2025, 4, 1))]), [])
+        self.assertEqual(
+            state.select(first + [("Ottawa", date(2025, 5, 1))]),
+            [("Ottawa", date(2025, 5, 1))],
+        )
+        # A date earlier than any alerted one is new
+        self.assertEqual(
+            state.select(first + [("Toronto", date(2025, 2, 1))]),
+            [("Toronto", date(2025, 2, 1))],
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
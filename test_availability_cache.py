@@ -0,0 +1,94 @@
+import os
+import tempfile
+import unittest
+from datetime import date
+
+from availability_cache import (
+    AvailabilityCacheClient,
+    AvailabilityCacheServer,
+    SnapshotStore,
+)
+from poll_outcomes import PollResult, PollStatus
+from reschedule_engine import SESSION_EXPIRED, RescheduleEngine
+from session_backends import FakeBackend
+from test_reschedule_engine import make_settings
+
+
+class AvailabilityCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        self.socket_path = os.path.join(self.tmpdir.name, "cache.sock")
+        self.now = 1000.0
+        self.store = SnapshotStore(30, clock=lambda: self.now)
+        self.server = AvailabilityCacheServer(self.socket_path, self.store)
+        self.server.start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        self.client = AvailabilityCacheClient(self.socket_path, clock=lambda: self.now)
+
+    def test_serves_fresh_snapshots_only(self):
+        self.assertIsNone(self.client.get("Toronto"))
+        self.store.publish("Toronto", PollResult(PollStatus.OK, [date(2025, 3, 1)]))
+
+        result = self.client.get("Toronto")
+        self.assertEqual(result.status, PollStatus.OK)
+        self.assertEqual(result.dates, [date(2025, 3, 1)])
+
+        self.now += 31
+        self.assertIsNone(self.client.get("Toronto"))
+        self.assertEqual(self.client.summary(), "1 hit(s), 2 miss(es)")
+
+    def test_engine_reads_cache_and_books_with_own_session(self):
+        self.store.publish("Toronto", PollResult(PollStatus.OK, [date(2025, 2, 1)]))
+        backend = FakeBackend()
+        engine = RescheduleEngine(
+            make_settings(AVAILABILITY_CACHE_SOCKET=self.socket_path), lambda: backend
+        )
+        engine.availability_cache.clock = lambda: self.now
+
+        self.assertTrue(engine.reschedule_with_new_session())
+        self.assertEqual(backend.polls, 0)
+        self.assertEqual(backend.booked, [date(2025, 2, 1)])
+
+    def test_engine_keeps_its_own_session_checked_while_cache_serves(self):
+        self.store.ttl = 3600
+        self.store.publish("Toronto", PollResult(PollStatus.EMPTY))
+        backend = FakeBackend(poll_results=[PollResult(PollStatus.SESSION_EXPIRED)])
+
+        def sleep(seconds):
+            self.now += seconds
+
+        engine = RescheduleEngine(
+            make_settings(
+                AVAILABILITY_CACHE_SOCKET=self.socket_path,
+                AVAILABILITY_CACHE_KEEPALIVE=100,
+                DATE_REQUEST_DELAY=10,
+                DATE_REQUEST_MAX_TIME=3600,
+                DATE_REQUEST_MAX_RETRY=50,
+            ),
+            lambda: backend,
+            clock=lambda: self.now,
+            sleep=sleep,
+        )
+        engine.availability_cache.clock = lambda: self.now
+        engine.own_poll_at = self.now
+
+        # Cache hits for 100s, then one poll on our own session finds it expired
+        self.assertEqual(engine.reschedule(backend), SESSION_EXPIRED)
+        self.assertEqual(backend.polls, 1)
+        self.assertEqual(self.now, 1100)
+
+    def test_engine_falls_back_when_cache_is_down(self):
+        backend = FakeBackend(poll_results=[[date(2025, 2, 1)]])
+        engine = RescheduleEngine(
+            make_settings(AVAILABILITY_CACHE_SOCKET=self.socket_path + ".missing"),
+            lambda: backend,
+        )
+
+        self.assertTrue(engine.reschedule_with_new_session())
+        self.assertEqual(backend.polls, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,48 @@
+import unittest
+
+from benchmarks import compare, run_benchmarks
+
+
+class BenchmarksTest(unittest.TestCase):
+    def test_compare_flags_slowdowns_and_round_trips(self):
+        baselines = {
+            "a": {"us_per_op": 10.0, "round_trips": 5},
+            "b": {"us_per_op": 10.0, "round_trips": None},
+        }
+        results = {
+            "a": {"us_per_op": 11.0, "round_trips": 6},
+            "b": {"us_per_op": 20.0, "round_trips": None},
+            "c": {"skipped": "not importable"},
+        }
+        regressions = compare(results, baselines, tolerance=1.5)
+        self.assertEqual(len(regressions), 2)
+        self.assertIn("a: 6 round trips", regressions[0])
+        self.assertIn("b: 20.00us/op", regressions[1])
+
+    def test_compare_scales_baselines_by_host_speed(self):
+        baselines = {"a": {"us_per_op": 10.0, "reference_us": 100.0, "round_trips": None}}
+        slower_host = {"a": {"us_per_op": 20.0, "reference_us": 200.0, "round_trips": None}}
+        self.assertEqual(compare(slower_host, baselines, tolerance=1.5), [])
+        regressed = {"a": {"us_per_op": 20.0, "reference_us": 100.0, "round_trips": None}}
+        self.assertEqual(len(compare(regressed, baselines, tolerance=1.5)), 1)
+
+    def test_book_on_form_round_trips_are_counted(self):
+        result = run_benchmarks(["book_on_form_fake_driver"], repeat=1)
+        self.assertGreater(result["book_on_form_fake_driver"]["round_trips"], 0)
+
+    def test_in_page_fetch_saves_cookie_export_round_trips(self):
+        result = run_benchmarks(
+            ["poll_cookie_replay_fake_driver", "poll_in_page_fetch_fake_driver"], repeat=1
+        )
+        self.assertLess(
+            result["poll_in_page_fetch_fake_driver"]["round_trips"],
+            result["poll_cookie_replay_fake_driver"]["round_trips"],
+        )
+
+    def test_payment_table_detect_runs_without_settings_file(self):
+        result = run_benchmarks(["payment_table_detect_200"], repeat=1)
+        self.assertNotIn("skipped", result["payment_table_detect_200"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,102 @@
+import unittest
+from datetime import date
+
+import deadline
+from deadline import Deadline, DeadlineExceeded, activate, budget
+from reschedule_engine import RescheduleEngine, TimeoutHandler
+from session_backends import FakeBackend
+from test_reschedule_engine import make_settings
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+class DeadlineTest(unittest.TestCase):
+    def setUp(self):
+        self.addCleanup(activate, deadline._active)
+
+    def test_budget_is_unchanged_without_deadline(self):
+        activate(None)
+        self.assertEqual(budget(30), 30)
+
+    def test_budget_caps_at_remaining_time(self):
+        clock = FakeClock()
+        activate(Deadline(100, clock))
+        self.assertEqual(budget(30), 30)
+        clock.now = 90
+        self.assertEqual(budget(30), 10)
+        clock.now = 100
+        with self.assertRaises(DeadlineExceeded):
+            budget(30)
+
+    def test_engine_refuses_login_without_budget(self):
+        clock = FakeClock()
+        backend = FakeBackend(poll_results=[[date(2025, 2, 1)]])
+        engine = RescheduleEngine(
+            make_settings(LOGIN_BUDGET_SECONDS=60),
+            lambda: backend,
+            timeout_handler=TimeoutHandler(100, clock),
+        )
+        clock.now = 50
+
+        self.assertFalse(engine.reschedule_with_new_session())
+        engine.close()
+        self.assertEqual(backend.logins, 0)
+
+    def test_engine_sleep_stops_at_deadline(self):
+        clock = FakeClock()
+        slept = []
+        engine = RescheduleEngine(
+            make_settings(),
+            lambda: FakeBackend(),
+            timeout_handler=TimeoutHandler(100, clock),
+            sleep=slept.append,
+        )
+        clock.now = 95
+        engine.sleep(60)
+        engine.close()
+        self.assertEqual(slept, [5])
+
+    def test_engine_stops_exactly_at_deadline(self):
+        clock = FakeClock()
+        engine = RescheduleEngine(
+            make_settings(
+                DATE_REQUEST_DELAY=30,
+                DATE_REQUEST_MAX_RETRY=float("inf"),
+                DATE_REQUEST_MAX_TIME=float("inf"),
+                LOGIN_BUDGET_SECONDS=0,
+            ),
+            lambda: FakeBackend(),
+            timeout_handler=TimeoutHandler(100, clock),
+            clock=clock,
+            sleep=clock.sleep,
+        )
+        self.assertFalse(engine.run())
+        engine.close()
+        self.assertEqual(clock.now, 100)
+
+    def test_engine_stops_when_no_login_fits(self):
+        clock = FakeClock()
+        backend = FakeBackend()
+        engine = RescheduleEngine(
+            make_settings(DATE_REQUEST_DELAY=30, LOGIN_BUDGET_SECONDS=60),
+            lambda: backend,
+            timeout_handler=TimeoutHandler(100, clock),
+            clock=clock,
+            sleep=clock.sleep,
+        )
+        self.assertFalse(engine.run())
+        engine.close()
+        self.assertEqual(backend.logins, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,80 @@
+import json
+import os
+import socket
+import tempfile
+import time
+import unittest
+from datetime import date
+
+from event_bus import EventBus, EventStreamServer, EventType
+from reschedule_engine import RescheduleEngine
+from session_backends import FakeBackend
+from test_reschedule_engine import make_settings
+
+
+class EventBusTest(unittest.TestCase):
+    def test_full_buffer_drops_instead_of_blocking(self):
+        bus = EventBus(buffer_size=2)
+        subscription = bus.subscribe()
+        for index in range(5):
+            bus.publish(EventType.POLL_RESULT, index=index)
+
+        self.assertEqual(subscription.get(0)["index"], 0)
+        self.assertEqual(subscription.get(0)["index"], 1)
+        self.assertIsNone(subscription.get(0))
+        self.assertEqual(subscription.dropped, 3)
+
+        subscription.close()
+        bus.publish(EventType.POLL_RESULT, index=5)
+        self.assertEqual(bus.summary(), "6 event(s), 0 subscriber(s), 0 dropped")
+
+    def test_engine_publishes_poll_match_and_booking_events(self):
+        bus = EventBus()
+        subscription = bus.subscribe()
+        backend = FakeBackend(poll_results=[[date(2025, 9, 1)], [date(2025, 5, 1)]])
+        engine = RescheduleEngine(make_settings(), lambda: backend, event_bus=bus)
+
+        self.assertTrue(engine.reschedule_with_new_session())
+        engine.close()
+        events = []
+        while (event := subscription.get(0)) is not None:
+            events.append((event["type"], event.get("date")))
+        self.assertEqual(
+            events,
+            [
+                ("poll_result", None),
+                ("poll_result", None),
+                ("new_date", "2025-05-01"),
+                ("slot_matched", "2025-05-01"),
+                ("booking_step", "2025-05-01"),
+                ("booking_step", "2025-05-01"),
+                ("booking_result", "2025-05-01"),
+            ],
+        )
+
+
+class EventStreamServerTest(unittest.TestCase):
+    def test_streams_events_as_json_lines(self):
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        socket_path = os.path.join(tmpdir.name, "events.sock")
+        bus = EventBus()
+        server = EventStreamServer(socket_path, bus)
+        server.start()
+        self.addCleanup(server.stop)
+
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as connection:
+            connection.settimeout(2)
+            connection.connect(socket_path)
+            deadline = time.monotonic() + 2
+            while not bus.subscribers and time.monotonic() < deadline:
+                time.sleep(0.01)
+            bus.publish(EventType.SESSION_RENEWED, consulate="Toronto")
+            with connection.makefile("rb") as stream:
+                event = json.loads(stream.readline())
+        self.assertEqual(event["type"], "session_renewed")
+        self.assertEqual(event["consulate"], "Toronto")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,102 @@
+import json
+import os
+import tempfile
+import unittest
+import urllib.error
+import urllib.request
+from datetime import date
+
+from health import HealthServer, HealthState
+from reschedule_engine import RescheduleEngine, TimeoutHandler
+from session_backends import FakeBackend
+from test_reschedule_engine import make_settings
+
+
+class HealthStateTest(unittest.TestCase):
+    def setUp(self):
+        self.now = 0.0
+        self.state = HealthState(
+            max_heartbeat_age=60, max_poll_age=30, clock=lambda: self.now
+        )
+
+    def test_planned_waits_do_not_fail_liveness(self):
+        self.state.beat("circuit_open", busy_for=600)
+        self.now = 500
+        self.assertTrue(self.state.snapshot()["live"])
+        self.now = 700
+        snapshot = self.state.snapshot()
+        self.assertFalse(snapshot["live"])
+        self.assertEqual(snapshot["phase"], "circuit_open")
+
+    def test_ready_needs_session_and_recent_success(self):
+        self.assertFalse(self.state.snapshot()["ready"])
+        self.state.session_opened()
+        self.state.record_poll(True, 0)
+        self.assertTrue(self.state.snapshot()["ready"])
+        self.now = 31
+        self.assertFalse(self.state.snapshot()["ready"])
+
+    def test_engine_reports_phase_failures_and_budget(self):
+        backend = FakeBackend(poll_results=[None, None, [date(2025, 9, 1)]])
+        engine = RescheduleEngine(
+            make_settings(DATE_REQUEST_MAX_RETRY=2),
+            lambda: backend,
+            timeout_handler=TimeoutHandler(600, lambda: self.now),
+            clock=lambda: self.now,
+            health=self.state,
+        )
+        self.assertFalse(engine.reschedule_with_new_session())
+        engine.close()
+        snapshot = self.state.snapshot()
+        self.assertEqual(snapshot["phase"], "between_sessions")
+        self.assertEqual(snapshot["consecutive_failures"], 0)
+        self.assertIsNone(snapshot["session_age"])
+        self.assertEqual(snapshot["last_successful_poll_age"], 0)
+        self.assertEqual(snapshot["remaining_runtime"], 600)
+
+    def test_rate_limiter_waits_are_planned(self):
+        live_while_waiting = []
+
+        def sleep(seconds):
+            # Near the end of the wait the last heartbeat is long overdue
+            self.now += seconds - 1
+            live_while_waiting.append(self.state.snapshot()["live"])
+            self.now += 1
+
+        with tempfile.TemporaryDirectory() as directory:
+            engine = RescheduleEngine(
+                make_settings(
+                    RATE_LIMIT_FILE=os.path.join(directory, "limits.json"),
+                    RATE_LIMIT_LOGINS_PER_HOUR=1,
+                ),
+                FakeBackend,
+                clock=lambda: self.now,
+                sleep=sleep,
+                health=self.state,
+            )
+            engine.rate_limiter.clock = lambda: self.now
+            engine.throttle("login")
+            engine.throttle("login")
+        self.assertTrue(live_while_waiting)
+        self.assertTrue(all(live_while_waiting))
+
+
+class HealthServerTest(unittest.TestCase):
+    def test_serves_status_codes(self):
+        state = HealthState()
+        server = HealthServer(state, 0)
+        server.start()
+        self.addCleanup(server.stop)
+        base_url = f"http://127.0.0.1:{server.server_address[1]}"
+
+        with urllib.request.urlopen(f"{base_url}/livez", timeout=2) as response:
+            self.assertEqual(response.status, 200)
+            self.assertEqual(json.load(response)["phase"], "starting")
+        with self.assertRaises(urllib.error.HTTPError) as raised:
+            urllib.request.urlopen(f"{base_url}/readyz", timeout=2)
+        self.assertEqual(raised.exception.code, 503)
+        raised.exception.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,80 @@
+import os
+import unittest
+from datetime import date
+
+from memory_watchdog import MemoryWatchdog, process_rss, process_tree
+from reschedule_engine import RescheduleEngine
+from session_backends import FakeBackend
+from test_reschedule_engine import make_settings
+
+
+class MemoryWatchdogTest(unittest.TestCase):
+    def test_samples_this_process(self):
+        self.assertIn(os.getpid(), process_tree(os.getpid()))
+        self.assertGreater(process_rss(os.getpid()), 0)
+
+        watchdog = MemoryWatchdog(
+            interval=60, browser_limit_mb=0, python_limit_mb=1, over_limit_samples=1
+        )
+        self.assertIn("Python RSS", watchdog.check(os.getpid()))
+        # Not due again until the interval has passed
+        self.assertIsNone(watchdog.check(os.getpid()))
+        self.assertEqual(len(watchdog.samples), 1)
+
+    def test_engine_recycles_backend_between_polls(self):
+        backends = [
+            FakeBackend(poll_results=[[date(2025, 9, 1)]]),
+            FakeBackend(poll_results=[[date(2025, 2, 1)]]),
+        ]
+        engine = RescheduleEngine(
+            make_settings(
+                MEMORY_WATCHDOG_INTERVAL=3600,
+                MEMORY_LIMIT_PYTHON_MB=1,
+                MEMORY_OVER_LIMIT_SAMPLES=1,
+            ),
+            lambda: backends.pop(0),
+        )
+
+        self.assertTrue(engine.reschedule_with_new_session())
+        self.assertEqual(backends, [])
+        self.assertEqual(engine.memory_watchdog.recycles, 1)
+
+    def test_needs_a_streak_and_backs_off_when_recycling_does_not_help(self):
+        watchdog = MemoryWatchdog(
+            interval=0, browser_limit_mb=100, over_limit_samples=2, max_ineffective_recycles=2
+        )
+        readings = []
+        watchdog.sample = lambda browser_pid: {
+            "browser_rss_mb": readings.pop(0),
+            "python_rss_mb": 0,
+            "browser_processes": 1,
+        }
+
+        def recycles_after(*values):
+            readings.extend(values)
+            return [watchdog.check(1) is not None for _ in values]
+
+        # A single spike is ignored; two samples in a row over the limit recycle
+        self.assertEqual(recycles_after(150, 90, 150, 150), [False, False, False, True])
+        # Still over right after the recycle: four samples are needed next time
+        self.assertEqual(recycles_after(150, 150, 150, 150), [False, False, False, True])
+        # A second recycle that does not help stops recycling for good
+        self.assertEqual(recycles_after(*[150] * 10), [False] * 10)
+        self.assertEqual(watchdog.recycles, 2)
+
+    def test_recycle_that_helps_resets_the_back_off(self):
+        watchdog = MemoryWatchdog(interval=0, browser_limit_mb=100, over_limit_samples=1)
+        readings = [150, 150, 150, 50, 150]
+        watchdog.sample = lambda browser_pid: {
+            "browser_rss_mb": readings.pop(0),
+            "python_rss_mb": 0,
+            "browser_processes": 1,
+        }
+        recycled = [watchdog.check(1) is not None for _ in range(5)]
+        # After the first recycle fails, two samples are needed; once one helps, one again
+        self.assertEqual(recycled, [True, False, True, False, True])
+        self.assertEqual(watchdog.ineffective_recycles, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
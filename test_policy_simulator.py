@@ -0,0 +1,66 @@
+import unittest
+from datetime import date
+
+from policy_simulator import (
+    DAY,
+    Latencies,
+    SlotRelease,
+    simulate_policies,
+    synthetic_timeline,
+)
+
+
+class PolicySimulatorTest(unittest.TestCase):
+    def test_short_lived_slot_needs_fast_polling(self):
+        timeline = [SlotRelease(1000, date(2025, 3, 1), 45)]
+        report = simulate_policies(
+            {"slow": {"DATE_REQUEST_DELAY": 120}, "fast": {"DATE_REQUEST_DELAY": 10}},
+            [timeline],
+            horizon=2000,
+            latencies=Latencies(poll=0.5, login=1, booking=2),
+        )
+        self.assertEqual(report["slow"]["hit_rate"], 0)
+        self.assertEqual(report["fast"]["hit_rate"], 1)
+        self.assertLess(report["fast"]["median_hours_to_book"] * 3600, 1060)
+        self.assertEqual(report["fast"]["notifications_per_trial"], 2)
+        self.assertGreater(
+            report["fast"]["requests_per_trial"], report["slow"]["requests_per_trial"]
+        )
+
+    def test_window_excludes_late_dates(self):
+        timeline = [SlotRelease(100, date(2025, 9, 1), 600)]
+        report = simulate_policies({"default": {}}, [timeline], horizon=DAY / 4)
+        self.assertEqual(report["default"]["hit_rate"], 0)
+        self.assertEqual(report["default"]["notifications_per_trial"], 0)
+
+    def test_runs_to_the_horizon(self):
+        report = simulate_policies({"default": {}}, [[]], horizon=100 * DAY)
+        self.assertEqual(report["default"]["hit_rate"], 0)
+        # One poll per 30.5s, minus the sessions' logins and page loads
+        self.assertGreater(report["default"]["requests_per_trial"], 100 * DAY / 31)
+
+    def test_fast_forward_matches_polling_every_tick(self):
+        timelines = [synthetic_timeline(3, releases_per_day=4, seed=seed) for seed in range(3)]
+        policies = {
+            "default": {},
+            "fast": {"DATE_REQUEST_DELAY": 10},
+            "short_sessions": {"DATE_REQUEST_MAX_RETRY": 5},
+            "narrow": {"LATEST_ACCEPTABLE_DATE": "2025-02-15"},
+        }
+        self.assertEqual(
+            simulate_policies(policies, timelines, 3 * DAY, fast_forward=False),
+            simulate_policies(policies, timelines, 3 * DAY),
+        )
+
+    def test_synthetic_timeline_is_reproducible(self):
+        first = synthetic_timeline(10, seed=7)
+        second = synthetic_timeline(10, seed=7)
+        self.assertEqual(
+            [(s.released_at, s.date) for s in first],
+            [(s.released_at, s.date) for s in second],
+        )
+        self.assertTrue(all(s.released_at < 10 * DAY for s in first))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,143 @@
+import json
+import unittest
+from datetime import date
+
+from poll_outcomes import (
+    CircuitBreaker,
+    CoverageTracker,
+    PollResult,
+    PollStatus,
+    classify_response,
+    parse_available_dates,
+)
+
+
+class FakeResponse:
+    def __init__(self, status_code=200, body=b"[]", headers=None):
+        self.status_code = status_code
+        self.content = body
+        self.headers = headers or {}
+
+    def json(self):
+        return json.loads(self.content)
+
+
+class ClassifyResponseTest(unittest.TestCase):
+    def test_statuses(self):
+        body = json.dumps([{"date": "2025-03-04"}, {"date": "2025-03-09"}]).encode()
+        result = classify_response(FakeResponse(body=body))
+        self.assertEqual(result.status, PollStatus.OK)
+        self.assertEqual(result.dates, [date(2025, 3, 4), date(2025, 3, 9)])
+
+        self.assertEqual(classify_response(FakeResponse()).status, PollStatus.EMPTY)
+        self.assertEqual(
+            classify_response(FakeResponse(401)).status, PollStatus.SESSION_EXPIRED
+        )
+        denied = classify_response(FakeResponse(403, headers={"Retry-After": "120"}))
+        self.assertEqual(denied.status, PollStatus.SESSION_EXPIRED)
+        self.assertIsNone(denied.retry_after)
+        limited = classify_response(FakeResponse(429, headers={"Retry-After": "120"}))
+        self.assertEqual(limited.status, PollStatus.RATE_LIMITED)
+        self.assertEqual(limited.retry_after, 120)
+        self.assertEqual(
+            classify_response(FakeResponse(503)).status, PollStatus.SERVER_ERROR
+        )
+        self.assertEqual(
+            classify_response(FakeResponse(body=b"<html>")).status,
+            PollStatus.PARSE_ERROR,
+        )
+
+
+class ParseAvailableDatesTest(unittest.TestCase):
+    def body(self, *values):
+        return json.dumps([{"date": v, "business_day": True} for v in values]).encode()
+
+    def test_stops_after_first_date_past_window(self):
+        body = self.body("2025-03-04", "2025-03-09", "2025-08-01", "2025-09-01")
+        self.assertEqual(
+            parse_available_dates(body, date(2025, 6, 30)),
+            [date(2025, 3, 4), date(2025, 3, 9), date(2025, 8, 1)],
+        )
+        # Earliest date is kept even when it is already outside the window
+        self.assertEqual(
+            parse_available_dates(body, date(2025, 1, 1)), [date(2025, 3, 4)]
+        )
+        self.assertEqual(len(parse_available_dates(body)), 4)
+
+    def test_falls_back_to_full_parse(self):
+        unordered = self.body("2025-05-01", "2025-03-04", "2025-09-01")
+        self.assertEqual(
+            parse_available_dates(unordered, date(2025, 6, 30)),
+            [date(2025, 3, 4), date(2025, 5, 1), date(2025, 9, 1)],
+        )
+        self.assertEqual(parse_available_dates(b"[]", date(2025, 6, 30)), [])
+        with self.assertRaises(ValueError):
+            parse_available_dates(b"<html>", date(2025, 6, 30))
+
+
+class CircuitBreakerTest(unittest.TestCase):
+    def setUp(self):
+        self.now = 0.0
+        self.breaker = CircuitBreaker(
+            failure_threshold=3, cooldown=10, max_cooldown=25, clock=lambda: self.now
+        )
+
+    def fail(self):
+        self.breaker.record(PollResult(PollStatus.SERVER_ERROR))
+
+    def test_opens_probes_and_closes(self):
+        for _ in range(3):
+            self.fail()
+        self.assertEqual(self.breaker.state, CircuitBreaker.OPEN)
+        self.assertEqual(self.breaker.wait_time(), 10)
+
+        # A failed probe doubles the cooldown
+        self.now = 10
+        self.assertEqual(self.breaker.wait_time(), 0)
+        self.assertEqual(self.breaker.state, CircuitBreaker.HALF_OPEN)
+        self.fail()
+        self.assertEqual(self.breaker.wait_time(), 20)
+
+        # A successful probe closes the breaker and resets the cooldown
+        self.now = 30
+        self.breaker.wait_time()
+        self.breaker.record(PollResult(PollStatus.EMPTY))
+        self.assertEqual(self.breaker.state, CircuitBreaker.CLOSED)
+        self.assertEqual(self.breaker.cooldown, 10)
+        self.assertEqual(self.breaker.metrics["closed->open"], 1)
+        self.assertEqual(self.breaker.metrics["half_open->closed"], 1)
+
+    def test_retry_after_alone_does_not_open(self):
+        # Retry-After is honoured as a minimum wait by the engine, not a cooldown
+        self.breaker.record(PollResult(PollStatus.RATE_LIMITED, retry_after=1))
+        self.assertEqual(self.breaker.state, CircuitBreaker.CLOSED)
+        self.assertEqual(self.breaker.wait_time(), 0)
+
+    def test_retry_after_extends_cooldown_once_open(self):
+        self.fail()
+        self.fail()
+        self.breaker.record(PollResult(PollStatus.RATE_LIMITED, retry_after=60))
+        self.assertEqual(self.breaker.state, CircuitBreaker.OPEN)
+        self.assertEqual(self.breaker.wait_time(), 60)
+
+
+class CoverageTrackerTest(unittest.TestCase):
+    def test_counts_time_with_a_fresh_successful_poll(self):
+        self.now = 0.0
+        coverage = CoverageTracker(window=100, stale_after=10, clock=lambda: self.now)
+        for polled_at in (0, 5, 30):
+            self.now = polled_at
+            coverage.record(PollResult(PollStatus.OK, [date(2025, 3, 1)]))
+        self.now = 35
+        coverage.record(PollResult(PollStatus.NETWORK_ERROR))
+
+        # Covered: 0-15 and 30-40 out of the 50 seconds since tracking began
+        self.now = 50
+        self.assertAlmostEqual(coverage.coverage(), 25 / 50)
+        # Only the last 100 seconds count
+        self.now = 130
+        self.assertAlmostEqual(coverage.coverage(), 10 / 100)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,51 @@
+import os
+import tempfile
+import unittest
+
+from rate_limiter import SharedRateLimiter
+from shutdown import SHUTDOWN
+
+
+class SharedRateLimiterTest(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, "limits.json")
+        self.now = 1000.0
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def make_limiter(self):
+        def fake_sleep(seconds):
+            self.now += seconds
+
+        return SharedRateLimiter(
+            self.path, {"days": (0.5, 2)}, clock=lambda: self.now, sleep=fake_sleep
+        )
+
+    def test_processes_share_one_bucket(self):
+        first, second = self.make_limiter(), self.make_limiter()
+        self.assertEqual(first.acquire("days"), 0)
+        self.assertEqual(second.acquire("days"), 0)
+        # Burst spent by both limiters: the next token takes 2 seconds
+        self.assertAlmostEqual(first.acquire("days"), 2.0)
+        self.assertAlmostEqual(first.waited["days"], 2.0)
+        self.assertEqual(first.acquire("login"), 0)
+
+    def test_defer_blocks_every_process(self):
+        first, second = self.make_limiter(), self.make_limiter()
+        first.defer("days", 30)
+        self.assertAlmostEqual(second.acquire("days"), 30)
+
+    def test_shutdown_during_a_wait_takes_no_token(self):
+        limiter = self.make_limiter()
+        limiter.acquire("days")
+        limiter.acquire("days")
+        self.addCleanup(SHUTDOWN.clear)
+        SHUTDOWN.set()
+        self.assertIsNone(limiter.acquire("days"))
+        self.assertEqual(limiter.acquired["days"], 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,67 @@
+import unittest
+from datetime import date
+from unittest import mock
+
+from reschedule_daemon import restart_delay, supervise
+from reschedule_engine import RescheduleEngine
+from session_backends import FakeBackend
+from test_reschedule_engine import make_settings
+
+
+class CrashingEngine:
+    def __init__(self, outcome):
+        self.outcome = outcome
+        self.closed = False
+
+    def run(self, title):
+        if isinstance(self.outcome, Exception):
+            raise self.outcome
+        return self.outcome
+
+    def close(self):
+        self.closed = True
+
+
+class DaemonTest(unittest.TestCase):
+    def test_restart_delay_doubles_up_to_cap(self):
+        self.assertEqual([restart_delay(n, 5, 30) for n in (1, 2, 3, 4)], [5, 10, 20, 30])
+
+    def test_supervise_restarts_crashed_engines_with_backoff(self):
+        engines = [
+            CrashingEngine(RuntimeError("chrome died")),
+            CrashingEngine(RuntimeError("chrome died again")),
+            CrashingEngine(True),
+        ]
+        built = iter(engines)
+        with mock.patch("reschedule_daemon.interruptible_sleep") as sleep:
+            self.assertTrue(supervise(lambda: next(built), 5, 300, clock=lambda: 0))
+        self.assertEqual([call.args[0] for call in sleep.call_args_list], [5, 10])
+        self.assertTrue(all(engine.closed for engine in engines))
+
+    def test_engine_rotates_session_on_schedule(self):
+        self.now = 0.0
+        backends = []
+        polls = iter([[[date(2025, 9, 1)]] * 3, [[date(2025, 2, 1)]]])
+
+        def backend_factory():
+            backends.append(FakeBackend(poll_results=next(polls)))
+            return backends[-1]
+
+        def sleep(seconds):
+            self.now += seconds
+
+        engine = RescheduleEngine(
+            make_settings(SESSION_ROTATE_SECONDS=25, DATE_REQUEST_DELAY=10),
+            backend_factory,
+            clock=lambda: self.now,
+            sleep=sleep,
+        )
+        self.assertTrue(engine.reschedule_with_new_session())
+        engine.close()
+        self.assertEqual(engine.rotations, 1)
+        self.assertEqual([backend.polls for backend in backends], [3, 1])
+        self.assertEqual(backends[-1].booked, [date(2025, 2, 1)])
+
+
+if __name__ == "__main__":
+    unittest.main()
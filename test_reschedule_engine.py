@@ -0,0 +1,148 @@
+import os
+import tempfile
+import unittest
+from datetime import date
+from types import SimpleNamespace
+
+from poll_outcomes import PollResult, PollStatus
+from request_tracker import RequestTracker
+from reschedule_engine import Notifier, RescheduleEngine
+from session_backends import SESSION_EXPIRED, FakeBackend
+from shutdown import SHUTDOWN
+
+
+def make_settings(**overrides):
+    settings = SimpleNamespace(
+        USER_CONSULATE="Toronto",
+        EARLIEST_ACCEPTABLE_DATE="2025-01-01",
+        LATEST_ACCEPTABLE_DATE="2025-06-30",
+        DATE_REQUEST_DELAY=0,
+        DATE_REQUEST_MAX_RETRY=10,
+        DATE_REQUEST_MAX_TIME=60,
+        NEW_SESSION_AFTER_FAILURES=2,
+        NEW_SESSION_DELAY=0,
+        FAIL_RETRY_DELAY=0,
+        BOOKING_RETRY_ATTEMPTS=2,
+        BOOKING_RETRY_DELAY=0,
+        SESSION_RENEWAL_MAX_ATTEMPTS=2,
+        SESSION_RENEWAL_DELAY=0,
+    )
+    settings.__dict__.update(overrides)
+    return settings
+
+
+class RecordingNotifier(Notifier):
+    def __init__(self):
+        self.events = []
+
+    def slot_found(self, date_str, consulate):
+        self.events.append(("found", date_str))
+
+    def reschedule_success(self, date_str, consulate):
+        self.events.append(("success", date_str))
+
+    def reschedule_failed(self, date_str, consulate, error_msg):
+        self.events.append(("failed", date_str))
+
+
+class RescheduleEngineTest(unittest.TestCase):
+    def test_books_first_acceptable_date(self):
+        backend = FakeBackend(
+            poll_results=[None, [date(2025, 9, 1)], [date(2025, 5, 1)]]
+        )
+        notifier = RecordingNotifier()
+        engine = RescheduleEngine(make_settings(), lambda: backend, notifier)
+
+        self.assertTrue(engine.reschedule_with_new_session())
+        engine.executor.shutdown(wait=True)
+        self.assertEqual(backend.polls, 3)
+        self.assertEqual(backend.booked, [date(2025, 5, 1)])
+        self.assertCountEqual(
+            notifier.events, [("found", "2025-05-01"), ("success", "2025-05-01")]
+        )
+
+    def test_renews_session_on_expiry(self):
+        backend = FakeBackend(poll_results=[SESSION_EXPIRED, [date(2025, 2, 1)]])
+        engine = RescheduleEngine(make_settings(), lambda: backend)
+
+        self.assertTrue(engine.reschedule_with_new_session())
+        self.assertEqual(backend.logins, 2)
+        self.assertEqual(engine.login_metrics.paths["fake"][:2], [2, 2])
+        self.assertEqual(engine.poll_metrics.paths["fake"][:2], [2, 1])
+
+    def test_spent_deadline_ends_polling_without_tripping_the_breaker(self):
+        backend = FakeBackend(poll_results=[PollResult(PollStatus.DEADLINE), [date(2025, 2, 1)]])
+        engine = RescheduleEngine(make_settings(), lambda: backend)
+
+        self.assertFalse(engine.reschedule_with_new_session())
+        self.assertEqual((backend.polls, backend.booked), (1, []))
+        self.assertEqual(engine.breaker.metrics, {})
+
+    def test_shutdown_during_a_rate_limit_wait_sends_no_poll(self):
+        self.addCleanup(SHUTDOWN.clear)
+        backend = FakeBackend()
+        with tempfile.TemporaryDirectory() as directory:
+            engine = RescheduleEngine(
+                make_settings(
+                    RATE_LIMIT_FILE=os.path.join(directory, "limits.json"),
+                    RATE_LIMIT_POLLS_PER_MINUTE=1,
+                ),
+                lambda: backend,
+                sleep=lambda seconds: SHUTDOWN.set(),
+            )
+            tracker = RequestTracker(10, 60)
+            self.assertEqual(engine.poll(backend, tracker).status, PollStatus.EMPTY)
+            self.assertEqual(engine.poll(backend, tracker).status, PollStatus.DEADLINE)
+        self.assertEqual(backend.polls, 1)
+
+    def test_booking_retries_then_fails(self):
+        backend = FakeBackend(
+            poll_results=[[date(2025, 2, 1)]], book_results=[False, False]
+        )
+        notifier = RecordingNotifier()
+        engine = RescheduleEngine(make_settings(), lambda: backend, notifier)
+
+        self.assertFalse(engine.reschedule_with_new_session())
+        self.assertIn(("failed", "2025-02-01"), notifier.events)
+
+    def test_skips_booking_when_prefetch_finds_no_times(self):
+        backend = FakeBackend(
+            poll_results=[[date(2025, 2, 1)]],
+            book_results=[True],
+            available_times={date(2025, 2, 1): []},
+        )
+        engine = RescheduleEngine(make_settings(), lambda: backend)
+
+        self.assertFalse(engine.reschedule_with_new_session())
+        self.assertEqual(backend.booked, [])
+        self.assertEqual(len(engine.booking_latencies), 1)
+
+    def test_unchanged_poll_skips_matching_and_counts_bytes(self):
+        unchanged = PollResult(PollStatus.OK, [date(2025, 5, 1)], 304, unchanged=True)
+        unchanged.bytes_in, unchanged.bytes_out = 250, 600
+        backend = FakeBackend(poll_results=[[date(2025, 9, 1)], unchanged])
+        engine = RescheduleEngine(make_settings(DATE_REQUEST_MAX_RETRY=2), lambda: backend)
+
+        self.assertFalse(engine.reschedule_with_new_session())
+        self.assertEqual(backend.booked, [])
+        self.assertEqual(
+            (engine.run_transfer.polls, engine.run_transfer.unchanged, engine.run_transfer.bytes_in),
+            (3, 1, 250),
+        )
+
+    def test_falls_back_to_next_candidate_in_same_attempt(self):
+        backend = FakeBackend(
+            poll_results=[[date(2025, 2, 1), date(2025, 3, 1), date(2025, 9, 1)]],
+            available_times={date(2025, 2, 1): [], date(2025, 3, 1): ["09:00"]},
+        )
+        notifier = RecordingNotifier()
+        engine = RescheduleEngine(make_settings(), lambda: backend, notifier)
+
+        self.assertTrue(engine.reschedule_with_new_session())
+        self.assertEqual(backend.booked, [date(2025, 3, 1)])
+        self.assertIn(("success", "2025-03-01"), notifier.events)
+        self.assertEqual((engine.booking_fallbacks, engine.recovered_slots), (1, 1))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,315 @@
+import os
+import tempfile
+import unittest
+from concurrent.futures import Future
+from datetime import date
+from types import SimpleNamespace
+from unittest import mock
+
+from requests.cookies import RequestsCookieJar
+from selenium.common.exceptions import TimeoutException
+
+from deadline import Deadline, activate
+from poll_outcomes import PollStatus
+from request_tracker import RequestTracker
+from session_backends import (
+    HttpBackend,
+    SeleniumBackend,
+    load_schedule_id,
+    parse_payment_table,
+    parse_schedule_id,
+    payment_page_html,
+)
+
+LOGIN_URL = "https://example.invalid/en-ca/niv/users/sign_in"
+
+
+class FakeSession:
+    """requests.Session stand-in for the sign-in page, login post and account page"""
+
+    def __init__(self, login_status=200):
+        self.login_status = login_status
+        self.headers = {}
+        self.cookies = RequestsCookieJar()
+        self.requested = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+    def get(self, url, timeout=None):
+        self.requested.append(url)
+        if url == LOGIN_URL:
+            return SimpleNamespace(url=url, text='<meta name="csrf-token" content="abc">')
+        account_url = "https://example.invalid/en-ca/niv/schedule/4242/continue_actions"
+        return SimpleNamespace(url=account_url, text="")
+
+    def post(self, url, data=None, headers=None, timeout=None):
+        if self.login_status == 200:
+            self.cookies.set("_yatri_session", "s3cret", domain="example.invalid", path="/")
+        return SimpleNamespace(status_code=self.login_status)
+
+
+class FakeDriver:
+    def __init__(self):
+        self.cdp_commands = []
+        self.loaded = []
+        self.current_url = ""
+        self.script_calls = []
+        self.script_results = []
+
+    def execute_async_script(self, script, *args):
+        self.script_calls.append(args)
+        result = self.script_results.pop(0)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    def set_script_timeout(self, seconds):
+        pass
+
+    def execute_cdp_cmd(self, command, params):
+        self.cdp_commands.append((command, params))
+
+    def set_page_load_timeout(self, seconds):
+        pass
+
+    def get(self, url):
+        self.loaded.append(url)
+        self.current_url = url
+
+
+def make_settings(**overrides):
+    settings = SimpleNamespace(
+        LOGIN_URL=LOGIN_URL,
+        APPOINTMENT_PAGE_URL="https://example.invalid/en-ca/niv/schedule/{id}/appointment",
+        LATEST_ACCEPTABLE_DATE="2025-06-30",
+        USER_EMAIL="user@example.invalid",
+        USER_PASSWORD="password",
+        LOGIN_MODE="http",
+        AVAILABLE_DATE_REQUEST_SUFFIX="/days/94.json?appointments[expedite]=false",
+        REQUEST_HEADERS={"X-Requested-With": "XMLHttpRequest"},
+    )
+    settings.__dict__.update(overrides)
+    return settings
+
+
+class HttpLoginTest(unittest.TestCase):
+    def test_hands_session_cookies_to_browser(self):
+        driver = FakeDriver()
+        backend = SeleniumBackend(make_settings(), driver)
+        with mock.patch("session_backends.requests.Session", FakeSession):
+            backend.login()
+        backend.open_appointment_page()
+
+        self.assertEqual(backend.schedule_id, "4242")
+        [(command, cookie)] = driver.cdp_commands
+        self.assertEqual(command, "Network.setCookie")
+        self.assertEqual((cookie["name"], cookie["value"]), ("_yatri_session", "s3cret"))
+        self.assertEqual(driver.loaded, [backend.appointment_url])
+
+    def test_falls_back_to_form_after_failed_http_login(self):
+        backend = SeleniumBackend(make_settings(), FakeDriver())
+        with mock.patch(
+            "session_backends.requests.Session", lambda: FakeSession(login_status=401)
+        ):
+            with self.assertRaises(RuntimeError):
+                backend.login()
+        self.assertEqual(backend.login_path, "browser")
+
+
+class InPageFetchTest(unittest.TestCase):
+    def poll(self, *script_results):
+        driver = FakeDriver()
+        driver.script_results = list(script_results)
+        backend = SeleniumBackend(make_settings(POLL_MODE="fetch"), driver)
+        backend.schedule_id = "4242"
+        results = [
+            backend.get_available_dates(RequestTracker(10, 60)) for _ in script_results
+        ]
+        return driver, results
+
+    def test_polls_inside_the_page_without_reading_cookies(self):
+        driver, [result] = self.poll(
+            {"status": 200, "retryAfter": None, "dates": ["2025-05-02", "2025-04-01", "2025-07-01"]}
+        )
+        self.assertEqual(result.status, PollStatus.OK)
+        self.assertEqual([str(day) for day in result.dates], ["2025-04-01", "2025-05-02", "2025-07-01"])
+        [(url, headers, cutoff, etag, last_modified)] = driver.script_calls
+        self.assertTrue(url.endswith("/schedule/4242/appointment/days/94.json?appointments[expedite]=false"))
+        self.assertEqual((cutoff, etag, last_modified), ("2025-06-30", None, None))
+
+    def test_unchanged_body_reuses_previous_dates(self):
+        driver, results = self.poll(
+            {"status": 200, "etag": '"v1"', "bytesIn": 900, "dates": ["2025-04-01"]},
+            {"status": 304, "etag": '"v1"', "bytesIn": 250},
+        )
+        self.assertEqual(driver.script_calls[1][3], '"v1"')
+        self.assertTrue(results[1].unchanged)
+        self.assertEqual(results[1].dates, results[0].dates)
+        self.assertEqual([result.bytes_in for result in results], [900, 250])
+
+    def test_classifies_failures(self):
+        _, results = self.poll(
+            {"status": 401, "retryAfter": None, "size": 0},
+            {"status": 429, "retryAfter": "120", "size": 0},
+            {"error": "TypeError: Failed to fetch"},
+            TimeoutException("script timeout"),
+            {"status": 200, "retryAfter": None, "error": "SyntaxError: Unexpected token <"},
+        )
+        self.assertEqual(
+            [result.status for result in results],
+            [
+                PollStatus.SESSION_EXPIRED,
+                PollStatus.RATE_LIMITED,
+                PollStatus.NETWORK_ERROR,
+                PollStatus.NETWORK_ERROR,
+                PollStatus.PARSE_ERROR,
+            ],
+        )
+        self.assertEqual(results[1].retry_after, 120)
+
+    def test_spent_deadline_is_an_outcome_not_an_exception(self):
+        previous = activate(Deadline(0))
+        self.addCleanup(activate, previous)
+        driver, [result] = self.poll({"status": 200, "dates": ["2025-04-01"]})
+        self.assertEqual(result.status, PollStatus.DEADLINE)
+        self.assertFalse(result.failed)
+        self.assertEqual(driver.script_calls, [])
+
+
+class ConditionalPollTest(unittest.TestCase):
+    def test_sends_validators_and_skips_unchanged_bodies(self):
+        body = b'[{"date": "2025-04-01", "business_day": true}]'
+        responses = [
+            SimpleNamespace(status_code=200, content=body, headers={"ETag": '"v1"'}),
+            SimpleNamespace(status_code=304, content=b"", headers={"ETag": '"v1"'}),
+        ]
+        sent = []
+
+        def get(url, headers=None, timeout=None):
+            sent.append(headers)
+            return responses.pop(0)
+
+        session = SimpleNamespace(get=get, headers={})
+        backend = HttpBackend(make_settings(), session)
+        backend.schedule_id = "4242"
+        results = [backend.get_available_dates(RequestTracker(10, 60)) for _ in range(2)]
+
+        self.assertNotIn("If-None-Match", sent[0])
+        self.assertEqual(sent[1]["If-None-Match"], '"v1"')
+        self.assertEqual(results[1].status, PollStatus.OK)
+        self.assertTrue(results[1].unchanged)
+        self.assertEqual(results[1].dates, results[0].dates)
+        self.assertLess(results[1].bytes_in, results[0].bytes_in)
+
+    def test_spent_deadline_skips_the_request(self):
+        previous = activate(Deadline(0))
+        self.addCleanup(activate, previous)
+        backend = HttpBackend(make_settings(), SimpleNamespace(get=mock.Mock(), headers={}))
+        backend.schedule_id = "4242"
+        result = backend.get_available_dates(RequestTracker(10, 60))
+        self.assertEqual(result.status, PollStatus.DEADLINE)
+        backend.session.get.assert_not_called()
+
+
+class HttpBookingTest(unittest.TestCase):
+    def test_fallback_times_requests_wait_for_the_times_bucket(self):
+        calls = []
+
+        def get(url, headers=None, timeout=None):
+            calls.append(url)
+            if "/times/" in url:
+                return SimpleNamespace(
+                    raise_for_status=lambda: None,
+                    json=lambda: {"available_times": ["09:00"]},
+                )
+            return SimpleNamespace(text='<input name="authenticity_token" value="token">')
+
+        settings = make_settings(CONSULATES={"Toronto": 94}, USER_CONSULATE="Toronto", TEST_MODE=True)
+        backend = HttpBackend(settings, SimpleNamespace(get=get, headers={}))
+        backend.schedule_id = "4242"
+        backend.throttle = lambda endpoint: calls.append(endpoint)
+        prefetched = Future()
+        prefetched.set_result([])
+
+        self.assertTrue(backend.book(date(2025, 4, 1), prefetched, [date(2025, 4, 2)]))
+        self.assertEqual(backend.booked_date, date(2025, 4, 2))
+        # The fallback date's times request waits for the shared bucket first
+        self.assertEqual(calls[0], "times")
+        self.assertIn("/times/94.json?date=2025-04-02", calls[1])
+
+
+class PaymentPageTest(unittest.TestCase):
+    def test_parses_table_cells_in_one_pass(self):
+        html = """
+        <table class="header"><tr><td>ignored</td></tr></table>
+        <table class="for-layout">
+          <tr><td>Toronto</td><td>
+            12 March, 2026
+          </td></tr>
+          <tr><td>Ottawa</td><td>No Appointments Available</td></tr>
+        </table>
+        """
+        self.assertEqual(
+            parse_payment_table(html),
+            (["Toronto", "Ottawa"], ["12 March, 2026", "No Appointments Available"]),
+        )
+        self.assertIsNone(parse_payment_table("<html>Sign in</html>"))
+
+    def test_sign_in_redirect_means_expired(self):
+        response = SimpleNamespace(
+            status_code=200, url="https://example.invalid/en-ca/niv/users/sign_in", text=""
+        )
+        self.assertIsNone(payment_page_html(response))
+
+
+class ScheduleIdCacheTest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.settings = make_settings(
+            SCHEDULE_ID_FILE=os.path.join(directory.name, "schedule_ids.json")
+        )
+
+    def test_discovers_once_then_reuses(self):
+        session = FakeSession()
+        backend = HttpBackend(self.settings, session)
+        backend.open_appointment_page()
+        self.assertEqual(load_schedule_id(self.settings), "4242")
+
+        session = FakeSession()
+        backend = HttpBackend(self.settings, session)
+        backend.open_appointment_page()
+        self.assertEqual(backend.schedule_id, "4242")
+        self.assertEqual(session.requested, [])
+
+    def test_only_schedule_links_count_as_an_id(self):
+        self.assertEqual(parse_schedule_id("/en-ca/niv/schedule/4242/continue_actions"), "4242")
+        self.assertIsNone(parse_schedule_id("https://example.invalid/en-ca/niv/groups/987654"))
+
+        session = FakeSession()
+        session.get = lambda url, timeout=None: SimpleNamespace(
+            url="https://example.invalid/en-ca/niv/groups/987654", text="<p>Page 2 of 3</p>"
+        )
+        backend = HttpBackend(self.settings, session)
+        with self.assertRaises(RuntimeError):
+            backend.open_appointment_page()
+        self.assertIsNone(load_schedule_id(self.settings))
+
+    def test_forgets_stale_id_when_page_does_not_open(self):
+        driver = FakeDriver()
+        driver.get = lambda url: setattr(driver, "current_url", LOGIN_URL)
+        backend = SeleniumBackend(self.settings, driver)
+        backend.remember_schedule_id("1111")
+
+        with self.assertRaises(RuntimeError):
+            backend.open_appointment_page()
+        self.assertIsNone(backend.schedule_id)
+        self.assertIsNone(load_schedule_id(self.settings))
+
+
+if __name__ == "__main__":
+    unittest.main()
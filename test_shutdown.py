@@ -0,0 +1,49 @@
+import os
+import signal
+import subprocess
+import sys
+import time
+import unittest
+
+ENGINE_SCRIPT = """
+from shutdown import install_signal_handlers
+from reschedule_engine import RescheduleEngine
+from session_backends import FakeBackend
+from test_reschedule_engine import make_settings
+
+install_signal_handlers(grace_period=5)
+engine = RescheduleEngine(
+    make_settings(DATE_REQUEST_DELAY=60, NEW_SESSION_DELAY=60), lambda: FakeBackend()
+)
+print("ready", flush=True)
+engine.run()
+engine.close()
+print("stopped", flush=True)
+"""
+
+
+@unittest.skipUnless(hasattr(signal, "SIGTERM") and os.name == "posix", "POSIX signals")
+class ShutdownTest(unittest.TestCase):
+    def test_sigterm_interrupts_waits_quickly(self):
+        process = subprocess.Popen(
+            [sys.executable, "-c", ENGINE_SCRIPT],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            stdout=subprocess.PIPE,
+            text=True,
+        )
+        self.addCleanup(process.kill)
+        while process.stdout.readline().strip() != "ready":
+            pass
+        time.sleep(0.5)  # Let the poll loop reach its 60 second wait
+
+        signalled_at = time.monotonic()
+        process.send_signal(signal.SIGTERM)
+        output, _ = process.communicate(timeout=10)
+
+        self.assertLess(time.monotonic() - signalled_at, 2)
+        self.assertEqual(process.returncode, 0)
+        self.assertIn("stopped", output)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,41 @@
+import unittest
+from datetime import time
+
+from time_slots import TimePreferences, parse_time, rank_times, select_best_time_slot
+
+
+class TimeSlotsTest(unittest.TestCase):
+    def test_parse_time(self):
+        self.assertEqual(parse_time("08:15"), time(8, 15))
+        self.assertEqual(parse_time("10:30 PM"), time(22, 30))
+        self.assertEqual(parse_time("2 pm"), time(14, 0))
+        self.assertIsNone(parse_time(""))
+        self.assertIsNone(parse_time("25:00"))
+
+    def test_pm_times_are_not_morning(self):
+        preferences = TimePreferences.from_strings("07:00-11:59")
+        self.assertEqual(rank_times(["10:15 PM", "10:15 AM"], preferences)[0], "10:15 AM")
+
+    def test_ranges_order_and_avoid(self):
+        preferences = TimePreferences.from_strings(
+            "13:00-15:00,08:00-11:00", "latest", "14:45"
+        )
+        ranked = rank_times(
+            ["08:00", "09:30", "13:15", "14:45", "16:00", "bogus"], preferences
+        )
+        self.assertEqual(ranked, ["13:15", "09:30", "08:00", "16:00", "14:45"])
+
+    def test_select_best_time_slot_returns_value(self):
+        options = [("", ""), ("09:45", "09:45"), ("08:30", "08:30")]
+        self.assertEqual(select_best_time_slot(options), "08:30")
+        self.assertIsNone(select_best_time_slot([("", "")]))
+
+    def test_invalid_preferences(self):
+        with self.assertRaises(ValueError):
+            TimePreferences.from_strings("nine-ten")
+        with self.assertRaises(ValueError):
+            TimePreferences(order="random")
+
+
+if __name__ == "__main__":
+    unittest.main()
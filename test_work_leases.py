@@ -0,0 +1,131 @@
+import os
+import tempfile
+import time
+import unittest
+
+from work_leases import (
+    LeaseCoordinator,
+    MemoryLeaseStore,
+    SqliteLeaseStore,
+    WorkUnit,
+)
+
+
+class LeaseStoreTests:
+    def make_store(self, clock):
+        raise NotImplementedError
+
+    def setUp(self):
+        self.now = 100.0
+        self.store = self.make_store(lambda: self.now)
+
+    def test_one_owner_until_expiry(self):
+        self.assertTrue(self.store.acquire("unit", "a", 30))
+        self.assertFalse(self.store.acquire("unit", "b", 30))
+        self.assertTrue(self.store.renew("unit", "a", 30))
+
+        # Node a stops heartbeating; b takes over once the lease expires
+        self.now += 31
+        self.assertFalse(self.store.renew("unit", "a", 30))
+        self.assertTrue(self.store.acquire("unit", "b", 30))
+        self.assertFalse(self.store.renew("unit", "a", 30))
+
+    def test_release_and_done(self):
+        self.store.acquire("unit", "a", 30)
+        self.store.release("unit", "a")
+        self.assertTrue(self.store.acquire("unit", "b", 30))
+        self.store.mark_done("unit")
+        self.now += 10_000
+        self.assertFalse(self.store.acquire("unit", "c", 30))
+
+
+class MemoryLeaseStoreTest(LeaseStoreTests, unittest.TestCase):
+    def make_store(self, clock):
+        return MemoryLeaseStore(clock)
+
+
+class SqliteLeaseStoreTest(LeaseStoreTests, unittest.TestCase):
+    def make_store(self, clock):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        return SqliteLeaseStore(os.path.join(self.tmpdir.name, "leases.db"), clock)
+
+
+class LeaseCoordinatorTest(unittest.TestCase):
+    def test_nodes_split_units(self):
+        store = MemoryLeaseStore()
+        units = [WorkUnit("a@x", "pw", "Toronto"), WorkUnit("a@x", "pw", "Ottawa")]
+        first = LeaseCoordinator(store, node_id="first")
+        second = LeaseCoordinator(store, node_id="second")
+
+        self.assertIs(first.acquire_any(units), units[0])
+        self.assertIs(second.acquire_any(units), units[1])
+        self.assertIsNone(LeaseCoordinator(store, node_id="third").acquire_any(units))
+
+        # Booking the shared account is exclusive across nodes
+        self.assertTrue(first.lock_account(units[0]))
+        self.assertFalse(second.lock_account(units[1]))
+        first.unlock_account(units[0])
+        self.assertTrue(second.lock_account(units[1]))
+
+    def test_booking_retires_every_unit_of_the_account(self):
+        store = MemoryLeaseStore()
+        units = [
+            WorkUnit("a@x", "pw", "Toronto"),
+            WorkUnit("a@x", "pw", "Ottawa"),
+            WorkUnit("b@x", "pw", "Toronto"),
+        ]
+        first = LeaseCoordinator(store, node_id="first")
+        second = LeaseCoordinator(store, node_id="second")
+        first.acquire_any(units)
+        second.acquire_any(units)
+
+        first.release(units[0], done=True, units=units)
+
+        # The other node's lease on the same account is gone and it may not book
+        self.assertFalse(store.renew(units[1].key, "second", 60))
+        self.assertFalse(second.lock_account(units[1]))
+        self.assertIs(first.acquire_any(units), units[2])
+
+    def test_account_lock_outlasts_its_ttl_while_held(self):
+        store = MemoryLeaseStore()
+        unit = WorkUnit("a@x", "pw", "Toronto")
+        booking = LeaseCoordinator(store, ttl=0.3, node_id="booking")
+        other = LeaseCoordinator(store, ttl=0.3, node_id="other")
+
+        self.assertTrue(booking.lock_account(unit))
+        # A booking that runs past the TTL keeps the account
+        time.sleep(0.6)
+        self.assertFalse(other.lock_account(unit))
+        booking.unlock_account(unit)
+        self.assertTrue(other.lock_account(unit))
+        other.unlock_account(unit)
+
+    def test_hands_unit_over_when_another_waits(self):
+        self.now = 0.0
+        store = MemoryLeaseStore()
+        units = [WorkUnit("a@x", "pw", "Toronto"), WorkUnit("b@x", "pw", "Toronto")]
+        node = LeaseCoordinator(store, node_id="node", max_hold=600, clock=lambda: self.now)
+
+        unit = node.acquire_any(units)
+        node.hold(unit)
+        self.now = 599
+        self.assertFalse(node.should_rotate(unit, units))
+        self.now = 600
+        self.assertTrue(node.should_rotate(unit, units))
+        node.release(unit)
+        # The next acquisition moves on to the unit that was waiting
+        self.assertIs(node.acquire_any(units), units[1])
+
+        # A unit nobody else waits for is kept for another turn
+        other = LeaseCoordinator(store, node_id="other")
+        self.assertIs(other.acquire_any(units), units[0])
+        node.hold(units[1])
+        self.now = 1300
+        self.assertFalse(node.should_rotate(units[1], units))
+        self.assertEqual(node.held_since, 1300)
+        node.release(units[1])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,119 @@
+"""
+Appointment time slot selection
+Parses the time options offered for a date and ranks them by configurable preferences
+"""
+
+from datetime import datetime, time
+
+TIME_FORMATS = ("%H:%M", "%I:%M %p", "%I:%M%p", "%I %p")
+
+# Read every <option> of a <select> as [value, text] pairs in a single WebDriver call
+READ_OPTIONS_SCRIPT = (
+    "return Array.from(arguments[0].options).map(function (o) {"
+    " return [o.value, o.text]; });"
+)
+# Select an option by value and fire the change event the form listens to
+SELECT_VALUE_SCRIPT = (
+    "arguments[0].value = arguments[1];"
+    "arguments[0].dispatchEvent(new Event('change', {bubbles: true}));"
+    "return arguments[0].value;"
+)
+
+
+def parse_time(text: str) -> time | None:
+    """Parse '08:15', '8:15 AM' or '2 PM' style strings, None when unparseable"""
+    text = text.strip()
+    if not text:
+        return None
+    # Fast path for the HH:MM values the site uses
+    if len(text) == 5 and text[2] == ":" and text[:2].isdigit() and text[3:].isdigit():
+        hour, minute = int(text[:2]), int(text[3:])
+        if hour < 24 and minute < 60:
+            return time(hour, minute)
+        return None
+    upper = text.upper()
+    for time_format in TIME_FORMATS:
+        try:
+            return datetime.strptime(upper, time_format).time()
+        except ValueError:
+            continue
+    return None
+
+
+class TimePreferences:
+    """Ranking rules for appointment times
+
+    ranges      : list of (start, end) times, earlier ranges are preferred
+    order       : 'earliest' or 'latest' within the same preference tier
+    avoid       : times only used when nothing else is offered
+    """
+
+    def __init__(self, ranges=None, order: str = "earliest", avoid=None):
+        if order not in ("earliest", "latest"):
+            raise ValueError(f"Unknown time preference order '{order}'")
+        self.ranges = list(ranges or [])
+        self.order = order
+        self.avoid = set(avoid or [])
+
+    @classmethod
+    def from_strings(cls, ranges: str = "", order: str = "", avoid: str = ""):
+        """Build preferences from '08:00-11:30,13:00-15:00' style strings"""
+        parsed_ranges = []
+        for item in filter(None, (part.strip() for part in (ranges or "").split(","))):
+            start, _, end = item.partition("-")
+            start_time, end_time = parse_time(start), parse_time(end)
+            if start_time is None or end_time is None:
+                raise ValueError(f"Invalid preferred time range '{item}'")
+            parsed_ranges.append((start_time, end_time))
+        avoided = []
+        for item in filter(None, (part.strip() for part in (avoid or "").split(","))):
+            avoided_time = parse_time(item)
+            if avoided_time is None:
+                raise ValueError(f"Invalid avoided time '{item}'")
+            avoided.append(avoided_time)
+        return cls(parsed_ranges, (order or "earliest").lower(), avoided)
+
+    @classmethod
+    def from_settings(cls, settings):
+        return cls.from_strings(
+            getattr(settings, "PREFERRED_TIME_RANGES", ""),
+            getattr(settings, "PREFERRED_TIME_ORDER", "earliest"),
+            getattr(settings, "AVOID_TIMES", ""),
+        )
+
+    def tier(self, slot: time) -> int:
+        """Lower is better: matching range index, then unmatched, then avoided"""
+        if slot in self.avoid:
+            return len(self.ranges) + 1
+        for index, (start, end) in enumerate(self.ranges):
+            if start <= slot <= end:
+                return index
+        return len(self.ranges)
+
+    def sort_key(self, slot: time):
+        minutes = slot.hour * 60 + slot.minute
+        return (self.tier(slot), minutes if self.order == "earliest" else -minutes)
+
+
+def rank_times(values, preferences: TimePreferences | None = None) -> list:
+    """Return the parseable values ordered from most to least preferred"""
+    preferences = preferences or TimePreferences()
+    parsed = [(value, parse_time(value)) for value in values if value]
+    return [
+        value
+        for value, slot in sorted(
+            (item for item in parsed if item[1] is not None),
+            key=lambda item: preferences.sort_key(item[1]),
+        )
+    ]
+
+
+def select_best_time_slot(options, preferences: TimePreferences | None = None):
+    """Pick the best (value, text) option, ranking by its text or value; None if empty"""
+    labels = {}
+    for value, text in options:
+        label = (text or "").strip() or (value or "").strip()
+        if value and label:
+            labels.setdefault(label, value)
+    ranked = rank_times(list(labels), preferences)
+    return labels[ranked[0]] if ranked else None
@@ -0,0 +1,365 @@
+"""
+Lease-based work sharding across rescheduler nodes
+Each (account, consulate) work unit is polled by exactly one node at a time. Nodes
+hold time-limited leases, renew them with heartbeats and pick up units whose
+lease expired, so a dead node's work moves elsewhere within one lease period.
+Lease times use the wall clock because they are compared across hosts.
+"""
+
+import json
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+
+from console_utils import Console
+
+DONE_OWNER = "__done__"
+
+
+class WorkUnit:
+    """One account polling one consulate"""
+
+    def __init__(self, email: str, password: str, consulate: str, **overrides):
+        self.email = email
+        self.password = password
+        self.consulate = consulate
+        # Extra settings for this unit, e.g. LATEST_ACCEPTABLE_DATE
+        self.overrides = overrides
+
+    @property
+    def key(self) -> str:
+        return f"{self.email}:{self.consulate}"
+
+    @property
+    def account_key(self) -> str:
+        return f"book:{self.email}"
+
+    def __repr__(self):
+        return f"WorkUnit({self.key})"
+
+
+def load_work_units(path: str) -> list:
+    """Load units from a JSON list of {email, password, consulates, ...} accounts"""
+    with open(path) as units_file:
+        accounts = json.load(units_file)
+    units = []
+    for account in accounts:
+        account = dict(account)
+        email = account.pop("email")
+        password = account.pop("password")
+        for consulate in account.pop("consulates"):
+            units.append(WorkUnit(email, password, consulate, **account))
+    return units
+
+
+class LeaseStore:
+    """Storage interface for leases"""
+
+    clock = time.time  # the clock lease expiry times are on
+
+    def acquire(self, unit: str, owner: str, ttl: float) -> bool:
+        """Take or extend the lease if it is free, expired or already ours"""
+        raise NotImplementedError
+
+    def renew(self, unit: str, owner: str, ttl: float) -> bool:
+        """Extend a lease we still hold; False when it was lost"""
+        raise NotImplementedError
+
+    def release(self, unit: str, owner: str) -> None:
+        raise NotImplementedError
+
+    def mark_done(self, unit: str) -> None:
+        """Retire a unit for good (e.g. its account was rescheduled)"""
+        raise NotImplementedError
+
+    def owners(self) -> dict:
+        """unit -> (owner, expires_at) for every known lease"""
+        raise NotImplementedError
+
+
+class MemoryLeaseStore(LeaseStore):
+    """In-process stand-in for tests and single-process runs"""
+
+    def __init__(self, clock=time.time):
+        self.clock = clock
+        self.lock = threading.Lock()
+        self.leases = {}
+
+    def acquire(self, unit: str, owner: str, ttl: float) -> bool:
+        with self.lock:
+            now = self.clock()
+            current = self.leases.get(unit)
+            if current and current[0] != owner and current[1] >= now:
+                return False
+            self.leases[unit] = (owner, now + ttl)
+            return True
+
+    def renew(self, unit: str, owner: str, ttl: float) -> bool:
+        with self.lock:
+            now = self.clock()
+            current = self.leases.get(unit)
+            if not current or current[0] != owner or current[1] < now:
+                return False
+            self.leases[unit] = (owner, now + ttl)
+            return True
+
+    def release(self, unit: str, owner: str) -> None:
+        with self.lock:
+            if self.leases.get(unit, (None,))[0] == owner:
+                del self.leases[unit]
+
+    def mark_done(self, unit: str) -> None:
+        with self.lock:
+            self.leases[unit] = (DONE_OWNER, float("inf"))
+
+    def owners(self) -> dict:
+        with self.lock:
+            return dict(self.leases)
+
+
+class SqlLeaseStore(LeaseStore):
+    """Leases in any DB-API database supporting INSERT ... ON CONFLICT
+
+    connect returns a new connection; placeholder is the driver's parameter
+    marker ('?' for sqlite3, '%s' for psycopg). A networked database such as
+    PostgreSQL shares leases between hosts.
+    """
+
+    def __init__(self, connect, placeholder: str = "?", clock=time.time):
+        self.connect = connect
+        self.placeholder = placeholder
+        self.clock = clock
+        self._execute(
+            "CREATE TABLE IF NOT EXISTS leases ("
+            "unit TEXT PRIMARY KEY, owner TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+
+    def _execute(self, sql: str, params=()) -> int:
+        sql = sql.replace("?", self.placeholder)
+        connection = self.connect()
+        try:
+            cursor = connection.cursor()
+            cursor.execute(sql, params)
+            rowcount = cursor.rowcount
+            connection.commit()
+            return rowcount
+        finally:
+            connection.close()
+
+    def _query(self, sql: str, params=()) -> list:
+        sql = sql.replace("?", self.placeholder)
+        connection = self.connect()
+        try:
+            cursor = connection.cursor()
+            cursor.execute(sql, params)
+            return cursor.fetchall()
+        finally:
+            connection.close()
+
+    def acquire(self, unit: str, owner: str, ttl: float) -> bool:
+        now = self.clock()
+        self._execute(
+            "INSERT INTO leases (unit, owner, expires_at) VALUES (?, ?, ?) "
+            "ON CONFLICT (unit) DO UPDATE SET owner = excluded.owner, "
+            "expires_at = excluded.expires_at "
+            "WHERE leases.owner = excluded.owner OR leases.expires_at < ?",
+            (unit, owner, now + ttl, now),
+        )
+        rows = self._query("SELECT owner FROM leases WHERE unit = ?", (unit,))
+        return bool(rows) and rows[0][0] == owner
+
+    def renew(self, unit: str, owner: str, ttl: float) -> bool:
+        now = self.clock()
+        return (
+            self._execute(
+                "UPDATE leases SET expires_at = ? "
+                "WHERE unit = ? AND owner = ? AND expires_at >= ?",
+                (now + ttl, unit, owner, now),
+            )
+            == 1
+        )
+
+    def release(self, unit: str, owner: str) -> None:
+        self._execute("DELETE FROM leases WHERE unit = ? AND owner = ?", (unit, owner))
+
+    def mark_done(self, unit: str) -> None:
+        self._execute(
+            "INSERT INTO leases (unit, owner, expires_at) VALUES (?, ?, ?) "
+            "ON CONFLICT (unit) DO UPDATE SET owner = excluded.owner, "
+            "expires_at = excluded.expires_at",
+            (unit, DONE_OWNER, float("inf")),
+        )
+
+    def owners(self) -> dict:
+        return {
+            unit: (owner, expires_at)
+            for unit, owner, expires_at in self._query(
+                "SELECT unit, owner, expires_at FROM leases"
+            )
+        }
+
+
+class SqliteLeaseStore(SqlLeaseStore):
+    """Single-host lease store in a SQLite database running in WAL mode"""
+
+    def __init__(self, path: str, clock=time.time):
+        self.path = path
+
+        def connect():
+            connection = sqlite3.connect(path, timeout=30)
+            connection.execute("PRAGMA journal_mode=WAL")
+            return connection
+
+        super().__init__(connect, "?", clock)
+
+
+class LeaseCoordinator:
+    """Lease units in turn and keep the held unit's lease alive with heartbeats
+
+    With max_hold, a unit is given back after that many seconds when another
+    unit is waiting for a node, so more units than nodes all get polled.
+    """
+
+    def __init__(
+        self,
+        store: LeaseStore,
+        ttl: float = 60,
+        node_id: str | None = None,
+        max_hold: float = 0,
+        clock=time.monotonic,
+    ):
+        self.store = store
+        self.ttl = ttl
+        self.node_id = node_id or f"{socket.gethostname()}-{uuid.uuid4().hex[:8]}"
+        self.max_hold = max_hold
+        self.clock = clock
+        self.held_since = None
+        # acquire_any starts after the unit taken last, so units are served in turn
+        self.next_index = 0
+        self.lost = threading.Event()
+        self._stop_heartbeat = threading.Event()
+        self._heartbeat_thread = None
+        self._stop_account_heartbeat = threading.Event()
+        self._account_heartbeat_thread = None
+
+    @property
+    def heartbeat_interval(self) -> float:
+        return self.ttl / 3
+
+    def acquire_any(self, units: list):
+        """Lease the next free unit, or None when every unit is taken or done"""
+        owners = self.store.owners()
+        for offset in range(len(units)):
+            index = (self.next_index + offset) % len(units)
+            unit = units[index]
+            if owners.get(unit.key, (None,))[0] == DONE_OWNER:
+                continue
+            if self.store.acquire(unit.key, self.node_id, self.ttl):
+                self.next_index = index + 1
+                return unit
+        return None
+
+    def hold(self, unit: WorkUnit):
+        """Start renewing the unit's lease in the background"""
+        self.lost.clear()
+        self._stop_heartbeat.clear()
+        self.held_since = self.clock()
+        self._heartbeat_thread = self._renew_in_background(
+            unit.key, self._stop_heartbeat, self.lost
+        )
+
+    def _renew_in_background(self, key: str, stop: threading.Event, lost: threading.Event):
+        """Renew a lease every heartbeat_interval until stop is set or it is lost"""
+
+        def heartbeat():
+            while not stop.wait(self.heartbeat_interval):
+                try:
+                    renewed = self.store.renew(key, self.node_id, self.ttl)
+                except Exception as e:
+                    Console.error(f"Lease heartbeat failed: {e}", "LEASE")
+                    renewed = False
+                if not renewed:
+                    Console.warning(f"Lease on {key} lost", "LEASE")
+                    lost.set()
+                    return
+
+        thread = threading.Thread(target=heartbeat, daemon=True)
+        thread.start()
+        return thread
+
+    def should_rotate(self, unit: WorkUnit, units: list) -> bool:
+        """Whether the held unit had its turn and another unit has no node"""
+        if not self.max_hold or self.clock() - self.held_since < self.max_hold:
+            return False
+        owners = self.store.owners()
+        now = self.store.clock()
+        for other in units:
+            if other.key == unit.key:
+                continue
+            owner, expires_at = owners.get(other.key, (None, 0))
+            if owner != DONE_OWNER and expires_at < now:
+                Console.info(f"Handing {unit.key} over after {self.max_hold}s", "LEASE")
+                return True
+        # Nobody is waiting; look again after another turn
+        self.held_since = self.clock()
+        return False
+
+    def release(self, unit: WorkUnit, done: bool = False, units: list = ()):
+        """Give the lease back; done retires every unit of the unit's account
+
+        Nodes still polling another consulate for the account lose their lease
+        on the next heartbeat and stop.
+        """
+        self._stop_heartbeat.set()
+        if self._heartbeat_thread:
+            self._heartbeat_thread.join()
+        if done:
+            for other in [unit, *units]:
+                if other.email == unit.email:
+                    self.store.mark_done(other.key)
+        elif not self.lost.is_set():
+            self.store.release(unit.key, self.node_id)
+
+    def lock_account(self, unit: WorkUnit) -> bool:
+        """Lease the account so two nodes never book it at once
+
+        Renewed with heartbeats until unlock_account, since a booking with
+        retries and fallbacks can outlast the TTL. Refused once the unit was
+        retired, i.e. the account already booked.
+        """
+        if self.store.owners().get(unit.key, (None,))[0] == DONE_OWNER:
+            return False
+        if not self.store.acquire(unit.account_key, self.node_id, self.ttl):
+            return False
+        self._stop_account_heartbeat.clear()
+        self._account_heartbeat_thread = self._renew_in_background(
+            unit.account_key, self._stop_account_heartbeat, threading.Event()
+        )
+        return True
+
+    def unlock_account(self, unit: WorkUnit):
+        self._stop_account_heartbeat.set()
+        if self._account_heartbeat_thread:
+            self._account_heartbeat_thread.join()
+            self._account_heartbeat_thread = None
+        self.store.release(unit.account_key, self.node_id)
+
+
+def create_lease_store(settings) -> LeaseStore:
+    """Build the store selected by LEASE_STORE
+
+    'memory' for a single process, a postgresql:// URL for several hosts
+    (requires psycopg) or otherwise the path of a SQLite database.
+    """
+    target = getattr(settings, "LEASE_STORE", "memory")
+    if target == "memory":
+        return MemoryLeaseStore()
+    if target.startswith(("postgres://", "postgresql://")):
+        try:
+            import psycopg
+        except ImportError:
+            raise ValueError("LEASE_STORE is a PostgreSQL URL but psycopg is not installed")
+        return SqlLeaseStore(lambda: psycopg.connect(target), "%s")
+    return SqliteLeaseStore(target)